@@ -0,0 +1,319 @@
+"""Замеры производительности калькулятора на синтетических данных.
+
+Генерирует списки сотрудников (по умолчанию 1k/10k/100k, с разным числом
+проектов), замеряет чистый расчёт и пути GUI (первый экран, полная
+загрузка, смена настройки, правка поля, удаление, сохранение, холодный
+старт до первой отрисовки), запросы к локальному сервису расчёта и пишет
+результат в JSON. С --baseline сравнивает с сохранённым прогоном и
+возвращает код 1 при замедлении больше порога.
+
+    python benchmarks/bench_salary.py --sizes 1000,10000 -o bench.json
+    python benchmarks/bench_salary.py --save-baseline
+    python benchmarks/bench_salary.py --baseline benchmarks/baseline.json --threshold 0.2
+
+GUI нужен дисплей: без DISPLAY запускается Xvfb (если установлен), иначе
+замеры GUI пропускаются.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import count
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from salary_client import SalaryClient
+from salary_engine import DEFAULT_SETTINGS, LEVELS, ROLES, calculate_columns, employee_columns
+from salary_fixed import calculate_cents
+from salary_model import RosterModel
+from salary_server import SalaryServer
+from salary_store import migrate_json
+from salary_sweep import aggregate_employees, sweep, value_range
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Скрипт холодного старта: импорт, создание окна, первая отрисовка
+STARTUP_SCRIPT = """
+import sys, time
+sys.path.insert(0, {root!r})
+import tkinter as tk
+import gui_calculator as G
+G.DATA_FILE = {json_path!r}
+G.DB_FILE = {db_path!r}
+root = tk.Tk()
+app = G.SalaryApp(root)
+root.update()
+app.saver.close()
+root.destroy()
+"""
+
+
+def make_roster(n, max_projects=8, seed=0):
+    """Синтетический список сотрудников в формате salary_data.json."""
+    rnd = random.Random(seed)
+    employees = []
+    for i in range(n):
+        employees.append({
+            "name": f"Сотрудник {i}",
+            "level": rnd.choice(LEVELS),
+            "role": rnd.choice(ROLES),
+            "base_cur": float(rnd.randrange(800, 6000, 50)),
+            "base_new": float(rnd.randrange(800, 7000, 50)),
+            "content_base": float(rnd.randint(0, 40)),
+            "pages": float(rnd.randint(0, 60)),
+            "rating": rnd.choice([0.0, 4.2, 4.5, 4.8, 5.0]),
+            "mentees": rnd.randint(0, 3),
+            "projects": [{"name": f"Проект {j}", "budget": float(rnd.randrange(0, 20000, 100)),
+                          "success": rnd.random() < 0.5} for j in range(rnd.randint(0, max_projects))],
+        })
+    return employees
+
+
+def write_roster(path, n, max_projects=8):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"settings": DEFAULT_SETTINGS, "employees": make_roster(n, max_projects)}, f,
+                  ensure_ascii=False, indent=4)
+
+
+def best_of(fn, repeat):
+    """Минимальное время fn() из repeat запусков."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_compute(n, repeat):
+    employees = make_roster(n)
+    cols = employee_columns(employees)
+    results = {}
+    results["engine.calculate_columns"] = best_of(lambda: calculate_columns(cols, DEFAULT_SETTINGS), repeat)
+    results["engine.calculate_cents"] = best_of(lambda: calculate_cents(cols, DEFAULT_SETTINGS), repeat)
+    results["engine.employee_columns"] = best_of(lambda: employee_columns(employees), repeat)
+
+    def model_load():
+        RosterModel(DEFAULT_SETTINGS).extend(employees)
+    results["model.extend"] = best_of(model_load, repeat)
+
+    model = RosterModel(DEFAULT_SETTINGS)
+    model.extend(employees)
+    results["model.recompute_all"] = best_of(model.recompute_all, repeat)
+
+    runs = count()
+
+    def edit():
+        # Значение чередуется между повторами: запись того же значения модель пропускает
+        rating = 4.6 if next(runs) % 2 else 4.7
+        for i in range(0, n, max(1, n // 1000)):
+            model.update(i, "rating", rating)
+    results["model.update_x1000"] = best_of(edit, repeat)
+
+    aggregates = aggregate_employees(employees, processes=1)
+    grid = {"coeff_fail": value_range(0.0, 0.5, 50), "coeff_success": value_range(0.1, 0.6, 50)}
+    results["sweep.aggregate"] = best_of(lambda: aggregate_employees(employees, processes=1), repeat)
+    results["sweep.grid_50x50"] = best_of(lambda: sweep(None, DEFAULT_SETTINGS, grid, aggregates=aggregates), repeat)
+    return results
+
+
+@contextmanager
+def local_server(workers=None):
+    """Сервис расчёта в фоновом потоке на свободном порту localhost."""
+    ready = threading.Event()
+    state = {}
+
+    async def serve():
+        server = await SalaryServer(port=0, workers=workers).start()
+        state.update(server=server, loop=asyncio.get_running_loop(), task=asyncio.current_task())
+        ready.set()
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await server.close()
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+    ready.wait()
+    try:
+        yield state["server"]
+    finally:
+        state["loop"].call_soon_threadsafe(state["task"].cancel)
+        thread.join()
+
+
+def bench_server(n, repeat):
+    employees = make_roster(n)
+    results = {}
+    with local_server() as server, SalaryClient(port=server.port) as client:
+        results["server.calculate"] = best_of(lambda: client.calculate(employees), repeat)
+        results["server.totals_only"] = best_of(lambda: client.calculate(employees, totals_only=True), repeat)
+        results["server.stream"] = best_of(lambda: list(client.calculate_stream(employees)), repeat)
+    return results
+
+
+@contextmanager
+def virtual_display():
+    """Дисплей для Tk: текущий DISPLAY, временный Xvfb или None."""
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        yield True
+        return
+    if not shutil.which("Xvfb"):
+        yield False
+        return
+    display = ":97"
+    proc = subprocess.Popen(["Xvfb", display, "-screen", "0", "1600x1000x24"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(1.0)
+    try:
+        yield True
+    finally:
+        proc.terminate()
+        proc.wait()
+        del os.environ["DISPLAY"]
+
+
+def bench_gui(n, repeat, workdir):
+    import tkinter as tk
+    import gui_calculator as G
+
+    json_path = os.path.join(workdir, f"roster_{n}.json")
+    db_path = os.path.join(workdir, f"roster_{n}.sqlite3")
+    write_roster(json_path, n)
+    migrate_json(json_path, db_path)
+    run_db = os.path.join(workdir, "run.sqlite3")
+    G.DATA_FILE = json_path
+    G.DB_FILE = run_db
+
+    timings = {k: [] for k in ("gui.first_paint", "gui.load", "gui.settings_change", "gui.field_edit", "gui.delete", "gui.save")}
+    for _ in range(repeat):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(run_db + suffix): os.remove(run_db + suffix)
+        shutil.copy(db_path, run_db)
+
+        root = tk.Tk()
+        start = time.perf_counter()
+        app = G.SalaryApp(root)
+        root.update()
+        timings["gui.first_paint"].append(time.perf_counter() - start)
+        app.finish_loading()
+        root.update()
+        timings["gui.load"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        app.settings["bonus_mentoring"].set(3000)
+        app.scheduler.flush()
+        root.update_idletasks()
+        timings["gui.settings_change"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        app.row_for(0).var_rating.set(4.7)
+        app.scheduler.flush()
+        root.update_idletasks()
+        timings["gui.field_edit"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        app.remove_employees([0])
+        root.update_idletasks()
+        timings["gui.delete"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        app.save_data()
+        app.saver.flush()
+        timings["gui.save"].append(time.perf_counter() - start)
+
+        app.saver.close()
+        root.destroy()
+
+    results = {k: min(v) for k, v in timings.items()}
+
+    def cold_start():
+        shutil.copy(db_path, run_db)
+        script = STARTUP_SCRIPT.format(root=ROOT, json_path=json_path, db_path=run_db)
+        subprocess.run([sys.executable, "-c", script], check=True)
+    results["gui.cold_startup"] = best_of(cold_start, repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Список (имя, было, стало) для замеров, замедлившихся больше чем на threshold."""
+    regressions = []
+    for name, seconds in results.items():
+        old = baseline.get(name)
+        if old and seconds > old * (1 + threshold):
+            regressions.append((name, old, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности калькулятора зарплат")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="размеры списков через запятую")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-gui", action="store_true", help="без замеров GUI")
+    parser.add_argument("--no-server", action="store_true", help="без замеров сервиса расчёта")
+    parser.add_argument("-o", "--output", help="файл JSON с результатами")
+    parser.add_argument("--baseline", help="сравнить с сохранённым прогоном")
+    parser.add_argument("--save-baseline", action="store_true", help=f"записать результат в {DEFAULT_BASELINE}")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое замедление (доля)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = {}
+    for n in sizes:
+        for name, seconds in bench_compute(n, args.repeat).items():
+            results[f"{name}[{n}]"] = seconds
+        if not args.no_server:
+            for name, seconds in bench_server(n, args.repeat).items():
+                results[f"{name}[{n}]"] = seconds
+    if not args.no_gui:
+        with virtual_display() as have_display, tempfile.TemporaryDirectory() as workdir:
+            if not have_display:
+                print("Нет дисплея и Xvfb: замеры GUI пропущены", file=sys.stderr)
+            else:
+                for n in sizes:
+                    for name, seconds in bench_gui(n, args.repeat, workdir).items():
+                        results[f"{name}[{n}]"] = seconds
+
+    report = {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "repeat": args.repeat},
+        "results": results,
+    }
+    for name, seconds in results.items():
+        print(f"{name:45s} {seconds * 1000:10.2f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new in regressions:
+            print(f"РЕГРЕССИЯ {name}: {old * 1000:.2f} -> {new * 1000:.2f} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import json
+from tkinter import ttk, messagebox, filedialog
+import argparse
+import multiprocessing
 import os
 import sys
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+
+from salary_diag import DIAG
+from salary_engine import DEFAULT_SETTINGS, LEVELS, ROLES, RESULT_KEYS, roster_aggregates, to_number
+from salary_montecarlo import DEFAULT_PERCENTILES, MC_KEYS, simulate
+from salary_model import RosterModel
+from salary_periods import ADDED, COMPARE_KEYS, REMOVED, PeriodArchive, current_period, open_archive
+from salary_shards import ShardStore, company_totals, department_totals, list_departments
+from salary_store import AutoSaver, open_store
+from salary_sweep import SWEEP_KEYS, sweep, value_range
+from salary_view import RATING_BANDS, SORT_KEYS, RosterView
 
 # --- НАСТРОЙКА ПУТЕЙ (Для Windows и Mac) ---
 if getattr(sys, 'frozen', False):
@@ -11,18 +25,75 @@ elif __file__:
     application_path = os.path.dirname(__file__)
 
 DATA_FILE = os.path.join(application_path, "salary_data.json")
-
-# --- КОНСТАНТЫ ---
-DEFAULT_SETTINGS = {
-    "coeff_fail": 0.18,
-    "coeff_success": 0.25,
-    "pct_intern_junior": 1.5,
-    "pct_junior_plus": 0.3,
-    "bonus_rating_mid": 1250,  # 4.50 - 4.99
-    "bonus_rating_high": 2500,  # 5.00
-    "bonus_mentoring": 2500
+# Рабочий файл данных; salary_data.json переносится в него при первом запуске
+DB_FILE = os.path.join(application_path, "salary_data.sqlite3")
+# Каталог с файлами отделов (см. salary_shards): если задан, открывается только
+# отдел DEPARTMENT (по умолчанию первый по алфавиту), а не общая база
+DATA_DIR = os.environ.get("SALARY_DATA_DIR")
+DEPARTMENT = os.environ.get("SALARY_DEPARTMENT")
+# Дамп диагностики при выходе (если она включена)
+DIAG_FILE = os.environ.get("SALARY_DIAG_FILE", os.path.join(application_path, "salary_diag.json"))
+
+SETTING_LABELS = {
+    "coeff_fail": "Цели достигнуты:",
+    "coeff_success": "Цели не достигнуты:",
+    "pct_intern_junior": "% от базы за экстра контент (Int/Jun):",
+    "pct_junior_plus": "% от базы за экстра контент (Jun+):",
+    "bonus_rating_mid": "Бонус, оценка 4.5-4.99:",
+    "bonus_rating_high": "Бонус, оценка 5.00:",
+    "bonus_mentoring": "Бонус за наставничество (чел):",
 }
 
+# Оформление колонок результата 11..26: (фон, ширина, жирный)
+RESULT_STYLES = [
+    ("#f0f0f0", 8, False), ("#e6f7ff", 10, False), ("#e6f7ff", 10, False), ("#e6f7ff", 10, False),
+    ("#fff0f0", 8, False), ("#fff0f0", 8, True), ("#fff0f0", 8, False),
+    ("#f0fff0", 8, False), ("#f0fff0", 8, True), ("#f0fff0", 8, False),
+    ("#e8e8e8", 9, False), ("#e8e8e8", 9, True), ("#e8e8e8", 9, False),
+    ("#d9d9d9", 9, False), ("#d9d9d9", 9, True), ("#d9d9d9", 9, False),
+]
+RESULT_FIRST_COL = 11
+
+# Как часто сообщать о ходе пакетной загрузки (в строках)
+PROGRESS_STEP = 200
+
+# Режим таблицы: "classic" -- строка виджетов на каждого сотрудника,
+# "virtual" -- постоянный набор строк под видимую область, "auto" -- по размеру списка
+TABLE_MODE = os.environ.get("SALARY_TABLE_MODE", "auto")
+VIRTUAL_THRESHOLD = 300
+VIRTUAL_POOL_ROWS = 25
+
+# Задержка пересчёта после правки (мс): серия нажатий даёт один пересчёт.
+# 0 -- пересчёт на ближайшем простое цикла событий
+RECALC_DEBOUNCE_MS = int(os.environ.get("SALARY_DEBOUNCE_MS", "150"))
+
+# Период фонового автосохранения изменений (мс)
+AUTOSAVE_MS = 5000
+
+# Запуск: сначала показывается первый экран сотрудников, остальные догружаются
+# частями через after. SALARY_PROGRESSIVE_LOAD=0 -- весь список до показа окна
+PROGRESSIVE_LOAD = os.environ.get("SALARY_PROGRESSIVE_LOAD", "1") != "0"
+LOAD_FIRST_ROWS = 100
+LOAD_CHUNK_ROWS = 5000
+
+# Первая колонка таблицы, по которой можно сортировать (дальше -- SORT_KEYS по порядку)
+SORT_FIRST_COL = 2
+FILTER_ALL = "Все"
+
+TOTAL_TITLE = "ИТОГО:"
+TOTAL_PENDING_TITLE = "ИТОГО: расчёт…"
+
+# Сколько комбинаций сценариев показывать в окне (в CSV выгружаются все)
+SWEEP_VIEW_LIMIT = 5000
+# То же для сравнения периодов
+PERIOD_VIEW_LIMIT = 5000
+
+
+def format_result(i, val):
+    """Текст ячейки результата; i -- индекс в RESULT_KEYS."""
+    prefix = "$" if i == 0 else ""
+    return f"{prefix}{val:,.0f}"
+
 
 def safe_get(var, default=0.0):
     """Безопасное получение значения из DoubleVar/IntVar."""
@@ -34,365 +105,969 @@ def safe_get(var, default=0.0):
         return default
 
 
-class ProjectEditor(tk.Toplevel):
-    """Окно редактирования проектов"""
+class RecalcScheduler:
+    """Отложенный пересчёт.
+
+    Правки только помечают строки (или весь список) как требующие пересчёта;
+    сам пересчёт выполняется одним пакетом через root.after после паузы
+    debounce_ms. Внутри suspended() планирование не выполняется вовсе.
+    """
+
+    def __init__(self, root, flush_cb, debounce_ms=RECALC_DEBOUNCE_MS):
+        self.root = root
+        self.flush_cb = flush_cb
+        self.debounce_ms = debounce_ms
+        self.dirty_rows = set()
+        self.dirty_all = False
+        self.job = None
+        self.suspend_depth = 0
+
+    @property
+    def pending(self):
+        return self.dirty_all or bool(self.dirty_rows)
+
+    def mark_row(self, index):
+        self.dirty_rows.add(index)
+        self.schedule()
+
+    def mark_all(self):
+        self.dirty_all = True
+        self.schedule()
+
+    def schedule(self):
+        if self.suspend_depth: return
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+        if self.debounce_ms:
+            self.job = self.root.after(self.debounce_ms, self.flush)
+        else:
+            self.job = self.root.after_idle(self.flush)
+
+    def cancel(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def flush(self):
+        """Выполняет накопленный пересчёт немедленно."""
+        self.cancel()
+        if not self.pending: return
+        rows, all_rows = self.dirty_rows, self.dirty_all
+        self.dirty_rows, self.dirty_all = set(), False
+        self.flush_cb(rows, all_rows)
+
+    @contextmanager
+    def suspended(self):
+        """Массовые операции: пересчёт один раз после выхода из блока."""
+        self.suspend_depth += 1
+        try:
+            yield
+        finally:
+            self.suspend_depth -= 1
+            if not self.suspend_depth and self.pending:
+                self.schedule()
+
 
-    def __init__(self, parent, project_data, callback):
+def project_values(proj):
+    """Значения строки таблицы проектов: название, бюджет, успех, вероятность."""
+    prob = proj.get("probability")
+    return [proj.get("name", ""), f"{to_number(proj.get('budget', 0)):,.2f}", "да" if proj.get("success") else "нет",
+            "" if prob is None else f"{prob * 100:g}"]
+
+
+class ProjectForm(tk.Frame):
+    """Поля одного проекта под таблицей проектов"""
+
+    def __init__(self, parent, share=False):
         super().__init__(parent)
-        self.title("Управление проектами")
-        self.geometry("650x450")
-        self.project_data = project_data if project_data else []
-        self.callback = callback
-        self.rows = []
+        self.name = tk.StringVar()
+        self.budget = tk.DoubleVar()
+        self.success = tk.BooleanVar()
+        # Пустое поле -- вероятность не задана, исход известен по флагу
+        self.probability = tk.StringVar()
+        self.share = tk.DoubleVar(value=1.0)
+
+        tk.Label(self, text="Название проекта").grid(row=0, column=0, padx=5)
+        tk.Label(self, text="Бюджет ($)").grid(row=0, column=1, padx=5)
+        tk.Label(self, text="Цели достигнуты?").grid(row=0, column=2, padx=5)
+        tk.Label(self, text="Вероятность успеха, %").grid(row=0, column=3, padx=5)
+        self.own_widgets = [
+            ttk.Entry(self, textvariable=self.name, width=30),
+            ttk.Entry(self, textvariable=self.budget, width=15),
+            ttk.Checkbutton(self, variable=self.success),
+            ttk.Entry(self, textvariable=self.probability, width=8),
+        ]
+        for col, w in enumerate(self.own_widgets):
+            w.grid(row=1, column=col, padx=5, pady=2)
+        if share:
+            tk.Label(self, text="Доля бюджета").grid(row=0, column=4, padx=5)
+            ttk.Entry(self, textvariable=self.share, width=8).grid(row=1, column=4, padx=5, pady=2)
+
+    def show(self, proj, share=None, editable=True):
+        """Заполняет поля; editable=False -- поля проекта только для чтения (доля меняется всегда)."""
+        prob = proj.get("probability")
+        self.name.set(proj.get("name", ""))
+        self.budget.set(proj.get("budget", 0.0))
+        self.success.set(proj.get("success", False))
+        self.probability.set("" if prob is None else f"{prob * 100:g}")
+        if share is not None: self.share.set(share)
+        for w in self.own_widgets:
+            w.config(state="normal" if editable else "disabled")
+
+    def get(self):
+        proj = {"name": self.name.get(), "budget": safe_get(self.budget), "success": self.success.get()}
+        prob = to_number(self.probability.get().replace(",", "."), None)
+        if prob is not None: proj["probability"] = min(100.0, max(0.0, prob)) / 100.0
+        return proj
 
-        tk.Label(self, text="Название проекта").grid(row=0, column=0, padx=5, pady=5)
-        tk.Label(self, text="Бюджет ($)").grid(row=0, column=1, padx=5, pady=5)
-        tk.Label(self, text="Цели достигнуты?").grid(row=0, column=2, padx=5, pady=5)
-        tk.Label(self, text="Действия").grid(row=0, column=3, padx=5, pady=5)
 
-        self.canvas = tk.Canvas(self)
-        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas)
+class ProjectEditor(tk.Toplevel):
+    """Окно редактирования проектов сотрудника.
 
-        self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+    Проекты показываются строками Treeview, правится выбранный -- в форме под
+    таблицей, так что сотни проектов не создают сотни строк виджетов. Ссылки на
+    общие проекты показывают данные реестра; у них меняется только доля.
+    Проект, сделанный общим, попадает в реестр (через add_shared) только при
+    сохранении -- закрытое без сохранения окно реестр не меняет.
+    """
 
-        self.canvas.grid(row=1, column=0, columnspan=4, sticky="nsew")
-        self.scrollbar.grid(row=1, column=4, sticky="ns")
+    COLUMNS = ("name", "budget", "success", "probability", "share")
+    TITLES = ("Название проекта", "Бюджет ($)", "Цели достигнуты?", "Вероятность, %", "Доля")
+
+    def __init__(self, parent, project_data, callback, registry=None, add_shared=None):
+        super().__init__(parent)
+        self.title("Управление проектами")
+        self.geometry("780x450")
+        self.callback = callback
+        self.registry = registry
+        self.add_shared = add_shared
+        self.projects = [dict(p) for p in project_data or []]
+
+        self.tree = ttk.Treeview(self, columns=self.COLUMNS, show="headings", selectmode="browse")
+        for c, text in zip(self.COLUMNS, self.TITLES):
+            self.tree.heading(c, text=text)
+            self.tree.column(c, width=200 if c == "name" else 110, anchor="w" if c == "name" else "e")
+        vsb = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.grid(row=0, column=0, sticky="nsew", padx=(10, 0), pady=5)
+        vsb.grid(row=0, column=1, sticky="ns", pady=5)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+
+        self.form = ProjectForm(self, share=True)
+        self.form.grid(row=1, column=0, columnspan=2, pady=5)
 
         btn_frame = tk.Frame(self)
-        btn_frame.grid(row=2, column=0, columnspan=5, pady=10)
-        tk.Button(btn_frame, text="Добавить проект", command=self.add_row).pack(side=tk.LEFT, padx=5)
+        btn_frame.grid(row=2, column=0, columnspan=2, pady=5)
+        tk.Button(btn_frame, text="Добавить проект", command=self.add_project).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Применить", command=self.apply_form).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Удалить", bg="#ffcccc", command=self.delete_project).pack(side=tk.LEFT, padx=5)
+        if registry is not None:
+            self.shared_ids = sorted(registry.projects, key=lambda pid: registry.projects[pid].get("name", ""))
+            self.var_shared = tk.StringVar()
+            ttk.Combobox(btn_frame, textvariable=self.var_shared, state="readonly", width=25,
+                         values=[self.shared_title(pid) for pid in self.shared_ids]).pack(side=tk.LEFT, padx=5)
+            tk.Button(btn_frame, text="Связать с общим", command=self.link_shared).pack(side=tk.LEFT, padx=5)
+            if add_shared is not None:
+                tk.Button(btn_frame, text="Сделать общим", command=self.make_shared).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Сохранить и закрыть", command=self.save_and_close, bg="#ddffdd").pack(side=tk.LEFT,
                                                                                                          padx=5)
 
-        self.grid_rowconfigure(1, weight=1)
+        self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
-
-        for proj in self.project_data:
-            self.add_row(proj)
-
-    def add_row(self, data=None):
-        if data is None: data = {"name": "", "budget": 0.0, "success": False}
-        row_idx = len(self.rows)
-        name_var = tk.StringVar(value=data.get("name", ""))
-        budget_var = tk.DoubleVar(value=data.get("budget", 0.0))
-        success_var = tk.BooleanVar(value=data.get("success", False))
-
-        e_name = ttk.Entry(self.scrollable_frame, textvariable=name_var, width=30)
-        e_name.grid(row=row_idx, column=0, padx=5, pady=2)
-        e_budget = ttk.Entry(self.scrollable_frame, textvariable=budget_var, width=15)
-        e_budget.grid(row=row_idx, column=1, padx=5, pady=2)
-        c_success = ttk.Checkbutton(self.scrollable_frame, variable=success_var)
-        c_success.grid(row=row_idx, column=2, padx=5, pady=2)
-        btn_del = tk.Button(self.scrollable_frame, text="X", bg="#ffcccc",
-                            command=lambda idx=row_idx: self.delete_row(idx))
-        btn_del.grid(row=row_idx, column=3, padx=5, pady=2)
-
-        self.rows.append({"name": name_var, "budget": budget_var, "success": success_var,
-                          "widgets": [e_name, e_budget, c_success, btn_del]})
-
-    def delete_row(self, index):
-        for w in self.rows[index]["widgets"]: w.destroy()
-        self.rows[index] = None
+        self.refresh()
+
+    def shared_title(self, pid):
+        return f"{self.registry.projects[pid].get('name', '')} (#{pid})"
+
+    def resolve(self, proj):
+        """(данные проекта, доля или None для своего проекта)."""
+        if "new_shared" in proj:
+            return proj["new_shared"], proj.get("share", 1.0)
+        if "project" in proj:
+            return self.registry.projects.get(proj["project"], {}) if self.registry else {}, proj.get("share", 1.0)
+        return proj, None
+
+    def refresh(self, select=None):
+        self.tree.delete(*self.tree.get_children())
+        for i, proj in enumerate(self.projects):
+            data, share = self.resolve(proj)
+            self.tree.insert("", tk.END, iid=str(i), values=project_values(data) + ["" if share is None else f"{share:g}"])
+        if select is not None:
+            self.tree.selection_set(str(select))
+            self.tree.see(str(select))
+
+    def selected(self):
+        sel = self.tree.selection()
+        return int(sel[0]) if sel else None
+
+    def on_select(self, event=None):
+        i = self.selected()
+        if i is None: return
+        data, share = self.resolve(self.projects[i])
+        self.form.show(data, share if share is not None else 1.0, editable=share is None)
+
+    def apply_form(self):
+        i = self.selected()
+        if i is None: return
+        if "project" in self.projects[i] or "new_shared" in self.projects[i]:
+            self.projects[i]["share"] = safe_get(self.form.share, 1.0)
+        else:
+            self.projects[i] = self.form.get()
+        self.refresh(select=i)
+
+    def add_project(self):
+        self.projects.append({"name": "", "budget": 0.0, "success": False})
+        self.refresh(select=len(self.projects) - 1)
+
+    def delete_project(self):
+        i = self.selected()
+        if i is None: return
+        del self.projects[i]
+        self.refresh()
+
+    def link_shared(self):
+        titles = [self.shared_title(pid) for pid in self.shared_ids]
+        if self.var_shared.get() not in titles: return
+        pid = self.shared_ids[titles.index(self.var_shared.get())]
+        self.projects.append({"project": pid, "share": 1.0})
+        self.refresh(select=len(self.projects) - 1)
+
+    def make_shared(self):
+        """Помечает свой проект общим; в реестр он переносится при сохранении."""
+        i = self.selected()
+        if i is None or "project" in self.projects[i] or "new_shared" in self.projects[i]: return
+        self.projects[i] = {"new_shared": self.projects[i], "share": 1.0}
+        self.refresh(select=i)
 
     def save_and_close(self):
-        new_data = []
-        for row in self.rows:
-            if row is not None:
-                new_data.append({
-                    "name": row["name"].get(),
-                    "budget": safe_get(row["budget"]),
-                    "success": row["success"].get()
-                })
-        self.callback(new_data)
+        for i, proj in enumerate(self.projects):
+            if "new_shared" in proj:
+                self.projects[i] = {"project": self.add_shared(proj["new_shared"]), "share": proj.get("share", 1.0)}
+        self.callback(self.projects)
         self.destroy()
 
 
+class SharedProjectsDialog(tk.Toplevel):
+    """Окно реестра общих проектов: правка проекта пересчитывает только связанных с ним сотрудников"""
+
+    COLUMNS = ("name", "budget", "success", "probability", "members")
+    TITLES = ("Название проекта", "Бюджет ($)", "Цели достигнуты?", "Вероятность, %", "Сотрудников")
+
+    def __init__(self, app):
+        super().__init__(app.root)
+        self.title("Общие проекты")
+        self.geometry("780x450")
+        self.app = app
+
+        self.tree = ttk.Treeview(self, columns=self.COLUMNS, show="headings", selectmode="browse")
+        for c, text in zip(self.COLUMNS, self.TITLES):
+            self.tree.heading(c, text=text)
+            self.tree.column(c, width=200 if c == "name" else 110, anchor="w" if c == "name" else "e")
+        vsb = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.grid(row=0, column=0, sticky="nsew", padx=(10, 0), pady=5)
+        vsb.grid(row=0, column=1, sticky="ns", pady=5)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+
+        self.form = ProjectForm(self)
+        self.form.grid(row=1, column=0, columnspan=2, pady=5)
+
+        btn_frame = tk.Frame(self)
+        btn_frame.grid(row=2, column=0, columnspan=2, pady=5)
+        tk.Button(btn_frame, text="Добавить проект", command=self.add_project).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Применить", command=self.apply_form, bg="#ddffdd").pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Удалить", bg="#ffcccc", command=self.delete_project).pack(side=tk.LEFT, padx=5)
+        self.status = tk.Label(btn_frame, text="")
+        self.status.pack(side=tk.LEFT, padx=10)
+
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        # Связи сотрудников известны только для загруженных строк
+        app.finish_loading()
+        self.refresh()
+
+    def refresh(self, select=None):
+        registry = self.app.model.registry
+        self.tree.delete(*self.tree.get_children())
+        for pid, proj in registry.projects.items():
+            self.tree.insert("", tk.END, iid=str(pid), values=project_values(proj) + [registry.member_count(pid)])
+        if select is not None:
+            self.tree.selection_set(str(select))
+            self.tree.see(str(select))
+
+    def selected(self):
+        sel = self.tree.selection()
+        return int(sel[0]) if sel else None
+
+    def on_select(self, event=None):
+        pid = self.selected()
+        if pid is not None: self.form.show(self.app.model.registry.projects[pid])
+
+    def add_project(self):
+        self.refresh(select=self.app.model.add_project(self.form.get()))
+
+    def apply_form(self):
+        pid = self.selected()
+        if pid is None: return
+        proj = self.form.get()
+        # Пустая вероятность снимает её у проекта
+        proj.setdefault("probability", None)
+        rows = self.app.update_project(pid, proj)
+        self.status.config(text=f"Пересчитано сотрудников: {len(rows)}")
+        self.refresh(select=pid)
+
+    def delete_project(self):
+        pid = self.selected()
+        if pid is None: return
+        count = self.app.model.registry.member_count(pid)
+        if not messagebox.askyesno("Подтверждение", f"Удалить общий проект и его ссылки у сотрудников ({count})?",
+                                   parent=self):
+            return
+        rows = self.app.remove_project(pid)
+        self.status.config(text=f"Пересчитано сотрудников: {len(rows)}")
+        self.refresh()
+
+
+class SweepDialog(tk.Toplevel):
+    """Окно сценариев: диапазоны настроек и итоги по всем комбинациям"""
+
+    def __init__(self, app):
+        super().__init__(app.root)
+        self.title("Сценарии по настройкам")
+        self.geometry("1100x600")
+        self.app = app
+        self.result = None
+        self.ranges = {}
+
+        frame = tk.Frame(self, padx=10, pady=5)
+        frame.pack(fill=tk.X)
+        for col, text in enumerate(["Настройка", "От", "До", "Шагов"]):
+            tk.Label(frame, text=text, font=("Arial", 9, "bold")).grid(row=0, column=col, padx=5)
+        current = app.current_settings()
+        for row, (key, label) in enumerate(SETTING_LABELS.items(), 1):
+            v_from = tk.DoubleVar(value=current[key])
+            v_to = tk.DoubleVar(value=current[key])
+            v_steps = tk.IntVar(value=1)
+            tk.Label(frame, text=label).grid(row=row, column=0, sticky="e", padx=5)
+            for col, var in enumerate((v_from, v_to, v_steps), 1):
+                ttk.Entry(frame, textvariable=var, width=10).grid(row=row, column=col, padx=5)
+            self.ranges[key] = (v_from, v_to, v_steps)
+
+        btn_frame = tk.Frame(self)
+        btn_frame.pack(fill=tk.X, padx=10, pady=5)
+        tk.Button(btn_frame, text="Рассчитать", command=self.run, bg="#ddffdd").pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Экспорт CSV", command=self.export).pack(side=tk.LEFT, padx=5)
+        self.status = tk.Label(btn_frame, text="")
+        self.status.pack(side=tk.LEFT, padx=10)
+
+        self.tree = ttk.Treeview(self, show="headings")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    def run(self):
+        ranges = {}
+        for key, (v_from, v_to, v_steps) in self.ranges.items():
+            start, stop, steps = safe_get(v_from), safe_get(v_to), int(safe_get(v_steps, 1))
+            if steps > 1 or start != stop:
+                ranges[key] = value_range(start, stop, max(steps, 2))
+        self.app.finish_loading()
+        self.app.scheduler.flush()
+        # Входные колонки модели уже готовы для движка: свёртка за один проход
+        aggregates = roster_aggregates(self.app.model.cols)
+        self.result = sweep(None, self.app.current_settings(), ranges, aggregates=aggregates)
+
+        columns = list(self.result.keys) + list(SWEEP_KEYS)
+        self.tree.delete(*self.tree.get_children())
+        self.tree.config(columns=columns)
+        for c in columns:
+            self.tree.heading(c, text=c)
+            self.tree.column(c, width=110, anchor="e")
+        for combo, totals in self.result.rows[:SWEEP_VIEW_LIMIT]:
+            self.tree.insert("", tk.END, values=[f"{v:g}" for v in combo] + [f"{v:,.0f}" for v in totals])
+        shown = min(len(self.result.rows), SWEEP_VIEW_LIMIT)
+        self.status.config(text=f"Комбинаций: {len(self.result.rows)} (показано {shown})")
+
+    def export(self):
+        if self.result is None: return
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".csv", filetypes=[("CSV", "*.csv")])
+        if path: self.result.export_csv(path)
+
+
+class MonteCarloDialog(tk.Toplevel):
+    """Окно Монте-Карло: перцентили бонуса и зарплаты с учётом вероятностей проектов"""
+
+    def __init__(self, app):
+        super().__init__(app.root)
+        self.title("Монте-Карло по проектам")
+        self.geometry("1100x600")
+        self.app = app
+
+        frame = tk.Frame(self, padx=10, pady=5)
+        frame.pack(fill=tk.X)
+        self.var_sims = tk.IntVar(value=10000)
+        self.var_seed = tk.IntVar(value=0)
+        tk.Label(frame, text="Симуляций:").pack(side=tk.LEFT)
+        ttk.Entry(frame, textvariable=self.var_sims, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Label(frame, text="Seed:").pack(side=tk.LEFT)
+        ttk.Entry(frame, textvariable=self.var_seed, width=8).pack(side=tk.LEFT, padx=5)
+        tk.Button(frame, text="Рассчитать", command=self.run, bg="#ddffdd").pack(side=tk.LEFT, padx=5)
+        self.status = tk.Label(frame, text="")
+        self.status.pack(side=tk.LEFT, padx=10)
+
+        titles = {"tb": "Бон.", "sc": "ЗП Тек", "sn": "ЗП Нов"}
+        self.columns = ["name"] + [f"{k}_p{q}" for k in MC_KEYS for q in DEFAULT_PERCENTILES]
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings")
+        self.tree.heading("name", text="ФИО")
+        self.tree.column("name", width=160)
+        for k in MC_KEYS:
+            for q in DEFAULT_PERCENTILES:
+                self.tree.heading(f"{k}_p{q}", text=f"{titles[k]} P{q}")
+                self.tree.column(f"{k}_p{q}", width=95, anchor="e")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    def run(self):
+        self.app.finish_loading()
+        self.app.scheduler.flush()
+        model = self.app.model
+        employees = model.records()
+        n_sims = max(1, int(safe_get(self.var_sims, 10000)))
+        result = simulate(employees, self.app.current_settings(), n_sims=n_sims,
+                          seed=int(safe_get(self.var_seed, 0)), registry=model.registry.projects)
+
+        def values(name, stats):
+            return [name] + [f"{v:,.0f}" for k in MC_KEYS for v in stats[k]]
+
+        self.tree.delete(*self.tree.get_children())
+        self.tree.insert("", tk.END, values=values("ИТОГО", result.roster))
+        for emp, stats in zip(employees, result.employees):
+            self.tree.insert("", tk.END, values=values(emp["name"], stats))
+        self.status.config(text=f"Симуляций: {result.n_sims}")
+
+
+class PeriodsDialog(tk.Toplevel):
+    """Окно расчётных периодов: запись снимка и сравнение двух периодов"""
+
+    KEYS = ("base_cur", "base_new", "cnt_bonus", "rtg_bonus", "mnt_bonus", "tb_real",
+            "sc_min", "sc_real", "sc_max", "sn_min", "sn_real", "sn_max")
+    TITLES = ("База Тек", "База Нов", "Бон. Контент", "Бон. Оценка", "Бон. Наставн.", "Бон. Реал",
+              "ЗП Тек Мин", "ЗП Тек Реал", "ЗП Тек Макс", "ЗП Нов Мин", "ЗП Нов Реал", "ЗП Нов Макс")
+    STATUS = {ADDED: "новый", REMOVED: "удалён"}
+
+    def __init__(self, app):
+        super().__init__(app.root)
+        self.title("Расчётные периоды")
+        self.geometry("1300x700")
+        self.app = app
+        self.result = None
+
+        frame = tk.Frame(self, padx=10, pady=5)
+        frame.pack(fill=tk.X)
+        tk.Label(frame, text="Период (ГГГГ-ММ):").pack(side=tk.LEFT)
+        self.var_period = tk.StringVar(value=current_period())
+        ttk.Entry(frame, textvariable=self.var_period, width=12).pack(side=tk.LEFT, padx=5)
+        tk.Button(frame, text="Записать текущие данные", command=self.record, bg="#ddffdd").pack(side=tk.LEFT, padx=5)
+        self.status = tk.Label(frame, text="")
+        self.status.pack(side=tk.LEFT, padx=10)
+
+        columns = ("period", "created", "count", "stored", "kind")
+        self.periods_tree = ttk.Treeview(self, columns=columns, show="headings", height=6)
+        for c, text, width in zip(columns, ("Период", "Записан", "Сотрудников", "Строк в архиве", "Хранение"),
+                                  (100, 160, 100, 110, 100)):
+            self.periods_tree.heading(c, text=text)
+            self.periods_tree.column(c, width=width, anchor="w" if c in ("period", "created", "kind") else "e")
+        self.periods_tree.pack(fill=tk.X, padx=10, pady=5)
+
+        frame = tk.Frame(self, padx=10, pady=5)
+        frame.pack(fill=tk.X)
+        self.var_old = tk.StringVar()
+        self.var_new = tk.StringVar()
+        tk.Label(frame, text="Сравнить:").pack(side=tk.LEFT)
+        self.combo_old = ttk.Combobox(frame, textvariable=self.var_old, state="readonly", width=12)
+        self.combo_old.pack(side=tk.LEFT, padx=5)
+        tk.Label(frame, text="с").pack(side=tk.LEFT)
+        self.combo_new = ttk.Combobox(frame, textvariable=self.var_new, state="readonly", width=12)
+        self.combo_new.pack(side=tk.LEFT, padx=5)
+        tk.Button(frame, text="Сравнить", command=self.compare).pack(side=tk.LEFT, padx=5)
+        tk.Button(frame, text="Экспорт CSV", command=self.export).pack(side=tk.LEFT, padx=5)
+        self.compare_status = tk.Label(frame, text="")
+        self.compare_status.pack(side=tk.LEFT, padx=10)
+
+        columns = ["name", "status"] + list(self.KEYS)
+        self.tree = ttk.Treeview(self, columns=columns, show="headings")
+        self.tree.heading("name", text="ФИО")
+        self.tree.column("name", width=160)
+        self.tree.heading("status", text="Статус")
+        self.tree.column("status", width=70)
+        for key, title in zip(self.KEYS, self.TITLES):
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=120, anchor="e")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.refresh()
+
+    def archive(self):
+        app = self.app
+        return open_archive(DATA_DIR, app.department) if app.department else PeriodArchive(DB_FILE)
+
+    def refresh(self):
+        archive = self.archive()
+        try:
+            periods = archive.periods()
+        finally:
+            archive.close()
+        self.periods_tree.delete(*self.periods_tree.get_children())
+        for p in periods:
+            self.periods_tree.insert("", tk.END, values=[p["period"], p["created"], p["count"], p["stored"],
+                                                         "полный" if p["full"] else "разница"])
+        labels = [p["period"] for p in periods]
+        self.combo_old.config(values=labels)
+        self.combo_new.config(values=labels)
+        if len(labels) >= 2 and not self.var_old.get():
+            self.var_old.set(labels[-2])
+            self.var_new.set(labels[-1])
+
+    def record(self):
+        app = self.app
+        app.finish_loading()
+        app.scheduler.flush()
+        model = app.model
+        period = self.var_period.get().strip()
+        archive = self.archive()
+        try:
+            if any(p["period"] == period for p in archive.periods()) and not messagebox.askyesno(
+                    "Подтверждение", f"Период {period} уже записан. Заменить?", parent=self):
+                return
+            stored = archive.record(period, model.settings, model.registry.to_data(), model.records(),
+                                    model.results())
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e), parent=self)
+            return
+        finally:
+            archive.close()
+        self.status.config(text=f"Период {period} записан: изменённых строк {stored}")
+        self.refresh()
+
+    def compare(self):
+        old, new = self.var_old.get(), self.var_new.get()
+        if not old or not new: return
+        archive = self.archive()
+        try:
+            self.result = archive.compare(old, new)
+        finally:
+            archive.close()
+        result = self.result
+        indexes = [COMPARE_KEYS.index(k) for k in self.KEYS]
+
+        def values(old_values, new_values):
+            return [f"{new_values[i]:,.0f} ({new_values[i] - old_values[i]:+,.0f})" for i in indexes]
+
+        self.tree.delete(*self.tree.get_children())
+        self.tree.insert("", tk.END, values=["ИТОГО", ""] + values(result.totals_old, result.totals_new))
+        for _, name, status, old_values, new_values in result.rows[:PERIOD_VIEW_LIMIT]:
+            self.tree.insert("", tk.END, values=[name, self.STATUS.get(status, "")] + values(old_values, new_values))
+        shown = min(len(result.rows), PERIOD_VIEW_LIMIT)
+        self.compare_status.config(text=f"Сотрудников: {result.count_old} -> {result.count_new}, "
+                                        f"изменилось: {len(result.rows)} (показано {shown})")
+
+    def export(self):
+        if self.result is None: return
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".csv", filetypes=[("CSV", "*.csv")])
+        if path: self.result.export_csv(path)
+
+
+class DepartmentsDialog(tk.Toplevel):
+    """Окно отделов: итоги каждого отдела с его настройками и итог по компании"""
+
+    KEYS = ("budget", "tb_min", "tb_real", "tb_max", "sc_real", "sn_real")
+    TITLES = ("Бюджет ($)", "Бон. Мин", "Бон. Реал", "Бон. Макс", "ЗП Тек Реал", "ЗП Нов Реал")
+
+    def __init__(self, app):
+        super().__init__(app.root)
+        self.title("Итоги по отделам")
+        self.geometry("1000x500")
+        self.app = app
+
+        frame = tk.Frame(self, padx=10, pady=5)
+        frame.pack(fill=tk.X)
+        tk.Button(frame, text="Обновить", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        tk.Label(frame, text=f"Открыт отдел: {app.department} (с несохранёнными правками)").pack(side=tk.LEFT, padx=10)
+
+        columns = ["department", "count"] + list(self.KEYS)
+        self.tree = ttk.Treeview(self, columns=columns, show="headings")
+        self.tree.heading("department", text="Отдел")
+        self.tree.column("department", width=180)
+        self.tree.heading("count", text="Сотрудников")
+        self.tree.column("count", width=90, anchor="e")
+        for key, title in zip(self.KEYS, self.TITLES):
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=110, anchor="e")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.refresh()
+
+    def refresh(self):
+        app = self.app
+        app.finish_loading()
+        app.scheduler.flush()
+        # Открытый отдел -- из модели, остальные читаются из файлов параллельно
+        others = [d for d in list_departments(DATA_DIR) if d != app.department]
+        rows = department_totals(DATA_DIR, others)
+        rows.append((app.department, len(app.model), list(app.model.totals.sums)))
+        rows.sort(key=lambda row: row[0])
+        count, sums = company_totals(rows)
+
+        indexes = [RESULT_KEYS.index(k) for k in self.KEYS]
+        self.tree.delete(*self.tree.get_children())
+        for name, n, dept_sums in rows + [("ИТОГО", count, sums)]:
+            self.tree.insert("", tk.END, values=[name, n] + [format_result(i, dept_sums[i]) for i in indexes])
+
+
+class DiagnosticsDialog(tk.Toplevel):
+    """Окно диагностики: счётчики, времена и гистограммы замеров, профиль пересчёта"""
+
+    def __init__(self, app):
+        super().__init__(app.root)
+        self.title("Диагностика")
+        self.geometry("1100x600")
+        self.app = app
+
+        frame = tk.Frame(self, padx=10, pady=5)
+        frame.pack(fill=tk.X)
+        tk.Button(frame, text="Обновить", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        tk.Button(frame, text="Сбросить", command=self.reset).pack(side=tk.LEFT, padx=5)
+        tk.Button(frame, text="Профиль пересчёта всего списка", command=self.profile_recalc).pack(side=tk.LEFT, padx=5)
+
+        columns = ["metric", "count", "total", "mean", "max", "histogram"]
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=12)
+        for c, text, width in zip(columns, ["Замер", "Вызовов", "Всего, мс", "Среднее, мс", "Макс, мс", "Гистограмма"],
+                                  [180, 80, 90, 90, 90, 500]):
+            self.tree.heading(c, text=text)
+            self.tree.column(c, width=width, anchor="w" if c in ("metric", "histogram") else "e")
+        self.tree.pack(fill=tk.X, padx=10, pady=5)
+        self.text = tk.Text(self, height=15, font=("Courier", 9))
+        self.text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        snapshot = DIAG.snapshot()
+        for name, m in snapshot["metrics"].items():
+            if "histogram" in m:
+                hist = " ".join(f"{k}:{v}" for k, v in m["histogram"].items() if v)
+                values = [name, m["count"], f"{m['total_ms']:.1f}", f"{m['mean_ms']:.2f}", f"{m['max_ms']:.1f}", hist]
+            else:
+                values = [name, m["count"], "", "", "", ""]
+            self.tree.insert("", tk.END, values=values)
+        self.text.delete("1.0", tk.END)
+        for name, text in snapshot["profiles"].items():
+            self.text.insert(tk.END, f"=== {name} ===\n{text}\n")
+
+    def reset(self):
+        DIAG.reset()
+        self.refresh()
+
+    def profile_recalc(self):
+        self.app.scheduler.flush()
+        DIAG.profile("recalc_all", self.app.recalc_all)
+        self.refresh()
+
+
 class EmployeeRow:
-    """Строка сотрудника"""
+    """Строка сотрудника: виджеты, привязанные к записи модели по индексу"""
 
-    def __init__(self, parent_frame, app_ref, data=None, index=0):
+    def __init__(self, parent_frame, app_ref, grid_row):
         self.app = app_ref
-        self.data = data if data else {}
-        self.row_index = index + 1
-
-        # Данные ввода
-        self.var_name = tk.StringVar(value=self.data.get("name", ""))
-        self.var_level = tk.StringVar(value=self.data.get("level", "Intern"))
-        self.var_role = tk.StringVar(value=self.data.get("role", "SEO assistant"))
-        self.var_base_cur = tk.DoubleVar(value=self.data.get("base_cur", 0.0))
-        self.var_base_new = tk.DoubleVar(value=self.data.get("base_new", 0.0))
-        self.var_content_base = tk.DoubleVar(value=self.data.get("content_base", 0.0))
-        self.var_pages = tk.DoubleVar(value=self.data.get("pages", 0.0))
-        self.var_rating = tk.DoubleVar(value=self.data.get("rating", 0.0))
-        self.var_mentees = tk.IntVar(value=self.data.get("mentees", 0))
-        self.projects = self.data.get("projects", [])
-
-        # Переменные для хранения результатов
-        self.res_budget = 0.0
-        self.res_cnt_bonus = 0.0
-        self.res_rtg_bonus = 0.0
-        self.res_mnt_bonus = 0.0
-        self.res_p_min = 0.0
-        self.res_p_real = 0.0
-        self.res_p_max = 0.0
-        self.res_tb_min = 0.0
-        self.res_tb_real = 0.0
-        self.res_tb_max = 0.0
-        self.res_sc_min = 0.0
-        self.res_sc_real = 0.0
-        self.res_sc_max = 0.0
-        self.res_sn_min = 0.0
-        self.res_sn_real = 0.0
-        self.res_sn_max = 0.0
+        self.index = None
+        self.row_index = grid_row
+        self.concealed = False
+        self.binding = False
+
+        # Данные ввода (зеркало записи модели, к которой привязана строка)
+        self.var_name = tk.StringVar()
+        self.var_level = tk.StringVar()
+        self.var_role = tk.StringVar()
+        self.var_base_cur = tk.DoubleVar()
+        self.var_base_new = tk.DoubleVar()
+        self.var_content_base = tk.DoubleVar()
+        self.var_pages = tk.DoubleVar()
+        self.var_rating = tk.DoubleVar()
+        self.var_mentees = tk.IntVar()
+        self.fields = {
+            "name": self.var_name, "level": self.var_level, "role": self.var_role,
+            "base_cur": self.var_base_cur, "base_new": self.var_base_new,
+            "content_base": self.var_content_base, "pages": self.var_pages,
+            "rating": self.var_rating, "mentees": self.var_mentees,
+        }
 
         # Виджеты ввода
-        tk.Button(parent_frame, text="X", bg="#ffcccc", width=3, command=self.delete_me).grid(row=self.row_index,
-                                                                                              column=0, padx=2, pady=2)
-        tk.Button(parent_frame, text="Проекты", command=self.open_projects).grid(row=self.row_index, column=1, padx=2,
-                                                                                 pady=2)
-        ttk.Entry(parent_frame, textvariable=self.var_name, width=15).grid(row=self.row_index, column=2, padx=2)
+        self.widgets = []
+        # Ctrl+клик по "X" отмечает строку для группового удаления
+        self.btn_delete = tk.Button(parent_frame, text="X", bg="#ffcccc", width=3, command=self.delete_me)
+        self.btn_delete.bind("<Control-Button-1>", self.toggle_selected)
+        self.place(self.btn_delete, column=0, padx=2, pady=2)
+        self.place(tk.Button(parent_frame, text="Проекты", command=self.open_projects), column=1, padx=2, pady=2)
+        self.place(ttk.Entry(parent_frame, textvariable=self.var_name, width=15), column=2, padx=2)
 
         cb_level = ttk.Combobox(parent_frame, textvariable=self.var_level,
-                                values=["Intern", "Junior", "Junior+", "Middle", "Middle+"], width=8, state="readonly")
-        cb_level.grid(row=self.row_index, column=3, padx=2)
+                                values=LEVELS, width=8, state="readonly")
+        self.place(cb_level, column=3, padx=2)
         cb_level.bind("<<ComboboxSelected>>", self.on_level_change)
 
-        ttk.Combobox(parent_frame, textvariable=self.var_role,
-                     values=["SEO copywriter", "SEO assistant", "SEO strategist", "R&D specialist"], width=15).grid(
-            row=self.row_index, column=4, padx=2)
-        ttk.Entry(parent_frame, textvariable=self.var_base_cur, width=10).grid(row=self.row_index, column=5, padx=2)
-        ttk.Entry(parent_frame, textvariable=self.var_base_new, width=10).grid(row=self.row_index, column=6, padx=2)
+        self.place(ttk.Combobox(parent_frame, textvariable=self.var_role, values=ROLES, width=15), column=4, padx=2)
+        self.place(ttk.Entry(parent_frame, textvariable=self.var_base_cur, width=10), column=5, padx=2)
+        self.place(ttk.Entry(parent_frame, textvariable=self.var_base_new, width=10), column=6, padx=2)
 
         self.entry_content_base = ttk.Entry(parent_frame, textvariable=self.var_content_base, width=8)
-        self.entry_content_base.grid(row=self.row_index, column=7, padx=2)
-
-        ttk.Entry(parent_frame, textvariable=self.var_pages, width=8).grid(row=self.row_index, column=8, padx=2)
-        ttk.Entry(parent_frame, textvariable=self.var_rating, width=6).grid(row=self.row_index, column=9, padx=2)
-        ttk.Entry(parent_frame, textvariable=self.var_mentees, width=6).grid(row=self.row_index, column=10, padx=2)
-
-        # Лейблы результатов
-        self.lbl_budget = tk.Label(parent_frame, text="0", bg="#f0f0f0", width=8)
-        self.lbl_budget.grid(row=self.row_index, column=11, padx=2)
-        self.lbl_bonus_content = tk.Label(parent_frame, text="0", bg="#e6f7ff", width=10)
-        self.lbl_bonus_content.grid(row=self.row_index, column=12, padx=2)
-        self.lbl_bonus_rating = tk.Label(parent_frame, text="0", bg="#e6f7ff", width=10)
-        self.lbl_bonus_rating.grid(row=self.row_index, column=13, padx=2)
-        self.lbl_bonus_mentor = tk.Label(parent_frame, text="0", bg="#e6f7ff", width=10)
-        self.lbl_bonus_mentor.grid(row=self.row_index, column=14, padx=2)
-
-        self.lbl_proj_min = tk.Label(parent_frame, text="0", bg="#fff0f0", width=8)
-        self.lbl_proj_min.grid(row=self.row_index, column=15, padx=2)
-        self.lbl_proj_real = tk.Label(parent_frame, text="0", bg="#fff0f0", width=8, font=("Arial", 9, "bold"))
-        self.lbl_proj_real.grid(row=self.row_index, column=16, padx=2)
-        self.lbl_proj_max = tk.Label(parent_frame, text="0", bg="#fff0f0", width=8)
-        self.lbl_proj_max.grid(row=self.row_index, column=17, padx=2)
-
-        self.lbl_total_bonus_min = tk.Label(parent_frame, text="0", bg="#f0fff0", width=8)
-        self.lbl_total_bonus_min.grid(row=self.row_index, column=18, padx=2)
-        self.lbl_total_bonus_real = tk.Label(parent_frame, text="0", bg="#f0fff0", width=8, font=("Arial", 9, "bold"))
-        self.lbl_total_bonus_real.grid(row=self.row_index, column=19, padx=2)
-        self.lbl_total_bonus_max = tk.Label(parent_frame, text="0", bg="#f0fff0", width=8)
-        self.lbl_total_bonus_max.grid(row=self.row_index, column=20, padx=2)
-
-        self.lbl_sal_cur_min = tk.Label(parent_frame, text="0", bg="#e8e8e8", width=9)
-        self.lbl_sal_cur_min.grid(row=self.row_index, column=21, padx=2)
-        self.lbl_sal_cur_real = tk.Label(parent_frame, text="0", bg="#e8e8e8", width=9, font=("Arial", 9, "bold"))
-        self.lbl_sal_cur_real.grid(row=self.row_index, column=22, padx=2)
-        self.lbl_sal_cur_max = tk.Label(parent_frame, text="0", bg="#e8e8e8", width=9)
-        self.lbl_sal_cur_max.grid(row=self.row_index, column=23, padx=2)
-
-        self.lbl_sal_new_min = tk.Label(parent_frame, text="0", bg="#d9d9d9", width=9)
-        self.lbl_sal_new_min.grid(row=self.row_index, column=24, padx=2)
-        self.lbl_sal_new_real = tk.Label(parent_frame, text="0", bg="#d9d9d9", width=9, font=("Arial", 9, "bold"))
-        self.lbl_sal_new_real.grid(row=self.row_index, column=25, padx=2)
-        self.lbl_sal_new_max = tk.Label(parent_frame, text="0", bg="#d9d9d9", width=9)
-        self.lbl_sal_new_max.grid(row=self.row_index, column=26, padx=2)
+        self.place(self.entry_content_base, column=7, padx=2)
 
-        self.traces = []
-        for var in [self.var_level, self.var_base_cur, self.var_base_new, self.var_content_base, self.var_pages,
-                    self.var_rating, self.var_mentees]:
-            self.traces.append(var.trace_add("write", lambda *args: self.calculate()))
+        self.place(ttk.Entry(parent_frame, textvariable=self.var_pages, width=8), column=8, padx=2)
+        self.place(ttk.Entry(parent_frame, textvariable=self.var_rating, width=6), column=9, padx=2)
+        self.place(ttk.Entry(parent_frame, textvariable=self.var_mentees, width=6), column=10, padx=2)
 
-        self.on_level_change()
-        self.calculate()
+        # Лейблы результатов и показанный в них текст (лейбл меняется, только если текст другой)
+        self.result_labels = []
+        self.result_texts = [None] * len(RESULT_STYLES)
+        for i, (bg, width, bold) in enumerate(RESULT_STYLES):
+            lbl = tk.Label(parent_frame, text="0", bg=bg, width=width)
+            if bold: lbl.config(font=("Arial", 9, "bold"))
+            self.place(lbl, column=RESULT_FIRST_COL + i, padx=2)
+            self.result_labels.append(lbl)
 
-    def on_level_change(self, event=None):
-        lvl = self.var_level.get()
-        if "Middle" in lvl:
+        self.traces = []
+        for key, var in self.fields.items():
+            self.traces.append(var.trace_add("write", lambda *args, k=key: self.on_edit(k)))
+
+    def place(self, widget, **grid_opts):
+        widget.grid(row=self.row_index, **grid_opts)
+        self.widgets.append(widget)
+        # Отложенная перестановка таблицы применяется, когда правка строки закончена
+        widget.bind("<FocusOut>", self.on_focus_out)
+        widget.bind("<Return>", self.on_commit)
+
+    def on_focus_out(self, event=None):
+        # Фокус ещё не перешёл: проверяем, куда он ушёл, после обработки события
+        self.app.root.after_idle(self.app.apply_pending_order)
+
+    def on_commit(self, event=None):
+        self.app.scheduler.flush()
+        self.app.apply_pending_order(force=True)
+
+    def bind(self, index):
+        """Привязывает строку к сотруднику модели и показывает его данные."""
+        self.index = index
+        emp = self.app.model.record(index)
+        self.binding = True
+        try:
+            for key, var in self.fields.items():
+                var.set(emp[key])
+        finally:
+            self.binding = False
+        self.update_content_state()
+        self.show_results()
+        self.show_selected(self.app.is_selected(emp["id"]))
+        for w in self.widgets:
+            if not w.winfo_manager(): w.grid()
+
+    def show_at(self, grid_row):
+        """Ставит строку на другую строку сетки (и показывает спрятанную) без перепривязки данных."""
+        if grid_row == self.row_index and not self.concealed: return
+        self.row_index = grid_row
+        self.concealed = False
+        for w in self.widgets:
+            w.grid_configure(row=grid_row)
+
+    def conceal(self):
+        """Прячет строку, оставляя её привязанной (обычный режим: не прошла отбор)."""
+        if self.concealed: return
+        self.concealed = True
+        for w in self.widgets:
+            w.grid_remove()
+
+    def hide(self):
+        self.index = None
+        for w in self.widgets:
+            w.grid_remove()
+
+    def destroy(self):
+        for w in self.widgets:
+            w.destroy()
+
+    def on_edit(self, key):
+        if self.binding or self.index is None: return
+        with DIAG.timed("trace"):
+            var = self.fields[key]
+            value = var.get() if key in ("name", "level", "role") else safe_get(var)
+            self.app.update_employee(self.index, key, value)
+
+    def update_content_state(self):
+        if "Middle" in self.var_level.get():
             self.entry_content_base.config(state="disabled")
         else:
             self.entry_content_base.config(state="normal")
-        self.calculate()
+
+    def on_level_change(self, event=None):
+        self.update_content_state()
 
     def open_projects(self):
-        ProjectEditor(self.app.root, self.projects, self.update_projects)
-
-    def update_projects(self, new_projects):
-        self.projects = new_projects
-        self.calculate()
-        self.app.save_data()
-
-    def get_content_bonus(self, base_salary):
-        lvl = self.var_level.get()
-        if "Middle" in lvl: return 0.0
-        pages = safe_get(self.var_pages)
-        base_cnt = safe_get(self.var_content_base)
-        if pages <= base_cnt: return 0.0
-
-        cfg = self.app.settings
-        pct = 0.0
-        if lvl in ["Intern", "Junior"]:
-            pct = safe_get(cfg["pct_intern_junior"])
-        elif lvl == "Junior+":
-            pct = safe_get(cfg["pct_junior_plus"])
-        return (pages - base_cnt) * (base_salary * (pct / 100.0))
-
-    def calculate(self):
-        cfg = self.app.settings
-        base_cur = safe_get(self.var_base_cur)
-        base_new = safe_get(self.var_base_new)
-        rating = safe_get(self.var_rating)
-
-        bonus_rating = 0.0
-        if 4.50 <= rating <= 4.99:
-            bonus_rating = safe_get(cfg["bonus_rating_mid"])
-        elif rating >= 5.00:
-            bonus_rating = safe_get(cfg["bonus_rating_high"])
-
-        mentees = safe_get(self.var_mentees)
-        bonus_mentor = mentees * safe_get(cfg["bonus_mentoring"])
-
-        total_budget = sum(p.get("budget", 0) for p in self.projects)
-        c_fail = safe_get(cfg["coeff_fail"])
-        c_succ = safe_get(cfg["coeff_success"])
-
-        proj_min = total_budget * c_fail
-        proj_max = total_budget * c_succ
-        proj_real = 0.0
-        for p in self.projects:
-            proj_real += p.get("budget", 0) * (c_succ if p.get("success", False) else c_fail)
-
-        content_bonus_cur = self.get_content_bonus(base_cur)
-        content_bonus_new = self.get_content_bonus(base_new)
-
-        # Сохранение результатов в переменные
-        self.res_budget = total_budget
-        self.res_cnt_bonus = content_bonus_cur
-        self.res_rtg_bonus = bonus_rating
-        self.res_mnt_bonus = bonus_mentor
-        self.res_p_min = proj_min
-        self.res_p_real = proj_real
-        self.res_p_max = proj_max
-
-        self.res_tb_min = content_bonus_cur + bonus_rating + bonus_mentor + proj_min
-        self.res_tb_real = content_bonus_cur + bonus_rating + bonus_mentor + proj_real
-        self.res_tb_max = content_bonus_cur + bonus_rating + bonus_mentor + proj_max
-
-        self.res_sc_min = base_cur + self.res_tb_min
-        self.res_sc_real = base_cur + self.res_tb_real
-        self.res_sc_max = base_cur + self.res_tb_max
-
-        # Для новой базы пересчитываем бонус
-        tb_min_new = content_bonus_new + bonus_rating + bonus_mentor + proj_min
-        tb_real_new = content_bonus_new + bonus_rating + bonus_mentor + proj_real
-        tb_max_new = content_bonus_new + bonus_rating + bonus_mentor + proj_max
-
-        self.res_sn_min = base_new + tb_min_new
-        self.res_sn_real = base_new + tb_real_new
-        self.res_sn_max = base_new + tb_max_new
-
-        # Обновление UI
-        self.lbl_budget.config(text=f"${self.res_budget:,.0f}")
-        self.lbl_bonus_content.config(text=f"{self.res_cnt_bonus:,.0f}")
-        self.lbl_bonus_rating.config(text=f"{self.res_rtg_bonus:,.0f}")
-        self.lbl_bonus_mentor.config(text=f"{self.res_mnt_bonus:,.0f}")
-
-        self.lbl_proj_min.config(text=f"{self.res_p_min:,.0f}")
-        self.lbl_proj_real.config(text=f"{self.res_p_real:,.0f}")
-        self.lbl_proj_max.config(text=f"{self.res_p_max:,.0f}")
-
-        self.lbl_total_bonus_min.config(text=f"{self.res_tb_min:,.0f}")
-        self.lbl_total_bonus_real.config(text=f"{self.res_tb_real:,.0f}")
-        self.lbl_total_bonus_max.config(text=f"{self.res_tb_max:,.0f}")
-
-        self.lbl_sal_cur_min.config(text=f"{self.res_sc_min:,.0f}")
-        self.lbl_sal_cur_real.config(text=f"{self.res_sc_real:,.0f}")
-        self.lbl_sal_cur_max.config(text=f"{self.res_sc_max:,.0f}")
-
-        self.lbl_sal_new_min.config(text=f"{self.res_sn_min:,.0f}")
-        self.lbl_sal_new_real.config(text=f"{self.res_sn_real:,.0f}")
-        self.lbl_sal_new_max.config(text=f"{self.res_sn_max:,.0f}")
-
-        # Дергаем пересчет итогов в приложении
-        self.app.update_totals_trigger()
+        model = self.app.model
+        emp_id = model.ids[self.index]
+        ProjectEditor(self.app.root, model.text["projects"][self.index],
+                      lambda projects: self.app.update_projects(emp_id, projects), registry=model.registry,
+                      add_shared=model.add_project)
+
+    def show_results(self):
+        texts = self.result_texts
+        for i, val in enumerate(self.app.model.result(self.index)):
+            text = format_result(i, val)
+            if text != texts[i]:
+                texts[i] = text
+                self.result_labels[i].config(text=text)
+                DIAG.count("label.config")
 
     def delete_me(self):
-        self.app.delete_employee(self)
-
-    def to_dict(self):
-        return {
-            "name": self.var_name.get(),
-            "level": self.var_level.get(),
-            "role": self.var_role.get(),
-            "base_cur": safe_get(self.var_base_cur),
-            "base_new": safe_get(self.var_base_new),
-            "content_base": safe_get(self.var_content_base),
-            "pages": safe_get(self.var_pages),
-            "rating": safe_get(self.var_rating),
-            "mentees": safe_get(self.var_mentees),
-            "projects": self.projects
-        }
+        self.app.delete_employee(self.index)
+
+    def toggle_selected(self, event=None):
+        self.app.toggle_selected(self.index)
+        return "break"
+
+    def show_selected(self, selected):
+        self.btn_delete.config(bg="#ff6666" if selected else "#ffcccc", relief="sunken" if selected else "raised")
 
 
 class SalaryApp:
-    def __init__(self, root):
+    def __init__(self, root, table_mode=TABLE_MODE):
         self.root = root
-        self.root.title("Калькулятор Зарплат и Бонусов")
+        self.department = (DEPARTMENT or next(iter(list_departments(DATA_DIR)), "main")) if DATA_DIR else None
+        title = "Калькулятор Зарплат и Бонусов"
+        self.root.title(f"{title} -- {self.department}" if self.department else title)
         self.root.geometry("1400x800")
-        self.employees = []
+        self.model = RosterModel()
+        # Порядок и отбор строк таблицы
+        self.view = RosterView(self.model)
+        self.header_labels = {}
+        # Строки виджетов: в обычном режиме по одной на сотрудника,
+        # в виртуальном -- набор под видимую область, first_visible -- индекс верхней
+        self.rows = []
+        self.first_visible = 0
+        self.pool_size = VIRTUAL_POOL_ROWS
+        # Порядок вида изменился, пока строку с фокусом редактируют (виртуальный режим)
+        self.order_pending = False
+        # id сотрудников, отмеченных для группового удаления
+        self.selected = set()
         self.settings = {}
         self.total_labels = {}
+        self.total_texts = {}
+        self.status_var = tk.StringVar()
+        self.scheduler = RecalcScheduler(self.root, self.flush_recalc)
+        # Догрузка списка: итератор непрочитанных записей (None -- всё загружено),
+        # сколько прочитано и сохранённые результаты расчёта, если они ещё верны
+        self.loader = None
+        self.load_job = None
+        self.load_done = 0
+        self.load_total = 0
+        self.cached_results = None
+        self.cached_settings = None
+        # Снимок результатов в файле совпадает с моделью: при выходе писать не нужно
+        self.results_saved = False
+        # Текст последней ошибки фоновой записи (показывается, пока запись не пройдёт)
+        self.save_error = None
 
         self.create_settings_panel()
+        data = self.read_data()
+        self.virtual = self.use_virtual_table(table_mode, data["count"])
+        self.create_filter_bar()
         self.create_main_table()
 
         tk.Button(self.root, text="+ Добавить сотрудника", font=("Arial", 12, "bold"),
                   command=self.add_employee, bg="#e0ffe0", pady=10).pack(fill=tk.X, side=tk.BOTTOM)
+        tk.Button(self.root, text="Удалить отмеченных (Ctrl+клик по X)", command=self.delete_selected,
+                  bg="#ffe0e0").pack(fill=tk.X, side=tk.BOTTOM)
+        tk.Label(self.root, textvariable=self.status_var, anchor="w").pack(fill=tk.X, side=tk.BOTTOM, padx=10)
 
-        self.load_data()
+        self.load_data(data)
+        if self.department:
+            self.saver = AutoSaver(self.department, opener=partial(ShardStore, DATA_DIR))
+        else:
+            self.saver = AutoSaver(DB_FILE)
+        self.root.after(AUTOSAVE_MS, self.autosave)
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
+    @staticmethod
+    def use_virtual_table(mode, n_employees):
+        if mode == "virtual": return True
+        if mode == "classic": return False
+        return n_employees >= VIRTUAL_THRESHOLD
+
     def create_settings_panel(self):
         frame = tk.LabelFrame(self.root, text="Глобальные настройки и коэффициенты", padx=10, pady=10)
         frame.pack(fill=tk.X, padx=10, pady=5)
 
-        def add_setting(key, label_text, row, col):
-            tk.Label(frame, text=label_text).grid(row=row, column=col, sticky="e", padx=5)
+        def add_setting(key, row, col):
+            tk.Label(frame, text=SETTING_LABELS[key]).grid(row=row, column=col, sticky="e", padx=5)
             var = tk.DoubleVar(value=DEFAULT_SETTINGS[key])
             entry = ttk.Entry(frame, textvariable=var, width=10)
             entry.grid(row=row, column=col + 1, sticky="w", padx=5)
-            var.trace_add("write", lambda *args: self.recalc_all())
+            var.trace_add("write", lambda *args: self.on_setting_edit())
             self.settings[key] = var
 
-        add_setting("coeff_fail", "Цели достигнуты:", 0, 0)
-        add_setting("coeff_success", "Цели не достигнуты:", 0, 2)
-        add_setting("pct_intern_junior", "% от базы за экстра контент (Int/Jun):", 0, 4)
-        add_setting("pct_junior_plus", "% от базы за экстра контент (Jun+):", 0, 6)
-        add_setting("bonus_rating_mid", "Бонус, оценка 4.5-4.99:", 1, 0)
-        add_setting("bonus_rating_high", "Бонус, оценка 5.00:", 1, 2)
-        add_setting("bonus_mentoring", "Бонус за наставничество (чел):", 1, 4)
+        add_setting("coeff_fail", 0, 0)
+        add_setting("coeff_success", 0, 2)
+        add_setting("pct_intern_junior", 0, 4)
+        add_setting("pct_junior_plus", 0, 6)
+        add_setting("bonus_rating_mid", 1, 0)
+        add_setting("bonus_rating_high", 1, 2)
+        add_setting("bonus_mentoring", 1, 4)
+        tk.Button(frame, text="Сценарии...", command=self.open_sweep).grid(row=1, column=6, padx=5)
+        tk.Button(frame, text="Монте-Карло...", command=self.open_montecarlo).grid(row=1, column=7, padx=5)
+        tk.Button(frame, text="Общие проекты...", command=self.open_shared_projects).grid(row=0, column=9, padx=5)
+        tk.Button(frame, text="Периоды...", command=self.open_periods).grid(row=1, column=9, padx=5)
+        if DATA_DIR:
+            tk.Button(frame, text="Отделы...", command=self.open_departments).grid(row=0, column=8, padx=5)
+        if DIAG.enabled:
+            tk.Button(frame, text="Диагностика...", command=self.open_diagnostics).grid(row=1, column=8, padx=5)
+
+    def on_setting_edit(self):
+        DIAG.count("trace")
+        self.scheduler.mark_all()
+
+    def create_filter_bar(self):
+        frame = tk.Frame(self.root, padx=10)
+        frame.pack(fill=tk.X, padx=10)
+        tk.Label(frame, text="Поиск по ФИО:").pack(side=tk.LEFT)
+        self.var_search = tk.StringVar()
+        ttk.Entry(frame, textvariable=self.var_search, width=25).pack(side=tk.LEFT, padx=5)
+        self.var_search.trace_add("write", lambda *args: self.on_search())
+
+        self.filter_vars = {}
+        for key, label, values in (("level", "Уровень:", LEVELS), ("role", "Роль:", ROLES),
+                                   ("rating", "Оценка:", [band[0] for band in RATING_BANDS])):
+            tk.Label(frame, text=label).pack(side=tk.LEFT, padx=(10, 0))
+            var = tk.StringVar(value=FILTER_ALL)
+            combo = ttk.Combobox(frame, textvariable=var, values=[FILTER_ALL] + list(values), width=15,
+                                 state="readonly")
+            combo.pack(side=tk.LEFT, padx=5)
+            combo.bind("<<ComboboxSelected>>", lambda e: self.on_filter())
+            self.filter_vars[key] = var
+        tk.Button(frame, text="Сбросить", command=self.reset_view).pack(side=tk.LEFT, padx=10)
+        self.view_status = tk.Label(frame, text="")
+        self.view_status.pack(side=tk.LEFT, padx=10)
 
     def create_main_table(self):
         container = tk.Frame(self.root)
         container.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         vsb = ttk.Scrollbar(container, orient="vertical")
         hsb = ttk.Scrollbar(container, orient="horizontal")
-        self.canvas = tk.Canvas(container, yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-        vsb.config(command=self.canvas.yview)
+        self.canvas = tk.Canvas(container, xscrollcommand=hsb.set)
         hsb.config(command=self.canvas.xview)
+        if self.virtual:
+            # Вертикальная прокрутка двигает окно по модели, а не холст
+            self.vsb = vsb
+            vsb.config(command=self.on_vscroll)
+            self.canvas.bind("<Configure>", self.on_viewport_resize)
+            # Колесо крутят над полями строк, поэтому привязка общая, а чужие окна отсекает on_mousewheel
+            for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                self.root.bind_all(sequence, self.on_mousewheel)
+        else:
+            self.canvas.config(yscrollcommand=vsb.set)
+            vsb.config(command=self.canvas.yview)
         vsb.pack(side=tk.RIGHT, fill=tk.Y)
         hsb.pack(side=tk.BOTTOM, fill=tk.X)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -401,7 +1076,9 @@ class SalaryApp:
         self.table_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
 
         self.draw_headers()
-        # draw_total_row вызывается только после добавления сотрудников
+        # В обычном режиме draw_total_row вызывается только после добавления сотрудников
+        if self.virtual:
+            self.ensure_pool(self.pool_size)
 
     def draw_headers(self):
         headers = [
@@ -417,23 +1094,38 @@ class SalaryApp:
         for i, h in enumerate(headers):
             lbl = tk.Label(self.table_frame, text=h, font=("Arial", 9, "bold"), bg="#ddd", relief="raised", padx=5)
             lbl.grid(row=0, column=i, sticky="nsew", ipady=5)
+            if i >= SORT_FIRST_COL:
+                # Щелчок по заголовку: по возрастанию, по убыванию, без сортировки
+                key = SORT_KEYS[i - SORT_FIRST_COL]
+                lbl.config(cursor="hand2")
+                lbl.bind("<Button-1>", lambda e, k=key: self.sort_by(k))
+                self.header_labels[key] = (lbl, h)
+
+    def show_sort_headers(self):
+        view = self.view
+        for key, (lbl, text) in self.header_labels.items():
+            if key == view.sort_key: text += " ▼" if view.descending else " ▲"
+            lbl.config(text=text)
 
     def draw_total_row(self):
-        # Удаляем старые лейблы итогов
-        for widget in self.total_labels.values():
-            widget.destroy()
-        self.total_labels = {}
-
-        # Рассчитываем номер строки: кол-во сотрудников + 1 (так как есть заголовок)
-        # +1 чтобы быть ПОД последним сотрудником
-        row_idx = len(self.employees) + 1
+        # Номер строки: кол-во строк виджетов + 1 (так как есть заголовок)
+        # +1 чтобы быть ПОД последней строкой
+        row_idx = len(self.rows) + 1
+        DIAG.count("draw_total_row")
+
+        # Уже нарисованные лейблы итогов просто переносим ниже
+        if self.total_labels:
+            for widget in self.total_labels.values():
+                widget.grid_configure(row=row_idx)
+            self.recalc_totals()
+            return
 
         # Рисуем
-        t_title = tk.Label(self.table_frame, text="ИТОГО:", font=("Arial", 10, "bold"), bg="#444", fg="white")
+        t_title = tk.Label(self.table_frame, text=TOTAL_TITLE, font=("Arial", 10, "bold"), bg="#444", fg="white")
         t_title.grid(row=row_idx, column=0, columnspan=11, sticky="nsew", padx=2, pady=5)
         self.total_labels['title'] = t_title
 
-        cols = range(11, 27)
+        cols = range(RESULT_FIRST_COL, RESULT_FIRST_COL + len(RESULT_KEYS))
         for c in cols:
             lbl = tk.Label(self.table_frame, text="0", font=("Arial", 9, "bold"), bg="#444", fg="white")
             lbl.grid(row=row_idx, column=c, sticky="nsew", padx=2, pady=5)
@@ -441,91 +1133,549 @@ class SalaryApp:
 
         self.recalc_totals()
 
-    def add_employee(self, data=None):
-        emp = EmployeeRow(self.table_frame, self, data, index=len(self.employees))
-        self.employees.append(emp)
-        # После добавления сотрудника перерисовываем строку итогов ниже
+    # --- Виртуальная таблица ---
+
+    def ensure_pool(self, count):
+        """Доводит набор строк виртуальной таблицы до count штук (набор только растёт)."""
+        while len(self.rows) < count:
+            self.rows.append(EmployeeRow(self.table_frame, self, grid_row=len(self.rows) + 1))
         self.draw_total_row()
 
-    def delete_employee(self, emp_obj):
+    def visible_count(self):
+        return min(self.pool_size, len(self.view))
+
+    def render_view(self):
+        """Привязывает строки набора к видимому участку списка (в порядке вида).
+
+        Фокус ввода остаётся у того же сотрудника: если строка с фокусом
+        перепривязывается, фокус переходит в его новую строку (или уходит из
+        таблицы, если сотрудник больше не виден).
+        """
+        focused = self.focused_row()
+        if focused is not None:
+            keep = (focused.index, focused.widgets.index(self.focus_widget()))
+        n = len(self.view)
+        self.first_visible = max(0, min(self.first_visible, n - self.pool_size))
+        for slot, row in enumerate(self.rows):
+            pos = self.first_visible + slot
+            if slot < self.pool_size and pos < n:
+                row.bind(self.view.index_at(pos))
+            else:
+                row.hide()
+        if n:
+            self.vsb.set(self.first_visible / n, (self.first_visible + self.visible_count()) / n)
+        else:
+            self.vsb.set(0.0, 1.0)
+        if focused is not None and focused.index != keep[0]:
+            row = self.row_for(keep[0])
+            if row is not None:
+                row.widgets[keep[1]].focus_set()
+            else:
+                self.table_frame.focus_set()
+
+    def focus_widget(self):
+        try:
+            return self.root.focus_get()
+        except KeyError:
+            # Открытый список ttk.Combobox: focus_get не знает его окно
+            return None
+
+    def focused_row(self):
+        """Привязанная строка виджетов, в которой фокус ввода, или None."""
+        focus = self.focus_widget()
+        if focus is None: return None
+        for row in self.rows:
+            if row.index is not None and focus in row.widgets: return row
+        return None
+
+    def apply_pending_order(self, force=False):
+        """Переставляет таблицу, отложенную на время правки строки; force -- по Enter."""
+        if not self.order_pending: return
+        if not force and self.focused_row() is not None: return
+        self.show_view()
+
+    def on_viewport_resize(self, event):
+        if not self.rows: return
+        self.table_frame.update_idletasks()
+        row_h = self.table_frame.grid_bbox(0, 1, RESULT_FIRST_COL + len(RESULT_KEYS) - 1, 1)[3]
+        head_h = self.table_frame.grid_bbox(0, 0)[3]
+        total_h = self.table_frame.grid_bbox(0, len(self.rows) + 1)[3]
+        if row_h <= 0: return
+        pool_size = max(1, (event.height - head_h - total_h) // row_h)
+        if pool_size != self.pool_size:
+            self.pool_size = pool_size
+            self.ensure_pool(pool_size)
+            self.render_view()
+
+    def on_vscroll(self, *args):
+        if args[0] == "moveto":
+            self.first_visible = int(float(args[1]) * len(self.view))
+            self.render_view()
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.scroll_rows(step * self.pool_size if args[2] == "pages" else step)
+
+    def on_mousewheel(self, event):
+        """Прокрутка колесом -- только если указатель над основной таблицей."""
+        # Путь виджета таблицы начинается с пути холста; у служебных окон Tk widget бывает строкой
+        path = str(event.widget)
+        if path != str(self.canvas) and not path.startswith(str(self.canvas) + "."): return
+        if event.num == 4 or event.delta > 0:
+            self.scroll_rows(-3)
+        elif event.num == 5 or event.delta < 0:
+            self.scroll_rows(3)
+
+    def scroll_rows(self, step):
+        self.first_visible += step
+        self.render_view()
+
+    def row_for(self, index):
+        """Строка виджетов, показывающая сотрудника index, или None."""
+        if not self.virtual:
+            return self.rows[index]
+        pos = self.view.position(index)
+        if pos is None: return None
+        slot = pos - self.first_visible
+        if 0 <= slot < self.pool_size and slot < len(self.rows):
+            return self.rows[slot]
+        return None
+
+    def bound_rows(self):
+        return [row for row in self.rows if row.index is not None]
+
+    # --- Сортировка, отбор и поиск ---
+
+    def sort_by(self, key):
+        view = self.view
+        if view.sort_key != key:
+            key, descending = key, False
+        elif not view.descending:
+            key, descending = key, True
+        else:
+            key, descending = None, False
+        self.scheduler.flush()
+        with DIAG.timed("view.sort"):
+            view.set_sort(key, descending)
+        self.show_sort_headers()
+        self.show_view(top=True)
+
+    def on_filter(self):
+        values = {k: var.get() for k, var in self.filter_vars.items()}
+        bands = {band[0]: band[1:] for band in RATING_BANDS}
+        self.scheduler.flush()
+        with DIAG.timed("view.filter"):
+            self.view.set_filter(levels=[values["level"]] if values["level"] != FILTER_ALL else None,
+                                 roles=[values["role"]] if values["role"] != FILTER_ALL else None,
+                                 rating=bands.get(values["rating"]))
+        self.show_view(top=True)
+
+    def on_search(self):
+        self.scheduler.flush()
+        with DIAG.timed("view.search"):
+            self.view.set_query(self.var_search.get())
+        self.show_view(top=True)
+
+    def reset_view(self):
+        for var in self.filter_vars.values():
+            var.set(FILTER_ALL)
+        self.view.set_filter()
+        self.view.set_sort(None)
+        self.show_sort_headers()
+        # Сброс поиска вызывает on_search и перерисовку
+        if self.var_search.get():
+            self.var_search.set("")
+        else:
+            self.show_view(top=True)
+
+    def show_view(self, top=False):
+        """Показывает строки в порядке вида: виртуальная таблица перепривязывает видимый участок,
+        обычная -- переставляет строки по сетке и прячет не прошедшие отбор."""
+        view = self.view
+        self.order_pending = False
+        if top: self.first_visible = 0
+        if self.virtual:
+            self.render_view()
+        else:
+            for pos, index in enumerate(view.indices(), 1):
+                self.rows[index].show_at(pos)
+            for row in self.rows:
+                if not view.shown[row.index]: row.conceal()
+        self.show_view_status()
+
+    def show_view_status(self):
+        view = self.view
+        self.view_status.config(text=f"Показано: {len(view)} из {len(self.model)}" if view.filtered else "")
+
+    # --- Работа со списком ---
+
+    def add_employee(self, data=None):
+        # Новая строка встаёт в конец уже полного списка
+        self.finish_loading()
+        self.scheduler.flush()
+        idx = self.model.add(data)
+        self.view.extend(idx)
+        if self.virtual:
+            # Прокручиваем к новой строке (если она прошла отбор)
+            pos = self.view.position(idx)
+            if pos is not None: self.first_visible = pos
+            self.render_view()
+        else:
+            row = EmployeeRow(self.table_frame, self, grid_row=idx + 1)
+            self.rows.append(row)
+            row.bind(idx)
+            # После добавления сотрудника переносим строку итогов ниже
+            self.draw_total_row()
+            self.show_view()
+        self.recalc_totals()
+
+    def add_employees(self, items, progress=None, results=None, dirty=True):
+        """Пакетное добавление: один расчёт в модели, затем строки и одна строка итогов.
+
+        progress(done, total) вызывается каждые PROGRESS_STEP строк; results и
+        dirty передаются в RosterModel.extend.
+        """
+        self.scheduler.flush()
+        start = len(self.model)
+        with DIAG.timed("calculate"):
+            self.model.extend(items, results, dirty)
+        self.view.extend(start)
+        total = len(self.model) - start
+        if self.virtual:
+            if progress: progress(total, total)
+            self.render_view()
+        else:
+            for n, idx in enumerate(range(start, len(self.model)), 1):
+                row = EmployeeRow(self.table_frame, self, grid_row=idx + 1)
+                self.rows.append(row)
+                row.bind(idx)
+                if progress and (n % PROGRESS_STEP == 0 or n == total):
+                    progress(n, total)
+            self.draw_total_row()
+            self.show_view()
+        self.recalc_totals()
+
+    def delete_employee(self, index):
         if messagebox.askyesno("Подтверждение", "Удалить сотрудника?"):
-            self.employees.remove(emp_obj)
-            self.refresh_table_ui()
+            self.remove_employees([index])
+
+    def delete_selected(self):
+        if not self.selected: return
+        if messagebox.askyesno("Подтверждение", f"Удалить отмеченных сотрудников ({len(self.selected)})?"):
+            self.remove_employees([i for i, emp_id in enumerate(self.model.ids) if emp_id in self.selected])
+
+    def remove_employees(self, indices):
+        """Удаление на месте: уничтожаются только строки удалённых, строки ниже сдвигаются вверх."""
+        if not indices: return
+        # Отложенные индексы строк должны быть применены до сдвига
+        self.scheduler.flush()
+        indices = sorted(set(indices))
+        self.selected.difference_update(self.model.remove_many(indices))
+        # Индексы вида сдвигаются вслед за моделью, без пересортировки
+        moved = self.view.remove(indices)
+        if self.virtual:
+            self.render_view()
+        else:
+            for i in reversed(indices):
+                self.rows.pop(i).destroy()
+            for index in range(indices[0], len(self.rows)):
+                self.rows[index].index = index
+            # На сетке переставляются только строки ниже первой удалённой
+            for pos in range(moved, len(self.view)):
+                self.rows[self.view.index_at(pos)].show_at(pos + 1)
+            self.draw_total_row()
+        self.show_view_status()
+        self.recalc_totals()
 
-    def refresh_table_ui(self):
-        for widget in self.table_frame.winfo_children():
-            widget.destroy()
-        self.total_labels = {}
-        self.draw_headers()
+    def is_selected(self, emp_id):
+        return emp_id in self.selected
 
-        current_data = [e.to_dict() for e in self.employees]
-        self.employees = []
-        for d in current_data:
-            self.add_employee(d)  # внутри вызывается draw_total_row
+    def toggle_selected(self, index):
+        emp_id = self.model.ids[index]
+        if emp_id in self.selected:
+            self.selected.discard(emp_id)
+        else:
+            self.selected.add(emp_id)
+        row = self.row_for(index)
+        if row is not None: row.show_selected(self.is_selected(emp_id))
+
+    def update_employee(self, index, key, value):
+        """Правка поля из строки таблицы: значение сразу в модель, пересчёт -- отложенно.
+
+        Порядок и отбор строк обновляются вместе с пересчётом: строка не
+        перескакивает на каждое нажатие клавиши.
+        """
+        if not self.model.update(index, key, value, recompute=False):
+            if self.view.depends_on(key): self.scheduler.mark_row(index)
+            return
+        if key == "level":
+            row = self.row_for(index)
+            if row is not None: row.update_content_state()
+        self.scheduler.mark_row(index)
+
+    def flush_recalc(self, rows, all_rows):
+        """Пакетный пересчёт помеченных строк (или всего списка) и итогов."""
+        if all_rows:
+            # Строки, правленные вместе с настройками, пересчитываются, даже если настройки их не задели
+            rows = set(rows).difference(self.recalc_all())
+            if not rows: return
+        with DIAG.timed("calculate"):
+            self.model.recompute_rows(rows)
+        self.show_rows(rows)
+
+    def update_projects(self, emp_id, projects):
+        index = self.model.index_of(emp_id)
+        self.update_employee(index, "projects", projects)
+        self.save_data()
 
-    def recalc_all(self):
-        for emp in self.employees:
-            emp.calculate()
+    def update_project(self, pid, changes):
+        """Правка общего проекта: пересчитываются и перерисовываются только связанные сотрудники."""
+        self.scheduler.flush()
+        with DIAG.timed("calculate"):
+            rows = self.model.update_project(pid, changes)
+        self.show_rows(rows)
+        self.save_data()
+        return rows
 
-    def update_totals_trigger(self):
+    def remove_project(self, pid):
+        self.scheduler.flush()
+        with DIAG.timed("calculate"):
+            rows = self.model.remove_project(pid)
+        self.show_rows(rows)
+        self.save_data()
+        return rows
+
+    def show_rows(self, rows):
+        """Показывает пересчитанные строки; если они сменили место в виде -- переставляет таблицу."""
+        DIAG.count("calculate.rows", len(rows))
+        if not rows: return
+        rows = set(rows)
+        for row in self.bound_rows():
+            if row.index in rows: row.show_results()
+        with DIAG.timed("view.update"):
+            moved = self.view.update_rows(rows)
+        if moved:
+            # В виртуальном режиме перестановка перепривязывает строки: строку, в которой
+            # печатают, не трогаем до ухода фокуса или Enter (в обычном двигаются сами виджеты)
+            if self.virtual and self.focused_row() is not None:
+                self.order_pending = True
+            else:
+                self.show_view()
         self.recalc_totals()
 
+    def open_periods(self):
+        PeriodsDialog(self)
+
+    def open_shared_projects(self):
+        SharedProjectsDialog(self)
+
+    def open_sweep(self):
+        SweepDialog(self)
+
+    def open_montecarlo(self):
+        MonteCarloDialog(self)
+
+    def open_departments(self):
+        DepartmentsDialog(self)
+
+    def open_diagnostics(self):
+        DiagnosticsDialog(self)
+
+    def current_settings(self):
+        return {k: safe_get(v) for k, v in self.settings.items()}
+
+    def recalc_all(self):
+        """Пересчёт строк, зависящих от изменившихся настроек, и однократное обновление итогов."""
+        with DIAG.timed("calculate"):
+            changed = self.model.set_settings(self.current_settings())
+        self.show_rows(changed)
+        return changed
+
     def recalc_totals(self):
+        """Выводит текущие итоги; сами суммы ведёт модель."""
         if not self.total_labels: return
-
-        sums = {i: 0.0 for i in range(11, 27)}
-
-        for emp in self.employees:
-            sums[11] += emp.res_budget
-            sums[12] += emp.res_cnt_bonus
-            sums[13] += emp.res_rtg_bonus
-            sums[14] += emp.res_mnt_bonus
-            sums[15] += emp.res_p_min
-            sums[16] += emp.res_p_real
-            sums[17] += emp.res_p_max
-            sums[18] += emp.res_tb_min
-            sums[19] += emp.res_tb_real
-            sums[20] += emp.res_tb_max
-            sums[21] += emp.res_sc_min
-            sums[22] += emp.res_sc_real
-            sums[23] += emp.res_sc_max
-            sums[24] += emp.res_sn_min
-            sums[25] += emp.res_sn_real
-            sums[26] += emp.res_sn_max
-
-        for col, val in sums.items():
-            if col in self.total_labels:
-                prefix = "$" if col == 11 else ""
-                self.total_labels[col].config(text=f"{prefix}{val:,.0f}")
+        DIAG.count("recalc_totals")
+        loading = self.loader is not None
+        self.total_labels["title"].config(text=TOTAL_PENDING_TITLE if loading else TOTAL_TITLE)
+
+        for i, val in enumerate(self.model.totals.sums):
+            col = RESULT_FIRST_COL + i
+            # Пока список догружается, итоги неполные
+            text = "…" if loading else format_result(i, val)
+            if col in self.total_labels and self.total_texts.get(col) != text:
+                self.total_texts[col] = text
+                self.total_labels[col].config(text=text)
+                DIAG.count("label.config")
 
     def save_data(self):
-        data = {
-            "settings": {k: safe_get(v) for k, v in self.settings.items()},
-            "employees": [e.to_dict() for e in self.employees]
-        }
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        """Отправляет в фоновую запись только изменённые с прошлого раза данные.
+
+        Порции, которые не удалось записать, сначала возвращаются в модель и
+        уходят заново вместе с новыми правками.
+        """
+        self.scheduler.flush()
+        self.check_save_errors()
+        with DIAG.timed("save_data"):
+            if self.model.has_changes():
+                self.saver.submit(*self.model.take_changes())
+                self.results_saved = False
+
+    def check_save_errors(self):
+        """Забирает у фоновой записи незаписанные порции; True, если среди них есть изменения данных."""
+        failed = self.saver.take_failed()
+        lost = False
+        for method, args, error in failed:
+            self.save_error = error
+            if method == "apply":
+                self.model.restore_changes(*args)
+                lost = True
+            else:
+                self.results_saved = False
+        if failed:
+            self.status_var.set(f"Ошибка сохранения: {self.save_error}. Повтор через {AUTOSAVE_MS // 1000} с")
+        elif self.save_error is not None and self.saver.idle():
+            self.save_error = None
+            self.status_var.set("")
+        return lost
+
+    def autosave(self):
+        self.save_data()
+        self.root.after(AUTOSAVE_MS, self.autosave)
+
+    def read_data(self):
+        """Открывает файл данных (общую базу или файл отдела) без чтения сотрудников.
+
+        "employees" -- итератор, читающий записи из базы по мере перебора (база
+        закрывается, когда он исчерпан или закрыт), "results" -- сохранённые
+        результаты расчёта или None.
+        """
+        try:
+            store = ShardStore(DATA_DIR, self.department) if self.department else open_store(DB_FILE, DATA_FILE)
+        except Exception as e:
+            print(f"Ошибка загрузки: {e}")
+            return {"settings": {}, "projects": {}, "count": 0, "employees": iter(()), "results": None}
 
-    def load_data(self):
-        if not os.path.exists(DATA_FILE): return
+        def records():
+            try:
+                yield from store.iter_employees()
+            finally:
+                store.close()
+
+        try:
+            settings = store.load_settings()
+            return {"settings": settings, "projects": store.load_projects(), "count": store.count(), "employees": records(),
+                    "results": store.load_results(settings)}
+        except Exception as e:
+            print(f"Ошибка загрузки: {e}")
+            store.close()
+            return {"settings": {}, "projects": {}, "count": 0, "employees": iter(()), "results": None}
+
+    def load_data(self, data):
+        """Применяет настройки и показывает первый экран сотрудников; остальные догружает load_chunk."""
+        with DIAG.timed("load_data"):
+            try:
+                with self.scheduler.suspended():
+                    for k, v in data["settings"].items():
+                        if k in self.settings: self.settings[k].set(v)
+                # Все ключи настроек применяются одним пересчётом до добавления строк
+                self.scheduler.flush()
+            except Exception as e:
+                print(f"Ошибка загрузки: {e}")
+            # Общие проекты нужны до первой строки: суммы бюджетов считаются по ним
+            self.model.registry.load(data["projects"])
+            # Загруженные настройки и проекты уже совпадают с файлом
+            self.model.mark_clean()
+            self.loader = data["employees"]
+            self.load_total = data["count"]
+            self.cached_results = data["results"]
+            self.cached_settings = dict(self.model.settings)
+            self.results_saved = self.cached_results is not None
+            self.load_done = 0
+            self.load_chunk(LOAD_FIRST_ROWS if PROGRESSIVE_LOAD else None)
+
+    def load_chunk(self, limit=LOAD_CHUNK_ROWS):
+        """Добавляет следующие limit записей (None -- все оставшиеся) и планирует следующую часть."""
+        self.load_job = None
+        if self.loader is None: return
         try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if "settings" in data:
-                for k, v in data["settings"].items():
-                    if k in self.settings: self.settings[k].set(v)
-            if "employees" in data:
-                for emp_data in data["employees"]:
-                    self.add_employee(emp_data)
+            items = list(islice(self.loader, limit))
         except Exception as e:
             print(f"Ошибка загрузки: {e}")
+            items, limit = [], None
+        results = None
+        # Сохранённые результаты верны только при настройках, с которыми список был открыт
+        if self.cached_results is not None and self.model.settings != self.cached_settings:
+            self.cached_results = None
+        if self.cached_results is not None:
+            width = len(RESULT_KEYS)
+            results = self.cached_results[self.load_done * width:(self.load_done + len(items)) * width]
+        self.load_done += len(items)
+        if limit is None or len(items) < limit:
+            self.loader = None
+            self.cached_results = None
+        progress = self.show_load_progress if limit is None and not self.virtual else None
+        if items:
+            self.add_employees(items, progress=progress, results=results, dirty=False)
+        elif self.virtual:
+            self.render_view()
+        if self.loader is None:
+            self.status_var.set("")
+            self.recalc_totals()
+        else:
+            self.status_var.set(f"Загрузка сотрудников: {self.load_done} из {self.load_total}")
+            self.load_job = self.root.after(1, self.load_chunk)
+
+    def finish_loading(self):
+        """Дочитывает список сразу (нужен полный список: сценарии, новая строка)."""
+        if self.load_job is not None:
+            self.root.after_cancel(self.load_job)
+        self.load_chunk(None)
+
+    def show_load_progress(self, done, total):
+        self.status_var.set(f"Загрузка сотрудников: {self.load_done - total + done} из {self.load_total}")
+        self.root.update_idletasks()
 
     def on_close(self):
+        if self.load_job is not None:
+            self.root.after_cancel(self.load_job)
+        loading = self.loader is not None
+        if loading:
+            self.loader.close()
+            self.loader = None
         self.save_data()
+        # Снимок результатов, чтобы следующий запуск обошёлся без расчёта
+        if not loading and not self.results_saved:
+            self.saver.submit_results(self.model.settings, self.model.ids, self.model.res)
+        self.saver.flush()
+        # Изменения, которые так и не удалось записать, не теряются молча
+        while self.check_save_errors():
+            if not messagebox.askretrycancel("Ошибка сохранения",
+                                             f"Не удалось сохранить изменения: {self.save_error}\n"
+                                             "Повторить? При отмене несохранённые правки будут потеряны."):
+                break
+            self.save_data()
+            self.saver.flush()
+        self.saver.close()
+        if DIAG.enabled:
+            try:
+                DIAG.dump(DIAG_FILE)
+            except OSError as e:
+                print(f"Ошибка записи диагностики: {e}")
         self.root.destroy()
 
 
 if __name__ == "__main__":
+    # Пул процессов сценариев в собранном PyInstaller приложении
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Калькулятор зарплат и бонусов")
+    parser.add_argument("--diag", action="store_true", help="включить диагностику (дамп в SALARY_DIAG_FILE)")
+    parser.add_argument("--profile", metavar="ЗАМЕР", help="снять cProfile для замера (load_data, calculate, ...)")
+    parser.add_argument("--data-dir", help="каталог с файлами отделов вместо общей базы")
+    parser.add_argument("--department", help="открываемый отдел из --data-dir")
+    args, _ = parser.parse_known_args()
+    if args.diag or args.profile: DIAG.enabled = True
+    if args.profile: DIAG.profile_target = args.profile
+    if args.data_dir: DATA_DIR = args.data_dir
+    if args.department: DEPARTMENT = args.department
     root = tk.Tk()
     app = SalaryApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -0,0 +1,359 @@
+"""Пакетный расчёт зарплат из командной строки, без Tk.
+
+Сотрудники читаются потоком из CSV, JSONL, файла в формате
+salary_data.json или базы приложения salary_data.sqlite3, считаются пачками тем же движком, что и в GUI, и сразу
+выводятся; в конце выводится строка итогов. Память не зависит от размера
+входного файла.
+
+    python salary_cli.py salary_data.json -o result.csv
+    python salary_cli.py salary_data.sqlite3 --totals-only
+    python salary_cli.py staff.csv --set coeff_success=0.3 --format jsonl
+    python salary_cli.py departments/ --department Sales --totals-only
+
+Каталог на входе -- данные по отделам (salary_shards): после сотрудников
+каждого отдела выводится строка итогов отдела, в конце -- итог компании.
+
+--kernel fixed считает в целых копейках (salary_fixed): результаты и итоги
+не зависят от порядка строк; --cross-check сверяет их с расчётом на float и
+пишет отчёт о расхождениях в stderr (код выхода 1, если они есть).
+
+    python salary_cli.py salary_data.json --kernel fixed --cross-check --rounding project=half_even
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from itertools import islice
+
+from salary_engine import (DEFAULT_SETTINGS, RESULT_KEYS, TotalsAggregator, employee_columns, iter_results,
+                           resolve_settings)
+from salary_fixed import CentsTotals, CrossCheck, iter_cents, rounding_policy, to_rubles
+from salary_projects import registry_from_data
+from salary_shards import company_settings, company_totals, department_totals, list_departments, read_shard, \
+    shard_settings
+from salary_store import SalaryStore
+
+BATCH_SIZE = 4096
+READ_CHUNK = 1 << 16
+TOTAL_NAME = "ИТОГО"
+# Начало файла базы SQLite
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+class _JsonStream:
+    """Минимальный потоковый разбор JSON: отдельные значения читаются raw_decode по мере надобности."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        data = self.f.read(READ_CHUNK)
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        self.eof = not data
+        return bool(data)
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self.fill(): raise ValueError("unexpected end of JSON")
+
+    def next_char(self):
+        c = self.peek()
+        self.pos += 1
+        return c
+
+    def expect(self, char):
+        c = self.next_char()
+        if c != char: raise ValueError(f"expected {char!r}, got {c!r}")
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(): raise
+                continue
+            # Число в самом конце буфера могло быть обрезано
+            if end == len(self.buf) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_data_file(f, header_only=False):
+    """Пары (ключ, значение) верхнего уровня salary_data.json.
+
+    Сотрудники отдаются по одному как ("employee", запись), не собирая массив в памяти.
+    header_only -- остановиться на массиве сотрудников, не разбирая его.
+    """
+    s = _JsonStream(f)
+    s.expect("{")
+    if s.peek() == "}": return
+    while True:
+        key = s.value()
+        s.expect(":")
+        if key == "employees":
+            if header_only: return
+            s.expect("[")
+            if s.peek() == "]":
+                s.next_char()
+            else:
+                while True:
+                    yield "employee", s.value()
+                    if s.next_char() == "]": break
+        else:
+            yield key, s.value()
+        if s.next_char() == "}": break
+
+
+def data_file_header(path):
+    """Ключи верхнего уровня salary_data.json, записанные до сотрудников.
+
+    Приложение всегда пишет настройки и проекты перед сотрудниками, поэтому
+    массив сотрудников ради них не разбирается.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return dict(iter_data_file(f, header_only=True))
+
+
+def data_file_value(path, name):
+    """Значение ключа верхнего уровня salary_data.json (до сотрудников) или {}."""
+    return data_file_header(path).get(name) or {}
+
+
+def data_file_settings(path):
+    return data_file_value(path, "settings")
+
+
+def store_header(path):
+    """Настройки и общие проекты из базы SQLite приложения -- как data_file_header."""
+    # SalaryStore создал бы пустую базу на месте опечатки в имени
+    if not os.path.isfile(path): raise FileNotFoundError(path)
+    store = SalaryStore(path)
+    try:
+        return {"settings": store.load_settings(), "projects": store.load_projects()}
+    finally:
+        store.close()
+
+
+def input_header(path, fmt):
+    """Настройки и общие проекты входного файла формата fmt; у CSV, JSONL и stdin их нет."""
+    if fmt == "sqlite": return store_header(path)
+    if fmt == "json" and path != "-": return data_file_header(path)
+    return {}
+
+
+def read_employees(path, fmt):
+    """Генератор записей сотрудников из файла (или stdin для "-")."""
+    if fmt == "sqlite":
+        store = SalaryStore(path)
+        try:
+            yield from store.iter_employees()
+        finally:
+            store.close()
+        return
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                if row.get("projects"): row["projects"] = json.loads(row["projects"])
+                else: row.pop("projects", None)
+                yield row
+        elif fmt == "jsonl":
+            for line in f:
+                if line.strip(): yield json.loads(line)
+        else:
+            for key, value in iter_data_file(f):
+                if key == "employee": yield value
+    finally:
+        if f is not sys.stdin: f.close()
+
+
+def calculate_stream(employees, settings, batch_size=BATCH_SIZE, registry=None, kernel=iter_results, check=None):
+    """Генератор (сотрудник, результаты) пачками по batch_size; registry -- общие проекты.
+
+    kernel(колонки, настройки) -- расчёт пачки (iter_results или iter_cents);
+    check -- CrossCheck, в который добавляется каждая пачка.
+    """
+    employees = iter(employees)
+    while True:
+        batch = list(islice(employees, batch_size))
+        if not batch: return
+        cols = employee_columns(batch, registry)
+        if check is not None: check.add(cols, settings)
+        yield from zip(batch, kernel(cols, settings))
+
+
+def detect_format(path, default="json"):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv": return "csv"
+    if ext in (".jsonl", ".ndjson"): return "jsonl"
+    if ext in (".sqlite3", ".sqlite", ".db"): return "sqlite"
+    # База SQLite с другим расширением узнаётся по заголовку файла
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            if f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC: return "sqlite"
+    return default
+
+
+def parse_overrides(pairs):
+    settings = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep or key not in DEFAULT_SETTINGS:
+            raise ValueError(f"неизвестная настройка: {pair}")
+        settings[key] = float(value)
+    return settings
+
+
+def parse_rounding(pairs):
+    """Правила округления из --rounding КОМПОНЕНТ=РЕЖИМ."""
+    policy = {}
+    for pair in pairs:
+        key, sep, mode = pair.partition("=")
+        if not sep: raise ValueError(f"ожидается КОМПОНЕНТ=РЕЖИМ: {pair}")
+        policy[key] = mode
+    rounding_policy(policy)
+    return policy
+
+
+def output_writer(args, out, cents=False):
+    """Функция write(имя, результаты) для выбранного формата вывода (CSV -- с заголовком).
+
+    cents -- результаты в копейках (iter_cents), выводятся в рублях.
+    """
+    out_fmt = args.format or detect_format(args.output or "", default="csv")
+    if out_fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(("name",) + RESULT_KEYS)
+        write = lambda name, res: writer.writerow((name,) + tuple(res))
+    else:
+        write = lambda name, res: out.write(
+            json.dumps(dict(name=name, **dict(zip(RESULT_KEYS, res))), ensure_ascii=False) + "\n")
+    if cents: return lambda name, res: write(name, to_rubles(res))
+    return write
+
+
+def kernel_for(args):
+    """(расчёт пачки, класс итогов) для --kernel."""
+    if args.kernel == "fixed":
+        policy = parse_rounding(args.rounding)
+        return lambda cols, settings: iter_cents(cols, settings, policy), CentsTotals
+    return iter_results, TotalsAggregator
+
+
+def run_departments(args, out, overrides, check=None):
+    """Каталог отделов: каждый отдел со своими настройками, итоги отделов и компании."""
+    departments = args.department or list_departments(args.input)
+    company = company_settings(args.input)
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as f:
+            company = resolve_settings(dict(company, **json.load(f)))
+    kernel, totals_type = kernel_for(args)
+    write = output_writer(args, out, cents=totals_type is CentsTotals)
+
+    if args.totals_only and kernel is iter_results and check is None:
+        # Только итоги: отделы разбираются параллельно
+        rows = department_totals(args.input, departments, company=company, overrides=overrides)
+        for department, _, sums in rows:
+            write(f"{TOTAL_NAME} {department}", sums)
+    else:
+        rows = []
+        for department in departments:
+            data = read_shard(args.input, department)
+            settings = dict(shard_settings(company, data["settings"]), **overrides)
+            registry = registry_from_data(data["projects"])
+            totals = totals_type()
+            for emp, res in calculate_stream(data["employees"], settings, registry=registry, kernel=kernel,
+                                             check=check):
+                totals.add(res)
+                if not args.totals_only: write(emp.get("name", ""), res)
+            rows.append((department, len(data["employees"]), totals.sums))
+            write(f"{TOTAL_NAME} {department}", totals.sums)
+    count, sums = company_totals(rows, totals_type)
+    write(TOTAL_NAME, sums)
+    return count
+
+
+def run(args, out, overrides, check=None):
+    if os.path.isdir(args.input):
+        return run_departments(args, out, overrides, check)
+    fmt = args.input_format or detect_format(args.input)
+    header = input_header(args.input, fmt)
+    settings = dict(header.get("settings") or {})
+    registry = registry_from_data(header["projects"]) if header.get("projects") else None
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+    settings.update(overrides)
+    settings = resolve_settings(settings)
+
+    kernel, totals_type = kernel_for(args)
+    totals = totals_type()
+    write = output_writer(args, out, cents=totals_type is CentsTotals)
+
+    count = 0
+    for emp, res in calculate_stream(read_employees(args.input, fmt), settings, registry=registry, kernel=kernel,
+                                     check=check):
+        totals.add(res)
+        count += 1
+        if not args.totals_only: write(emp.get("name", ""), res)
+    write(TOTAL_NAME, totals.sums)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Расчёт зарплат и бонусов без GUI")
+    parser.add_argument("input", help="CSV, JSONL, salary_data.json, база SQLite или каталог отделов; '-' -- stdin")
+    parser.add_argument("-o", "--output", help="файл результата (по умолчанию stdout)")
+    parser.add_argument("--input-format", choices=("csv", "jsonl", "json", "sqlite"))
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="формат результата")
+    parser.add_argument("--settings", help="JSON с настройками (ключи DEFAULT_SETTINGS)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="переопределить настройку")
+    parser.add_argument("--totals-only", action="store_true", help="выводить только строки итогов")
+    parser.add_argument("--department", action="append", help="только этот отдел каталога (можно несколько раз)")
+    parser.add_argument("--kernel", choices=("float", "fixed"), default="float",
+                        help="fixed -- расчёт в целых копейках")
+    parser.add_argument("--rounding", action="append", default=[], metavar="COMPONENT=MODE",
+                        help="округление составляющей (input, cnt_bonus, mnt_bonus, project): "
+                             "half_up, half_even или down")
+    parser.add_argument("--cross-check", action="store_true", help="сверить расчёт в копейках с float")
+    parser.add_argument("--tolerance", type=int, default=0, help="допустимое расхождение при сверке, коп.")
+    args = parser.parse_args(argv)
+    try:
+        overrides = parse_overrides(args.set)
+        policy = parse_rounding(args.rounding)
+        check = CrossCheck(args.tolerance, policy) if args.cross_check else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            count = run(args, out, overrides, check)
+    else:
+        out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="", write_through=False)
+        try:
+            count = run(args, out, overrides, check)
+        finally:
+            out.flush()
+            out.detach()
+    print(f"Сотрудников: {count}", file=sys.stderr)
+    if check is not None:
+        print(check.report(), file=sys.stderr)
+        if not check.ok: sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
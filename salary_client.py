@@ -0,0 +1,157 @@
+"""Клиент локального сервиса расчёта (salary_server) на http.client.
+
+    from salary_client import SalaryClient
+    with SalaryClient(port=8765) as client:
+        response = client.calculate(employees, settings={"coeff_success": 0.3})
+        for res in client.calculate_stream(employees): ...
+
+Из командной строки -- как salary_cli, но расчёт на сервере:
+
+    python salary_client.py salary_data.json --port 8765 --stream -o result.csv
+"""
+
+import argparse
+import http.client
+import io
+import json
+import sys
+
+from salary_cli import TOTAL_NAME, detect_format, input_header, output_writer, read_employees
+from salary_server import DEFAULT_HOST, DEFAULT_PORT
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class StreamResult:
+    """Результаты потокового ответа по одному сотруднику; count и totals -- после перебора."""
+
+    def __init__(self, response):
+        self.response = response
+        self.columns = json.loads(response.readline())["columns"]
+        self.count = None
+        self.totals = None
+
+    def __iter__(self):
+        for line in self.response:
+            row = json.loads(line)
+            if isinstance(row, dict):
+                self.count, self.totals = row["count"], row["totals"]
+                break
+            yield row
+        # Дочитываем конец ответа, чтобы соединение можно было использовать дальше
+        self.response.read()
+
+
+class SalaryClient:
+    """Соединение keep-alive с сервисом; запросы выполняются по одному."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=60):
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def request(self, method, path, body=None):
+        data = None if body is None else json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        self.conn.request(method, path, body=data, headers=headers)
+        response = self.conn.getresponse()
+        if response.status != 200:
+            message = response.read().decode("utf-8", "replace")
+            try:
+                message = json.loads(message)["error"]
+            except (ValueError, KeyError, TypeError):
+                pass
+            raise ServiceError(response.status, message)
+        return response
+
+    def health(self):
+        return json.load(self.request("GET", "/health"))
+
+    def calculate(self, employees, settings=None, projects=None, totals_only=False):
+        """{"columns", "count", "totals", "results"} для списка сотрудников."""
+        return json.load(self.request("POST", "/calculate", request_body(employees, settings, projects, totals_only)))
+
+    def calculate_batch(self, requests):
+        """Несколько расчётов одним запросом: requests -- тела /calculate (см. request_body)."""
+        return json.load(self.request("POST", "/calculate/batch", {"requests": list(requests)}))["responses"]
+
+    def calculate_stream(self, employees, settings=None, projects=None):
+        """StreamResult: результаты приходят частями, пока сервер считает остальных."""
+        return StreamResult(self.request("POST", "/calculate/stream", request_body(employees, settings, projects)))
+
+
+def request_body(employees, settings=None, projects=None, totals_only=False):
+    body = {"employees": list(employees)}
+    if settings: body["settings"] = dict(settings)
+    if projects: body["projects"] = {str(pid): proj for pid, proj in projects.items()}
+    if totals_only: body["totals_only"] = True
+    return body
+
+
+def run(args, out):
+    fmt = args.input_format or detect_format(args.input)
+    employees = list(read_employees(args.input, fmt))
+    header = input_header(args.input, fmt)
+    settings, projects = dict(header.get("settings") or {}), header.get("projects")
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+
+    write = output_writer(args, out)
+    with SalaryClient(args.host, args.port) as client:
+        if args.stream:
+            stream = client.calculate_stream(employees, settings, projects)
+            for i, res in enumerate(stream):
+                if not args.totals_only: write(employees[i].get("name", ""), res)
+            totals = stream.totals
+        else:
+            response = client.calculate(employees, settings, projects, totals_only=args.totals_only)
+            for emp, res in zip(employees, response.get("results", ())):
+                write(emp.get("name", ""), res)
+            totals = response["totals"]
+    write(TOTAL_NAME, totals)
+    return len(employees)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Расчёт зарплат через локальный сервис")
+    parser.add_argument("input", help="CSV, JSONL, salary_data.json или база SQLite; '-' -- stdin")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-o", "--output", help="файл результата (по умолчанию stdout)")
+    parser.add_argument("--input-format", choices=("csv", "jsonl", "json", "sqlite"))
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="формат результата")
+    parser.add_argument("--settings", help="JSON с настройками (ключи DEFAULT_SETTINGS)")
+    parser.add_argument("--stream", action="store_true", help="потоковый ответ (для больших списков)")
+    parser.add_argument("--totals-only", action="store_true", help="выводить только строку итогов")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                count = run(args, out)
+        else:
+            out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="", write_through=False)
+            try:
+                count = run(args, out)
+            finally:
+                out.flush()
+                out.detach()
+    except (OSError, ServiceError) as e:
+        sys.exit(f"Ошибка сервиса: {e}")
+    print(f"Сотрудников: {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Встроенная диагностика: счётчики вызовов и гистограммы времени.
+
+Включается переменной окружения SALARY_DIAG=1 или флагом --diag. Пока
+диагностика выключена, timed() и count() ничего не делают. Для одного
+выбранного действия (SALARY_PROFILE=<имя замера> или --profile) можно
+снять профиль cProfile -- он попадёт в JSON-дамп.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager, nullcontext
+
+# Верхние границы корзин гистограммы, мс; последняя корзина -- всё, что дольше
+HIST_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+PROFILE_LINES = 40
+
+
+class Metric:
+    """Число событий и, для замеров времени, сумма, максимум и гистограмма."""
+
+    def __init__(self):
+        self.count = 0
+        self.timed = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HIST_BOUNDS_MS) + 1)
+
+    def observe(self, seconds):
+        ms = seconds * 1000.0
+        self.count += 1
+        self.timed += 1
+        self.total += ms
+        if ms > self.max: self.max = ms
+        for i, bound in enumerate(HIST_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.timed if self.timed else 0.0
+
+    def to_dict(self):
+        data = {"count": self.count}
+        if self.timed:
+            data.update(total_ms=self.total, mean_ms=self.mean, max_ms=self.max,
+                        histogram=dict(zip([f"<={b}" for b in HIST_BOUNDS_MS] + ["inf"], self.buckets)))
+        return data
+
+
+class Diagnostics:
+    def __init__(self, enabled=False, profile=None):
+        self.enabled = enabled
+        self.profile_target = profile
+        self.metrics = {}
+        self.profiles = {}
+
+    def metric(self, name):
+        m = self.metrics.get(name)
+        if m is None:
+            m = self.metrics[name] = Metric()
+        return m
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.metric(name).count += n
+
+    def timed(self, name):
+        """Контекст замера времени блока; для profile_target -- ещё и профиль."""
+        if not self.enabled: return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        profiler = cProfile.Profile() if name == self.profile_target else None
+        start = time.perf_counter()
+        if profiler: profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                self.profiles[name] = profile_text(profiler)
+            self.metric(name).observe(time.perf_counter() - start)
+
+    def profile(self, name, fn, *args):
+        """Выполняет fn под cProfile независимо от enabled; текст профиля сохраняется под name."""
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, *args)
+        finally:
+            self.profiles[name] = profile_text(profiler)
+
+    def reset(self):
+        self.metrics.clear()
+        self.profiles.clear()
+
+    def snapshot(self):
+        return {"metrics": {name: m.to_dict() for name, m in sorted(self.metrics.items())},
+                "profiles": dict(self.profiles)}
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=4)
+
+
+def profile_text(profiler, lines=PROFILE_LINES):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(lines)
+    return out.getvalue()
+
+
+DIAG = Diagnostics(enabled=os.environ.get("SALARY_DIAG", "") not in ("", "0"),
+                   profile=os.environ.get("SALARY_PROFILE") or None)
+if DIAG.profile_target: DIAG.enabled = True
@@ -0,0 +1,334 @@
+"""Расчёт зарплат и бонусов без привязки к Tk.
+
+Все правила живут здесь: GUI и остальные точки входа вызывают одни и те же
+функции, поэтому результаты совпадают до последнего знака.
+"""
+
+# --- КОНСТАНТЫ ---
+DEFAULT_SETTINGS = {
+    "coeff_fail": 0.18,
+    "coeff_success": 0.25,
+    "pct_intern_junior": 1.5,
+    "pct_junior_plus": 0.3,
+    "bonus_rating_mid": 1250,  # 4.50 - 4.99
+    "bonus_rating_high": 2500,  # 5.00
+    "bonus_mentoring": 2500
+}
+
+LEVELS = ["Intern", "Junior", "Junior+", "Middle", "Middle+"]
+ROLES = ["SEO copywriter", "SEO assistant", "SEO strategist", "R&D specialist"]
+
+# Коды уровней для колоночного расчёта
+LEVEL_UNKNOWN = -1
+LEVEL_INTERN = 0
+LEVEL_JUNIOR = 1
+LEVEL_JUNIOR_PLUS = 2
+LEVEL_MIDDLE = 3
+LEVEL_MIDDLE_PLUS = 4
+
+# Границы оценки для бонуса за оценку (включительно): средний -- RATING_MID, высокий -- от RATING_HIGH
+RATING_MID = (4.50, 4.99)
+RATING_HIGH = 5.00
+
+# Входные колонки расчёта
+INPUT_COLUMNS = ("base_cur", "base_new", "pages", "content_base", "rating", "mentees",
+                 "level", "budget", "budget_success")
+
+# 16 колонок результата в порядке столбцов таблицы (11..26)
+RESULT_KEYS = (
+    "budget", "cnt_bonus", "rtg_bonus", "mnt_bonus",
+    "p_min", "p_real", "p_max",
+    "tb_min", "tb_real", "tb_max",
+    "sc_min", "sc_real", "sc_max",
+    "sn_min", "sn_real", "sn_max",
+)
+
+
+def to_number(value, default=0.0):
+    """Число из сырого значения (JSON, CSV); пустое/битое -> default."""
+    if value is None or value == "": return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def level_code(level):
+    """Код уровня. Всё, что содержит "Middle", исключается из контент-бонуса."""
+    try:
+        return LEVELS.index(level)
+    except ValueError:
+        return LEVEL_MIDDLE if "Middle" in (level or "") else LEVEL_UNKNOWN
+
+
+def project_share(project, registry=None):
+    """(бюджет, цели достигнуты?) одного проекта сотрудника.
+
+    Проект задаётся либо целиком ({"name", "budget", "success"}), либо ссылкой
+    на общий проект реестра ({"project": id, "share": доля бюджета}).
+    registry -- общие проекты {id: проект}; ссылка на отсутствующий в нём
+    проект даёт нулевой бюджет.
+    """
+    if "project" not in project:
+        return to_number(project.get("budget", 0)), bool(project.get("success", False))
+    shared = (registry or {}).get(project["project"])
+    if shared is None: return 0.0, False
+    return to_number(project.get("share"), 1.0) * to_number(shared.get("budget", 0)), bool(shared.get("success", False))
+
+
+def project_sums(projects, registry=None):
+    """(общий бюджет, бюджет проектов с достигнутыми целями)."""
+    total = 0.0
+    success = 0.0
+    for p in projects or []:
+        budget, succeeded = project_share(p, registry)
+        total += budget
+        if succeeded:
+            success += budget
+    return total, success
+
+
+def resolve_settings(settings=None):
+    """Настройки в виде чисел; отсутствующие ключи берутся из DEFAULT_SETTINGS."""
+    cfg = dict(DEFAULT_SETTINGS)
+    if settings:
+        for k, v in settings.items():
+            if k in cfg: cfg[k] = to_number(v, cfg[k])
+    return cfg
+
+
+def employee_inputs(emp, registry=None):
+    """Словарь входных значений одного сотрудника в формате salary_data.json.
+
+    Вместо списка "projects" допускаются готовые суммы "budget" и
+    "budget_success" (плоские форматы вроде CSV). registry -- как в project_share.
+    """
+    if "projects" not in emp and "budget" in emp:
+        budget, budget_success = to_number(emp.get("budget")), to_number(emp.get("budget_success"))
+    else:
+        budget, budget_success = project_sums(emp.get("projects"), registry)
+    return {
+        "base_cur": to_number(emp.get("base_cur")),
+        "base_new": to_number(emp.get("base_new")),
+        "pages": to_number(emp.get("pages")),
+        "content_base": to_number(emp.get("content_base")),
+        "rating": to_number(emp.get("rating")),
+        "mentees": to_number(emp.get("mentees")),
+        "level": level_code(emp.get("level", "Intern")),
+        "budget": budget,
+        "budget_success": budget_success,
+    }
+
+
+def employee_columns(employees, registry=None):
+    """Колонки INPUT_COLUMNS для списка сотрудников."""
+    cols = {k: [] for k in INPUT_COLUMNS}
+    for emp in employees:
+        for k, v in employee_inputs(emp, registry).items():
+            cols[k].append(v)
+    return cols
+
+
+def iter_results(cols, settings):
+    """Построчно отдаёт кортежи из 16 результатов (порядок RESULT_KEYS).
+
+    cols -- последовательности одинаковой длины по ключам INPUT_COLUMNS.
+    """
+    cfg = resolve_settings(settings)
+    c_fail = cfg["coeff_fail"]
+    c_succ = cfg["coeff_success"]
+    rating_mid = cfg["bonus_rating_mid"]
+    rating_high = cfg["bonus_rating_high"]
+    mid_lo, mid_hi = RATING_MID
+    mentoring = cfg["bonus_mentoring"]
+    pct_ij = cfg["pct_intern_junior"]
+    pct_jp = cfg["pct_junior_plus"]
+    # Доля от базы за страницу сверх плана по коду уровня
+    rate_by_level = {LEVEL_INTERN: pct_ij / 100.0, LEVEL_JUNIOR: pct_ij / 100.0,
+                     LEVEL_JUNIOR_PLUS: pct_jp / 100.0}
+
+    for (base_cur, base_new, pages, content_base, rating, mentees,
+         level, budget, budget_success) in zip(*(cols[k] for k in INPUT_COLUMNS)):
+        if level >= LEVEL_MIDDLE or pages <= content_base:
+            cnt_cur = cnt_new = 0.0
+        else:
+            rate = rate_by_level.get(level, 0.0)
+            extra = pages - content_base
+            cnt_cur = extra * (base_cur * rate)
+            cnt_new = extra * (base_new * rate)
+
+        if mid_lo <= rating <= mid_hi:
+            rtg = rating_mid
+        elif rating >= RATING_HIGH:
+            rtg = rating_high
+        else:
+            rtg = 0.0
+
+        mnt = mentees * mentoring
+
+        p_min = budget * c_fail
+        p_max = budget * c_succ
+        p_real = (budget - budget_success) * c_fail + budget_success * c_succ
+
+        fixed_cur = cnt_cur + rtg + mnt
+        fixed_new = cnt_new + rtg + mnt
+        tb_min = fixed_cur + p_min
+        tb_real = fixed_cur + p_real
+        tb_max = fixed_cur + p_max
+
+        yield (budget, cnt_cur, rtg, mnt,
+               p_min, p_real, p_max,
+               tb_min, tb_real, tb_max,
+               base_cur + tb_min, base_cur + tb_real, base_cur + tb_max,
+               base_new + (fixed_new + p_min), base_new + (fixed_new + p_real), base_new + (fixed_new + p_max))
+
+
+def settings_affected(cols, old, new):
+    """Индексы строк, чьи результаты зависят от настроек, изменившихся между old и new.
+
+    Повторяет ветвления iter_results: например, bonus_mentoring влияет только на
+    строки с наставничеством, коэффициенты проектов -- только на строки с бюджетом.
+    """
+    old, new = resolve_settings(old), resolve_settings(new)
+    changed = {k for k in new if new[k] != old[k]}
+    if not changed: return []
+    coeffs = bool(changed & {"coeff_fail", "coeff_success"})
+    content_levels = set()
+    if "pct_intern_junior" in changed: content_levels.update((LEVEL_INTERN, LEVEL_JUNIOR))
+    if "pct_junior_plus" in changed: content_levels.add(LEVEL_JUNIOR_PLUS)
+    mid = "bonus_rating_mid" in changed
+    high = "bonus_rating_high" in changed
+    mid_lo, mid_hi = RATING_MID
+    mentoring = "bonus_mentoring" in changed
+
+    rows = []
+    for i, (pages, content_base, rating, mentees, level, budget) in enumerate(zip(
+            cols["pages"], cols["content_base"], cols["rating"], cols["mentees"], cols["level"], cols["budget"])):
+        if ((coeffs and budget) or (mentoring and mentees)
+                or (level in content_levels and pages > content_base)
+                or (mid and mid_lo <= rating <= mid_hi) or (high and rating >= RATING_HIGH)):
+            rows.append(i)
+    return rows
+
+
+def calculate_columns(cols, settings):
+    """Пакетный расчёт всего списка: словарь RESULT_KEYS -> список значений."""
+    rows = list(iter_results(cols, settings))
+    if not rows:
+        return {k: [] for k in RESULT_KEYS}
+    return {k: list(col) for k, col in zip(RESULT_KEYS, zip(*rows))}
+
+
+def calculate_employee(inputs, settings):
+    """Результаты одного сотрудника (кортеж в порядке RESULT_KEYS)."""
+    cols = {k: (inputs[k],) for k in INPUT_COLUMNS}
+    return next(iter_results(cols, settings))
+
+
+def sum_results(rows):
+    """Итоги по 16 колонкам для последовательности кортежей результатов."""
+    sums = [0.0] * len(RESULT_KEYS)
+    for row in rows:
+        for i, val in enumerate(row):
+            sums[i] += val
+    return sums
+
+
+# Суммы по списку, от которых итоги зависят линейно по каждой настройке
+AGGREGATE_KEYS = ("n", "base_cur", "base_new", "content_ij_cur", "content_ij_new", "content_jp_cur",
+                  "content_jp_new", "rating_mid", "rating_high", "mentees", "budget", "budget_success")
+
+
+def roster_aggregates(cols):
+    """Один проход по колонкам: суммы для totals_from_aggregates.
+
+    Итоги по списку линейны по каждой настройке, поэтому после этого прохода
+    итоги для любого набора настроек считаются за O(1).
+    """
+    agg = dict.fromkeys(AGGREGATE_KEYS, 0.0)
+    mid_lo, mid_hi = RATING_MID
+    for (base_cur, base_new, pages, content_base, rating, mentees,
+         level, budget, budget_success) in zip(*(cols[k] for k in INPUT_COLUMNS)):
+        agg["n"] += 1
+        agg["base_cur"] += base_cur
+        agg["base_new"] += base_new
+        if level < LEVEL_MIDDLE and pages > content_base:
+            extra = pages - content_base
+            if level in (LEVEL_INTERN, LEVEL_JUNIOR):
+                agg["content_ij_cur"] += extra * base_cur
+                agg["content_ij_new"] += extra * base_new
+            elif level == LEVEL_JUNIOR_PLUS:
+                agg["content_jp_cur"] += extra * base_cur
+                agg["content_jp_new"] += extra * base_new
+        if mid_lo <= rating <= mid_hi:
+            agg["rating_mid"] += 1
+        elif rating >= RATING_HIGH:
+            agg["rating_high"] += 1
+        agg["mentees"] += mentees
+        agg["budget"] += budget
+        agg["budget_success"] += budget_success
+    return agg
+
+
+def merge_aggregates(parts):
+    total = dict.fromkeys(AGGREGATE_KEYS, 0.0)
+    for part in parts:
+        for k in AGGREGATE_KEYS:
+            total[k] += part[k]
+    return total
+
+
+def totals_from_aggregates(agg, settings):
+    """Итоги по 16 колонкам (порядок RESULT_KEYS) из roster_aggregates.
+
+    Совпадают с суммой построчных результатов с точностью до округления float.
+    """
+    cfg = resolve_settings(settings)
+    c_fail = cfg["coeff_fail"]
+    c_succ = cfg["coeff_success"]
+    rate_ij = cfg["pct_intern_junior"] / 100.0
+    rate_jp = cfg["pct_junior_plus"] / 100.0
+    cnt_cur = agg["content_ij_cur"] * rate_ij + agg["content_jp_cur"] * rate_jp
+    cnt_new = agg["content_ij_new"] * rate_ij + agg["content_jp_new"] * rate_jp
+    rtg = agg["rating_mid"] * cfg["bonus_rating_mid"] + agg["rating_high"] * cfg["bonus_rating_high"]
+    mnt = agg["mentees"] * cfg["bonus_mentoring"]
+    budget = agg["budget"]
+    p_min = budget * c_fail
+    p_max = budget * c_succ
+    p_real = (budget - agg["budget_success"]) * c_fail + agg["budget_success"] * c_succ
+    fixed_cur = cnt_cur + rtg + mnt
+    fixed_new = cnt_new + rtg + mnt
+    tb = (fixed_cur + p_min, fixed_cur + p_real, fixed_cur + p_max)
+    tb_new = (fixed_new + p_min, fixed_new + p_real, fixed_new + p_max)
+    return [budget, cnt_cur, rtg, mnt, p_min, p_real, p_max, *tb,
+            *(agg["base_cur"] + v for v in tb), *(agg["base_new"] + v for v in tb_new)]
+
+
+class TotalsAggregator:
+    """Текущие итоги по 16 колонкам.
+
+    Правка строки применяет только разницу между старым и новым результатом,
+    поэтому стоимость не зависит от размера списка. reset() пересчитывает
+    суммы целиком -- после смены глобальных настроек.
+    """
+
+    def __init__(self, rows=()):
+        self.sums = sum_results(rows)
+
+    def reset(self, rows=()):
+        self.sums = sum_results(rows)
+
+    def add(self, row):
+        sums = self.sums
+        for i, val in enumerate(row):
+            sums[i] += val
+
+    def remove(self, row):
+        sums = self.sums
+        for i, val in enumerate(row):
+            sums[i] -= val
+
+    def replace(self, old, new):
+        sums = self.sums
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b: sums[i] += b - a
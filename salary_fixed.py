@@ -0,0 +1,340 @@
+"""Расчёт в целых копейках: воспроизводимые до копейки результаты и итоги.
+
+Деньги -- целые копейки (int64), коэффициенты и проценты -- целые в
+миллионных долях, страницы и наставляемые -- в сотых. Каждая составляющая
+бонуса округляется до копейки один раз по своему правилу (ROUNDING), всё
+остальное -- сложение целых, поэтому результат и итоги не зависят ни от
+порядка строк, ни от того, как список разбит на пачки.
+
+Входные значения переводятся в копейки по той десятичной записи, которой
+их ввели (1234.57 -> 123457), а не по двоичному float.
+
+С numpy весь список считается векторно в массивах int64 (быстрее расчёта на
+float); без numpy работает та же арифметика на целых Python. Обе реализации
+дают одинаковые копейки; значения, при которых int64 может переполниться
+(см. LIMITS), всегда считаются на целых Python.
+
+    from salary_fixed import calculate_cents, cross_check
+    cents = calculate_cents(cols, settings)   # RESULT_KEYS -> array('q')
+    print(cross_check(cols, settings).report())
+"""
+
+import math
+from array import array
+from decimal import ROUND_DOWN, ROUND_HALF_EVEN, ROUND_HALF_UP, Decimal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from salary_engine import (INPUT_COLUMNS, LEVEL_INTERN, LEVEL_JUNIOR, LEVEL_JUNIOR_PLUS, LEVEL_MIDDLE, RATING_HIGH,
+                           RATING_MID, RESULT_KEYS, TotalsAggregator, iter_results, resolve_settings)
+
+CENTS = 100
+# Коэффициенты проектов -- в миллионных; проценты контент-бонуса -- в миллионных долях процента
+COEFF_SCALE = 10 ** 6
+# Страницы, план по страницам и число наставляемых -- в сотых
+QTY_SCALE = 100
+# Контент-бонус: страницы * база * процент / CONTENT_DEN
+CONTENT_DEN = QTY_SCALE * 100 * COEFF_SCALE
+
+ROUNDING_MODES = {"half_up": ROUND_HALF_UP, "half_even": ROUND_HALF_EVEN, "down": ROUND_DOWN}
+# Правило округления до копейки по составляющим; "input" -- перевод входных значений и настроек
+ROUNDING = {"input": ROUND_HALF_UP, "cnt_bonus": ROUND_HALF_UP, "mnt_bonus": ROUND_HALF_UP,
+            "project": ROUND_HALF_UP}
+
+MONEY_COLUMNS = ("base_cur", "base_new", "budget", "budget_success")
+QTY_COLUMNS = ("pages", "content_base", "mentees")
+MONEY_SETTINGS = ("bonus_rating_mid", "bonus_rating_high", "bonus_mentoring")
+COEFF_SETTINGS = ("coeff_fail", "coeff_success", "pct_intern_junior", "pct_junior_plus")
+
+# Пределы (по модулю) для расчёта в int64: 100 млн руб. в поле, 100 000 страниц,
+# коэффициент до 10, процент до 100. Промежуточные произведения не больше 1e18.
+LIMITS = {"money": 10 ** 10, "qty": 10 ** 7, "coeff_fail": 10 * COEFF_SCALE, "coeff_success": 10 * COEFF_SCALE,
+          "pct_intern_junior": 100 * COEFF_SCALE, "pct_junior_plus": 100 * COEFF_SCALE}
+
+
+def rounding_policy(policy=None):
+    """ROUNDING с заменами из policy ({составляющая: "half_up" | "half_even" | "down" или режим decimal})."""
+    rules = dict(ROUNDING)
+    for key, mode in (policy or {}).items():
+        if key not in rules: raise ValueError(f"неизвестная составляющая округления: {key}")
+        rules[key] = ROUNDING_MODES.get(mode, mode)
+        if rules[key] not in ROUNDING_MODES.values(): raise ValueError(f"неизвестное округление: {mode}")
+    return rules
+
+
+def to_scaled(value, scale, mode=ROUND_HALF_UP):
+    """Целое value * scale по десятичной записи value: to_scaled(1234.57, 100) == 123457."""
+    if not math.isfinite(value): raise ValueError(f"не число: {value}")
+    n = round(value * scale)
+    if n / scale == value: return n
+    return int((Decimal(repr(value)) * scale).to_integral_value(rounding=mode))
+
+
+def _carry(q, r, den, mode):
+    """Поправка к частному q (остаток r, делитель den) по правилу округления.
+
+    Одни и те же выражения работают и с целыми Python, и с массивами numpy.
+    """
+    if mode == ROUND_DOWN: return 0
+    if mode == ROUND_HALF_UP: return 2 * r >= den
+    return (2 * r > den) | ((2 * r == den) & (q % 2 == 1))
+
+
+def round_div(num, den, mode):
+    """num / den, округлённое до целого по mode (половины -- от нуля или к чётному)."""
+    q, r = divmod(abs(num), den)
+    q += _carry(q, r, den, mode)
+    return -q if num < 0 else q
+
+
+def fixed_settings(settings=None, policy=None):
+    """Настройки в целых: суммы -- в копейках, коэффициенты и проценты -- в миллионных."""
+    cfg = resolve_settings(settings)
+    mode = rounding_policy(policy)["input"]
+    fixed = {k: to_scaled(cfg[k], CENTS, mode) for k in MONEY_SETTINGS}
+    fixed.update((k, to_scaled(cfg[k], COEFF_SCALE, mode)) for k in COEFF_SETTINGS)
+    return fixed
+
+
+# --- Расчёт на целых Python ---
+
+def _iter_python(cols, cfg, rules):
+    mode = rules["input"]
+    r_cnt, r_mnt, r_prj = rules["cnt_bonus"], rules["mnt_bonus"], rules["project"]
+    c_fail, c_succ = cfg["coeff_fail"], cfg["coeff_success"]
+    rating_mid, rating_high, mentoring = cfg["bonus_rating_mid"], cfg["bonus_rating_high"], cfg["bonus_mentoring"]
+    mid_lo, mid_hi = RATING_MID
+    rate_by_level = {LEVEL_INTERN: cfg["pct_intern_junior"], LEVEL_JUNIOR: cfg["pct_intern_junior"],
+                     LEVEL_JUNIOR_PLUS: cfg["pct_junior_plus"]}
+
+    for (base_cur, base_new, pages, content_base, rating, mentees,
+         level, budget, budget_success) in zip(*(cols[k] for k in INPUT_COLUMNS)):
+        base_cur, base_new = to_scaled(base_cur, CENTS, mode), to_scaled(base_new, CENTS, mode)
+        budget, budget_success = to_scaled(budget, CENTS, mode), to_scaled(budget_success, CENTS, mode)
+        extra = to_scaled(pages, QTY_SCALE, mode) - to_scaled(content_base, QTY_SCALE, mode)
+        if level >= LEVEL_MIDDLE or extra <= 0:
+            cnt_cur = cnt_new = 0
+        else:
+            rate = rate_by_level.get(level, 0)
+            cnt_cur = round_div(extra * base_cur * rate, CONTENT_DEN, r_cnt)
+            cnt_new = round_div(extra * base_new * rate, CONTENT_DEN, r_cnt)
+
+        # Оценка не деньги: границы те же, что в iter_results
+        if mid_lo <= rating <= mid_hi:
+            rtg = rating_mid
+        elif rating >= RATING_HIGH:
+            rtg = rating_high
+        else:
+            rtg = 0
+
+        mnt = round_div(to_scaled(mentees, QTY_SCALE, mode) * mentoring, QTY_SCALE, r_mnt)
+
+        p_min = round_div(budget * c_fail, COEFF_SCALE, r_prj)
+        p_max = round_div(budget * c_succ, COEFF_SCALE, r_prj)
+        p_real = round_div((budget - budget_success) * c_fail + budget_success * c_succ, COEFF_SCALE, r_prj)
+
+        fixed_cur = cnt_cur + rtg + mnt
+        fixed_new = cnt_new + rtg + mnt
+        tb_min, tb_real, tb_max = fixed_cur + p_min, fixed_cur + p_real, fixed_cur + p_max
+        yield (budget, cnt_cur, rtg, mnt,
+               p_min, p_real, p_max,
+               tb_min, tb_real, tb_max,
+               base_cur + tb_min, base_cur + tb_real, base_cur + tb_max,
+               base_new + fixed_new + p_min, base_new + fixed_new + p_real, base_new + fixed_new + p_max)
+
+
+# --- Расчёт в массивах numpy ---
+
+def _scaled_numpy(values, scale, mode, limit):
+    """Массив int64 value * scale (как to_scaled) или None, если значения вне limit."""
+    x = np.asarray(values, dtype=np.float64)
+    if not np.isfinite(x).all(): return None
+    n = np.rint(x * scale)
+    if n.size and np.abs(n).max() > limit: return None
+    out = n.astype(np.int64)
+    # Значения не на сетке (больше знаков, чем в копейках) -- по десятичной записи
+    for i in np.flatnonzero(n / scale != x).tolist():
+        out[i] = to_scaled(float(x[i]), scale, mode)
+    return out
+
+
+def _round_numpy(num, den, mode):
+    q, r = np.divmod(np.abs(num), den)
+    q += _carry(q, r, den, mode)
+    return np.where(num < 0, -q, q)
+
+
+def _content_numpy(extra, base, rate, mode):
+    """round(extra * base * rate / CONTENT_DEN) без переполнения int64 (extra >= 0).
+
+    base * rate раскладывается на частное и остаток по CONTENT_DEN, чтобы
+    произведение с extra не выходило за 1e18.
+    """
+    product = base * rate
+    qb, rb = np.divmod(np.abs(product), CONTENT_DEN)
+    q_rest, r = np.divmod(extra * rb, CONTENT_DEN)
+    q = extra * qb + q_rest
+    q += _carry(q, r, CONTENT_DEN, mode)
+    return np.where(product < 0, -q, q)
+
+
+def _calculate_numpy(cols, cfg, rules):
+    """Колонки результата (int64) или None, если входные значения вне LIMITS."""
+    if any(abs(cfg[k]) > LIMITS[k] for k in COEFF_SETTINGS) or \
+            any(abs(cfg[k]) > LIMITS["money"] for k in MONEY_SETTINGS):
+        return None
+    mode = rules["input"]
+    q = {}
+    for keys, scale, limit in ((MONEY_COLUMNS, CENTS, LIMITS["money"]), (QTY_COLUMNS, QTY_SCALE, LIMITS["qty"])):
+        for k in keys:
+            q[k] = _scaled_numpy(cols[k], scale, mode, limit)
+            if q[k] is None: return None
+    level = np.asarray(cols["level"], dtype=np.int64)
+    rating = np.asarray(cols["rating"], dtype=np.float64)
+
+    rate = np.zeros(len(level), dtype=np.int64)
+    rate[(level == LEVEL_INTERN) | (level == LEVEL_JUNIOR)] = cfg["pct_intern_junior"]
+    rate[level == LEVEL_JUNIOR_PLUS] = cfg["pct_junior_plus"]
+    extra = q["pages"] - q["content_base"]
+    extra = np.where((level < LEVEL_MIDDLE) & (extra > 0), extra, 0)
+    cnt_cur = _content_numpy(extra, q["base_cur"], rate, rules["cnt_bonus"])
+    cnt_new = _content_numpy(extra, q["base_new"], rate, rules["cnt_bonus"])
+
+    mid = (rating >= RATING_MID[0]) & (rating <= RATING_MID[1])
+    rtg = np.where(mid, cfg["bonus_rating_mid"], np.where(rating >= RATING_HIGH, cfg["bonus_rating_high"], 0))
+    rtg = rtg.astype(np.int64)
+    mnt = _round_numpy(q["mentees"] * cfg["bonus_mentoring"], QTY_SCALE, rules["mnt_bonus"])
+
+    budget, budget_success = q["budget"], q["budget_success"]
+    r_prj = rules["project"]
+    p_min = _round_numpy(budget * cfg["coeff_fail"], COEFF_SCALE, r_prj)
+    p_max = _round_numpy(budget * cfg["coeff_success"], COEFF_SCALE, r_prj)
+    p_real = _round_numpy((budget - budget_success) * cfg["coeff_fail"] + budget_success * cfg["coeff_success"],
+                          COEFF_SCALE, r_prj)
+
+    fixed_cur = cnt_cur + rtg + mnt
+    fixed_new = cnt_new + rtg + mnt
+    tb = (fixed_cur + p_min, fixed_cur + p_real, fixed_cur + p_max)
+    sn = (fixed_new + p_min, fixed_new + p_real, fixed_new + p_max)
+    return (budget, cnt_cur, rtg, mnt, p_min, p_real, p_max, *tb,
+            *(q["base_cur"] + v for v in tb), *(q["base_new"] + v for v in sn))
+
+
+# --- Точки входа ---
+
+def calculate_cents(cols, settings, policy=None, use_numpy=None):
+    """Пакетный расчёт всего списка: RESULT_KEYS -> array('q') значений в копейках.
+
+    cols -- колонки INPUT_COLUMNS (как для iter_results); policy -- замены в ROUNDING.
+    """
+    cfg, rules = fixed_settings(settings, policy), rounding_policy(policy)
+    use_numpy = np is not None if use_numpy is None else use_numpy
+    columns = _calculate_numpy(cols, cfg, rules) if use_numpy else None
+    if columns is not None:
+        return {k: array("q", col.tobytes()) for k, col in zip(RESULT_KEYS, columns)}
+    result = {k: array("q") for k in RESULT_KEYS}
+    targets = [result[k] for k in RESULT_KEYS]
+    for row in _iter_python(cols, cfg, rules):
+        for target, val in zip(targets, row):
+            target.append(val)
+    return result
+
+
+def iter_cents(cols, settings, policy=None, use_numpy=None):
+    """Как iter_results, но кортежи целых копеек; весь список считается одним пакетом."""
+    columns = calculate_cents(cols, settings, policy, use_numpy)
+    return zip(*(columns[k] for k in RESULT_KEYS))
+
+
+def to_rubles(row):
+    """Кортеж копеек -> рубли (float с точной записью до копейки)."""
+    return tuple(v / CENTS for v in row)
+
+
+class CentsTotals:
+    """Итоги по 16 колонкам в копейках: точные целые, не зависят от порядка строк."""
+
+    def __init__(self, rows=()):
+        self.sums = [0] * len(RESULT_KEYS)
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        sums = self.sums
+        for i, val in enumerate(row):
+            sums[i] += val
+
+    def rubles(self):
+        return list(to_rubles(self.sums))
+
+
+# --- Сверка с расчётом на float ---
+
+class CrossCheck:
+    """Сверка копеечного расчёта с iter_results; пачки добавляются по порядку строк.
+
+    Расхождение -- результат float, округлённый до копейки (половина -- вверх,
+    по десятичной записи), отличается от копеечного больше чем на tolerance
+    копеек. Итоги сверяются так же.
+    """
+
+    def __init__(self, tolerance=0, policy=None, max_examples=20, use_numpy=None):
+        self.tolerance = tolerance
+        self.policy = policy
+        self.max_examples = max_examples
+        self.use_numpy = use_numpy
+        self.count = 0
+        self.mismatches = dict.fromkeys(RESULT_KEYS, 0)
+        self.max_diff = dict.fromkeys(RESULT_KEYS, 0)
+        # (номер строки, колонка, значение float, значение в копейках)
+        self.examples = []
+        self.float_totals = TotalsAggregator()
+        self.cents_totals = CentsTotals()
+
+    def add(self, cols, settings):
+        tolerance = self.tolerance
+        for res, cents in zip(iter_results(cols, settings), iter_cents(cols, settings, self.policy, self.use_numpy)):
+            self.float_totals.add(res)
+            self.cents_totals.add(cents)
+            for key, val, c in zip(RESULT_KEYS, res, cents):
+                diff = abs(to_scaled(val, CENTS) - c)
+                if diff <= tolerance: continue
+                self.mismatches[key] += 1
+                self.max_diff[key] = max(self.max_diff[key], diff)
+                if len(self.examples) < self.max_examples:
+                    self.examples.append((self.count, key, val, c))
+            self.count += 1
+        return self
+
+    @property
+    def diverged(self):
+        return sum(self.mismatches.values())
+
+    def totals_diff(self):
+        """[(колонка, итог float, итог в копейках)] для расходящихся итогов."""
+        return [(key, total, cents) for key, total, cents in
+                zip(RESULT_KEYS, self.float_totals.sums, self.cents_totals.sums)
+                if abs(to_scaled(total, CENTS) - cents) > self.tolerance]
+
+    @property
+    def ok(self):
+        return not self.diverged and not self.totals_diff()
+
+    def report(self):
+        lines = [f"Сверка с float: строк {self.count}, расхождений {self.diverged} (допуск {self.tolerance} коп.)"]
+        for key in RESULT_KEYS:
+            if self.mismatches[key]:
+                lines.append(f"  {key}: {self.mismatches[key]} строк, до {self.max_diff[key]} коп.")
+        for row, key, val, cents in self.examples:
+            lines.append(f"  строка {row + 1}, {key}: float {val!r}, в копейках {cents / CENTS:.2f}")
+        for key, total, cents in self.totals_diff():
+            lines.append(f"  итог {key}: float {total!r}, в копейках {cents / CENTS:.2f}")
+        return "\n".join(lines)
+
+
+def cross_check(cols, settings, policy=None, tolerance=0, use_numpy=None):
+    """CrossCheck по всему списку сразу."""
+    return CrossCheck(tolerance, policy, use_numpy=use_numpy).add(cols, settings)
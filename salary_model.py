@@ -0,0 +1,360 @@
+"""Модель списка сотрудников без привязки к Tk.
+
+Модель хранит входные данные и результаты расчёта по колонкам: числа -- в
+array('d') по ключам INPUT_COLUMNS (готовых для движка), строки и проекты --
+в списках, результаты -- в одном плоском массиве по 16 значений на
+сотрудника. Запись в формате salary_data.json собирается по индексу только
+по запросу (record). Таблица GUI только отображает строки модели и передаёт
+в неё правки. Модель также запоминает, какие записи менялись с прошлого
+сохранения (take_changes), чтобы хранилище писало только их.
+
+Общие проекты живут в реестре (registry). Колонки budget/budget_success
+хранят суммы по проектам каждого сотрудника; правка общего проекта меняет
+их на разницу только у связанных с ним сотрудников.
+"""
+
+from array import array
+from itertools import chain
+
+from salary_engine import (INPUT_COLUMNS, RESULT_KEYS, TotalsAggregator, iter_results, level_code, project_sums,
+                           resolve_settings, settings_affected, to_number)
+from salary_projects import ProjectRegistry
+
+# Числовые поля записи, которые хранятся прямо во входных колонках движка
+NUMBER_FIELDS = ("base_cur", "base_new", "content_base", "pages", "rating", "mentees")
+# Поля-строки и проекты хранятся в списках
+TEXT_FIELDS = ("name", "level", "role", "projects")
+
+RESULT_WIDTH = len(RESULT_KEYS)
+# До стольких удалений за раз строки вырезаются по одной, больше -- колонки пересобираются
+REMOVE_INPLACE_MAX = 16
+
+
+def new_employee(data=None):
+    """Запись сотрудника со значениями по умолчанию, как у новой строки таблицы."""
+    data = data or {}
+    return {
+        "name": data.get("name", ""),
+        "level": data.get("level", "Intern"),
+        "role": data.get("role", "SEO assistant"),
+        "base_cur": data.get("base_cur", 0.0),
+        "base_new": data.get("base_new", 0.0),
+        "content_base": data.get("content_base", 0.0),
+        "pages": data.get("pages", 0.0),
+        "rating": data.get("rating", 0.0),
+        "mentees": data.get("mentees", 0),
+        "projects": data.get("projects", []),
+        "id": data.get("id"),
+    }
+
+
+class RosterModel:
+    """Сотрудники по колонкам, их результаты и итоги.
+
+    Сотрудник -- это индекс во всех колонках; постоянный id записи лежит в ids.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = resolve_settings(settings)
+        self.cols = {k: array("b" if k == "level" else "d") for k in INPUT_COLUMNS}
+        self.text = {k: [] for k in TEXT_FIELDS}
+        self.ids = array("q")
+        # {id: индекс строки}; None -- соберётся заново при обращении (после удаления)
+        self.rows_by_id = {}
+        self.res = array("d")
+        self.totals = TotalsAggregator()
+        self.registry = ProjectRegistry()
+        # Учёт несохранённых изменений по id
+        self.next_id = 1
+        self.dirty_ids = set()
+        self.deleted_ids = set()
+        self.settings_dirty = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Доступ к данным ---
+
+    def result(self, index):
+        """Результаты сотрудника (кортеж в порядке RESULT_KEYS)."""
+        start = index * RESULT_WIDTH
+        return tuple(self.res[start:start + RESULT_WIDTH])
+
+    def results(self):
+        res = self.res
+        return (tuple(res[i:i + RESULT_WIDTH]) for i in range(0, len(res), RESULT_WIDTH))
+
+    def record(self, index):
+        """Запись сотрудника в формате salary_data.json (копия)."""
+        emp = {k: self.text[k][index] for k in TEXT_FIELDS}
+        for k in NUMBER_FIELDS:
+            emp[k] = self.cols[k][index]
+        emp["mentees"] = int(emp["mentees"])
+        emp["id"] = self.ids[index]
+        return emp
+
+    def records(self):
+        return [self.record(i) for i in range(len(self))]
+
+    def index_of(self, emp_id):
+        """Индекс сотрудника по постоянному id."""
+        return self.id_index()[emp_id]
+
+    def id_index(self):
+        if self.rows_by_id is None:
+            self.rows_by_id = {emp_id: i for i, emp_id in enumerate(self.ids)}
+        return self.rows_by_id
+
+    # --- Изменение списка ---
+
+    def append_record(self, data, dirty=True):
+        """Раскладывает запись по колонкам (без расчёта)."""
+        emp = new_employee(data)
+        emp_id = emp["id"]
+        if emp_id is None:
+            emp_id = self.next_id
+        self.next_id = max(self.next_id, emp_id + 1)
+        if self.rows_by_id is not None: self.rows_by_id[emp_id] = len(self.ids)
+        self.ids.append(emp_id)
+        if dirty: self.dirty_ids.add(emp_id)
+        for k in TEXT_FIELDS:
+            self.text[k].append(emp[k])
+        cols = self.cols
+        for k in NUMBER_FIELDS:
+            cols[k].append(to_number(emp[k]))
+        cols["level"].append(level_code(emp["level"]))
+        self.registry.link(emp_id, emp["projects"])
+        budget, budget_success = project_sums(emp["projects"], self.registry.projects)
+        cols["budget"].append(budget)
+        cols["budget_success"].append(budget_success)
+
+    def add(self, data=None):
+        """Добавляет сотрудника, возвращает его индекс."""
+        self.extend([data])
+        return len(self) - 1
+
+    def extend(self, items, results=None, dirty=True):
+        """Пакетное добавление: один проход движка по новым строкам.
+
+        results -- уже посчитанные при текущих настройках результаты этих строк
+        (плоский массив, как res), тогда расчёт не нужен. dirty=False -- записи
+        прочитаны из файла и сохранять их не нужно.
+        """
+        start = len(self)
+        for data in items:
+            self.append_record(data, dirty)
+        if len(self) == start: return
+        if results is not None:
+            self.res.extend(results)
+            for i in range(start, len(self)):
+                self.totals.add(self.result(i))
+            return
+        new = {k: col[start:] for k, col in self.cols.items()}
+        results = list(iter_results(new, self.settings))
+        self.res.extend(chain.from_iterable(results))
+        for res in results:
+            self.totals.add(res)
+
+    def remove(self, index):
+        """Удаляет сотрудника и вычитает его вклад из итогов; возвращает его id."""
+        return self.remove_many([index])[0]
+
+    def remove_many(self, indices):
+        """Удаляет несколько сотрудников; возвращает id удалённых."""
+        drop = sorted(set(indices))
+        removed = [self.ids[i] for i in drop]
+        # Индексы строк ниже удалённых сдвигаются
+        self.rows_by_id = None
+        for i in drop:
+            self.totals.remove(self.result(i))
+        for i, emp_id in zip(drop, removed):
+            self.registry.unlink(emp_id, self.text["projects"][i])
+            self.dirty_ids.discard(emp_id)
+            self.deleted_ids.add(emp_id)
+
+        if len(drop) <= REMOVE_INPLACE_MAX:
+            for i in reversed(drop):
+                del self.ids[i]
+                del self.res[i * RESULT_WIDTH:(i + 1) * RESULT_WIDTH]
+                for col in self.cols.values():
+                    del col[i]
+                for col in self.text.values():
+                    del col[i]
+        else:
+            dropped = set(drop)
+            keep = [i for i in range(len(self)) if i not in dropped]
+            self.ids = array("q", (self.ids[i] for i in keep))
+            res = self.res
+            self.res = array("d", chain.from_iterable(res[i * RESULT_WIDTH:(i + 1) * RESULT_WIDTH] for i in keep))
+            for k, col in self.cols.items():
+                self.cols[k] = array(col.typecode, (col[i] for i in keep))
+            for k, col in self.text.items():
+                self.text[k] = [col[i] for i in keep]
+        if not len(self):
+            self.totals.reset()
+        return removed
+
+    def clear(self):
+        self.remove_many(range(len(self)))
+
+    def update(self, index, key, value, recompute=True):
+        """Меняет поле сотрудника; возвращает True, если изменились входные данные расчёта.
+
+        Запись того же значения ничего не меняет. Правка проектов пересчитывает
+        строку, только если изменились суммы бюджетов. При recompute=False
+        пересчёт откладывается до recompute_rows().
+        """
+        cols = self.cols
+        if key in NUMBER_FIELDS:
+            value = to_number(value)
+            if cols[key][index] == value: return False
+            cols[key][index] = value
+            affects = True
+        else:
+            text = self.text[key]
+            old = text[index]
+            if old == value: return False
+            text[index] = value
+            affects = False
+            if key == "level":
+                code = level_code(value)
+                affects = cols["level"][index] != code
+                cols["level"][index] = code
+            elif key == "projects":
+                emp_id = self.ids[index]
+                self.registry.unlink(emp_id, old)
+                self.registry.link(emp_id, value)
+                sums = project_sums(value, self.registry.projects)
+                affects = (cols["budget"][index], cols["budget_success"][index]) != sums
+                cols["budget"][index], cols["budget_success"][index] = sums
+        self.dirty_ids.add(self.ids[index])
+        if affects and recompute: self.recompute_rows([index])
+        return affects
+
+    # --- Общие проекты ---
+
+    def member_rows(self, pid):
+        """Индексы сотрудников, связанных с общим проектом (по возрастанию)."""
+        members = self.registry.members.get(pid)
+        if not members: return []
+        rows = self.id_index()
+        return sorted(rows[emp_id] for emp_id in members)
+
+    def add_project(self, data):
+        return self.registry.add(data)
+
+    def update_project(self, pid, changes):
+        """Меняет общий проект (значение None убирает поле); возвращает индексы
+        пересчитанных сотрудников.
+
+        Суммы бюджетов связанных сотрудников меняются на разницу (доля x
+        изменение бюджета успешных/всех), без обхода их списков проектов.
+        """
+        registry = self.registry
+        old = registry.projects[pid]
+        new = {k: v for k, v in dict(old, **changes).items() if v is not None}
+        if new == old: return []
+        registry.projects[pid] = new
+        registry.dirty = True
+        old_budget, new_budget = to_number(old.get("budget", 0)), to_number(new.get("budget", 0))
+        old_success = old_budget if old.get("success", False) else 0.0
+        new_success = new_budget if new.get("success", False) else 0.0
+        if old_budget == new_budget and old_success == new_success: return []
+
+        rows = self.member_rows(pid)
+        members = registry.members[pid] if rows else {}
+        budget, budget_success = self.cols["budget"], self.cols["budget_success"]
+        for i in rows:
+            share = members[self.ids[i]]
+            budget[i] += share * (new_budget - old_budget)
+            budget_success[i] += share * (new_success - old_success)
+        self.recompute_rows(rows)
+        return rows
+
+    def remove_project(self, pid):
+        """Удаляет общий проект и ссылки на него; возвращает индексы пересчитанных сотрудников."""
+        rows = self.member_rows(pid)
+        for i in rows:
+            projects = [p for p in self.text["projects"][i] if p.get("project") != pid]
+            self.update(i, "projects", projects, recompute=False)
+        del self.registry.projects[pid]
+        self.registry.members.pop(pid, None)
+        self.registry.dirty = True
+        self.recompute_rows(rows)
+        return rows
+
+    # --- Расчёт ---
+
+    def recompute(self, index):
+        self.recompute_rows([index])
+
+    def recompute_rows(self, indices):
+        """Пересчёт нескольких строк одним пакетом с обновлением итогов по разнице."""
+        indices = sorted(indices)
+        if not indices: return
+        cols = {k: [col[i] for i in indices] for k, col in self.cols.items()}
+        for i, new in zip(indices, iter_results(cols, self.settings)):
+            start = i * RESULT_WIDTH
+            self.totals.replace(self.result(i), new)
+            self.res[start:start + RESULT_WIDTH] = array("d", new)
+
+    def set_settings(self, settings):
+        """Применяет настройки; возвращает индексы строк, результаты которых пересчитаны.
+
+        Пересчитываются только строки, которые зависят от изменившихся настроек;
+        если таких больше половины, пересчитывается весь список.
+        """
+        settings = resolve_settings(settings)
+        if settings == self.settings: return []
+        rows = settings_affected(self.cols, self.settings, settings)
+        self.settings = settings
+        self.settings_dirty = True
+        if len(rows) > len(self) // 2:
+            self.recompute_all()
+        else:
+            self.recompute_rows(rows)
+        return rows
+
+    def recompute_all(self):
+        """Пересчёт всего списка одним пакетом и полный пересчёт итогов."""
+        results = list(iter_results(self.cols, self.settings))
+        self.res = array("d", chain.from_iterable(results))
+        self.totals.reset(results)
+
+    # --- Сохранение ---
+
+    def take_changes(self):
+        """Изменения с прошлого вызова: (настройки или None, записи изменённых, id удалённых,
+        реестр проектов или None)."""
+        settings = dict(self.settings) if self.settings_dirty else None
+        dirty = self.dirty_ids
+        upserts = [self.record(i) for i, emp_id in enumerate(self.ids) if emp_id in dirty] if dirty else []
+        deletes = list(self.deleted_ids)
+        projects = self.registry.to_data() if self.registry.dirty else None
+        self.mark_clean()
+        return settings, upserts, deletes, projects
+
+    def restore_changes(self, settings=None, upserts=(), deletes=(), projects=None):
+        """Снова помечает изменённым то, что вернул take_changes, но не удалось записать.
+
+        Записываются текущие значения, а не старая порция: правки, сделанные
+        после неё, не откатываются. Удалённые с тех пор сотрудники не
+        возвращаются.
+        """
+        if settings is not None: self.settings_dirty = True
+        if projects is not None: self.registry.dirty = True
+        self.deleted_ids.update(deletes)
+        present = set(self.ids)
+        self.dirty_ids.update(emp["id"] for emp in upserts if emp["id"] in present)
+
+    def has_changes(self):
+        return self.settings_dirty or bool(self.dirty_ids) or bool(self.deleted_ids) or self.registry.dirty
+
+    def mark_clean(self):
+        self.dirty_ids = set()
+        self.deleted_ids = set()
+        self.settings_dirty = False
+        self.registry.dirty = False
+
+    def to_data(self):
+        return {"settings": dict(self.settings), "projects": self.registry.to_data(), "employees": self.records()}
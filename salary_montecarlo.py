@@ -0,0 +1,202 @@
+"""Распределение проектных бонусов методом Монте-Карло.
+
+Каждый проект может иметь вероятность успеха "probability" (0..1); без неё
+исход проекта считается известным по флагу "success". В каждой симуляции
+разыгрываются исходы всех проектов всех сотрудников (общий проект реестра --
+один раз для всех связанных с ним), и по выборке считаются перцентили
+итогового бонуса и зарплаты по сотруднику и по всему списку.
+
+Результаты всех колонок линейно зависят от суммы бюджетов успешных проектов S:
+значение = значение при провале всех проектов + (coeff_success - coeff_fail) * S,
+поэтому разыгрывается только S.
+
+С numpy выборки считаются векторно группами сотрудников; без numpy работает
+тот же алгоритм на чистом Python (заметно медленнее). Одинаковый seed даёт
+одинаковый результат в пределах одной реализации.
+"""
+
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from salary_engine import RESULT_KEYS, employee_columns, iter_results, project_share, resolve_settings, to_number
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+# Колонки результата, для которых считаются перцентили: бонус и ЗП по текущей/новой базе
+MC_KEYS = ("tb", "sc", "sn")
+_MIN_INDEXES = tuple(RESULT_KEYS.index(k + "_min") for k in MC_KEYS)
+# Предел размера матрицы исходов (симуляции x проекты группы) для numpy
+MAX_DRAW_CELLS = 1 << 22
+
+
+def project_probability(project):
+    """Вероятность успеха проекта: явная или по флагу "Цели достигнуты?"."""
+    if project.get("probability") is None:
+        return 1.0 if project.get("success", False) else 0.0
+    return min(1.0, max(0.0, to_number(project["probability"])))
+
+
+def percentile(sorted_values, q):
+    """Перцентиль с линейной интерполяцией (как numpy.percentile по умолчанию)."""
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+class MonteCarloResult:
+    """Перцентили по сотрудникам и по списку.
+
+    employees[i] и roster -- словари {"tb"|"sc"|"sn": [значения по percentiles]}.
+    """
+
+    def __init__(self, percentiles, employees, roster, n_sims):
+        self.percentiles = percentiles
+        self.employees = employees
+        self.roster = roster
+        self.n_sims = n_sims
+
+
+def _stats(s_percentiles, mins, delta):
+    """Перцентили колонок MC_KEYS из перцентилей суммы успешных бюджетов."""
+    return {key: [base + delta * v for v in s_percentiles] for key, base in zip(MC_KEYS, mins)}
+
+
+def _split_projects(emp, registry, shared_index, shared_probs):
+    """(сумма бюджетов проектов с известным успехом, [(бюджет, p)] неопределённых,
+    [(номер общего проекта, бюджет доли)] ссылок на неопределённые общие проекты).
+
+    Общий проект разыгрывается один раз на симуляцию для всех связанных с ним
+    сотрудников; shared_index/shared_probs пополняются новыми общими проектами.
+    """
+    known, uncertain, links = 0.0, [], []
+    for project in emp.get("projects") or []:
+        budget, _ = project_share(project, registry)
+        shared = "project" in project
+        p = project_probability(registry.get(project["project"], {}) if shared else project)
+        if p >= 1.0:
+            known += budget
+        elif p > 0.0:
+            if not shared:
+                uncertain.append((budget, p))
+                continue
+            k = shared_index.get(project["project"])
+            if k is None:
+                k = shared_index[project["project"]] = len(shared_probs)
+                shared_probs.append(p)
+            links.append((k, budget))
+    return known, uncertain, links
+
+
+def _simulate_python(split, shared_probs, n_sims, rnd, percentiles):
+    """Перцентили сумм успешных бюджетов по сотрудникам и по списку."""
+    # Исходы общих проектов -- по байту на симуляцию, а не список bool
+    outcomes = [bytes(rnd.random() < p for _ in range(n_sims)) for p in shared_probs]
+    roster = [0.0] * n_sims
+    roster_known = 0.0
+    per_employee = []
+    for known, uncertain, links in split:
+        roster_known += known
+        if not uncertain and not links:
+            per_employee.append([known] * len(percentiles))
+            continue
+        rand = rnd.random
+        sample = [sum(b for b, p in uncertain if rand() < p) for _ in range(n_sims)]
+        for k, budget in links:
+            sample = [v + budget if hit else v for v, hit in zip(sample, outcomes[k])]
+        roster = [a + b for a, b in zip(roster, sample)]
+        sample.sort()
+        per_employee.append([known + percentile(sample, q) for q in percentiles])
+    roster.sort()
+    return per_employee, [roster_known + percentile(roster, q) for q in percentiles]
+
+
+def _draw_shared(shared_probs, n_sims, rng):
+    """Исходы общих проектов: по строке битов (np.packbits) на проект.
+
+    Разыгрываются блоками симуляций не больше MAX_DRAW_CELLS ячеек; в памяти
+    остаётся бит на исход, а не float на ячейку.
+    """
+    probs = np.array(shared_probs, dtype=np.float32)
+    packed = np.zeros((len(probs), (n_sims + 7) // 8), dtype=np.uint8)
+    # Блок -- кратное 8 число симуляций, чтобы биты блоков не смешивались в одном байте
+    block = max(8, MAX_DRAW_CELLS // len(probs) // 8 * 8)
+    for start in range(0, n_sims, block):
+        rows = min(block, n_sims - start)
+        hits = rng.random((rows, len(probs)), dtype=np.float32) < probs
+        packed[:, start // 8:(start + rows + 7) // 8] = np.packbits(hits.T, axis=1)
+    return packed
+
+
+def _simulate_numpy(split, shared_probs, n_sims, rng, percentiles):
+    """То же, что _simulate_python, но векторно: исходы разыгрываются матрицей по группам сотрудников."""
+    per_employee = [[known] * len(percentiles) for known, _, _ in split]
+    roster = np.zeros(n_sims)
+    outcomes = _draw_shared(shared_probs, n_sims, rng) if shared_probs else None
+    # Разыгрываются только сотрудники с неопределёнными проектами
+    pending = [i for i, (_, uncertain, links) in enumerate(split) if uncertain or links]
+    cost = [n_sims * (len(uncertain) + len(links) + 1) for _, uncertain, links in split]
+    pos = 0
+    while pos < len(pending):
+        group, cells = [], 0
+        while pos < len(pending) and (not group or cells + cost[pending[pos]] <= MAX_DRAW_CELLS):
+            group.append(pending[pos])
+            cells += cost[pending[pos]]
+            pos += 1
+        sums = np.zeros((n_sims, len(group)))
+        inline = [j for j, i in enumerate(group) if split[i][1]]
+        if inline:
+            flat = [pb for j in inline for pb in split[group[j]][1]]
+            budgets = np.array([b for b, _ in flat])
+            probs = np.array([p for _, p in flat], dtype=np.float32)
+            success = (rng.random((n_sims, len(flat)), dtype=np.float32) < probs) * budgets
+            starts = np.cumsum([0] + [len(split[group[j]][1]) for j in inline[:-1]])
+            sums[:, inline] = np.add.reduceat(success, starts, axis=1)
+        shared = sorted({k for i in group for k, _ in split[i][2]})
+        if shared:
+            # Распаковываются только общие проекты, на которые ссылается группа
+            column = {k: c for c, k in enumerate(shared)}
+            weights = np.zeros((len(shared), len(group)))
+            for j, i in enumerate(group):
+                for k, budget in split[i][2]:
+                    weights[column[k], j] += budget
+            hits = np.unpackbits(outcomes[shared], axis=1, count=n_sims).T.astype(np.float64)
+            sums += hits @ weights
+        roster += sums.sum(axis=1)
+        for i, values in zip(group, np.percentile(sums, percentiles, axis=0).T.tolist()):
+            per_employee[i] = [split[i][0] + v for v in values]
+    roster_known = sum(known for known, _, _ in split)
+    return per_employee, [roster_known + v for v in np.percentile(roster, percentiles).tolist()]
+
+
+def simulate(employees, settings, n_sims=10000, seed=0, percentiles=DEFAULT_PERCENTILES, use_numpy=None,
+             registry=None):
+    """Монте-Карло по всем проектам всех сотрудников.
+
+    Возвращает MonteCarloResult с перцентилями итогового бонуса (tb) и
+    зарплаты по текущей (sc) и новой (sn) базе. registry -- общие проекты,
+    как в salary_engine.project_share.
+    """
+    registry = registry or {}
+    cfg = resolve_settings(settings)
+    delta = cfg["coeff_success"] - cfg["coeff_fail"]
+    employees = list(employees)
+    mins = [[res[i] for i in _MIN_INDEXES]
+            for res in iter_results(employee_columns(employees, registry), cfg)] if employees else []
+    shared_index, shared_probs = {}, []
+    split = [_split_projects(emp, registry, shared_index, shared_probs) for emp in employees]
+
+    # При delta < 0 значения убывают по S, и q-й перцентиль даёт (100-q)-й перцентиль S
+    s_qs = [q if delta >= 0 else 100 - q for q in percentiles]
+    use_numpy = np is not None if use_numpy is None else use_numpy
+    if use_numpy:
+        per_s, roster_s = _simulate_numpy(split, shared_probs, n_sims, np.random.default_rng(seed), s_qs)
+    else:
+        per_s, roster_s = _simulate_python(split, shared_probs, n_sims, random.Random(seed), s_qs)
+
+    per_employee = [_stats(s_q, emp_mins, delta) for s_q, emp_mins in zip(per_s, mins)]
+    roster_mins = [sum(m[k] for m in mins) for k in range(len(MC_KEYS))]
+    return MonteCarloResult(percentiles, per_employee, _stats(roster_s, roster_mins, delta), n_sims)
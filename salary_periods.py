@@ -0,0 +1,288 @@
+"""Расчётные периоды: датированные снимки списка сотрудников и результатов.
+
+Период (метка "ГГГГ-ММ" или "ГГГГ-ММ-ДД") хранит настройки, реестр общих
+проектов и по каждому сотруднику запись и значения COMPARE_KEYS (база и 16
+результатов). Целиком записывается только каждый KEYFRAME_INTERVAL-й период,
+остальные -- разница с предыдущим: новые и изменённые сотрудники (из записи
+и значений -- только изменившееся) и id удалённых. Восстановление любого
+периода читает не больше KEYFRAME_INTERVAL порций, сколько бы лет снимков ни
+накопилось.
+
+Архив лежит в файле SQLite (в GUI -- в той же базе, что и данные; для
+каталога отделов -- в _periods.sqlite3 с отделом в scope).
+
+    python salary_periods.py salary_data.sqlite3 record 2026-10
+    python salary_periods.py salary_data.sqlite3 list
+    python salary_periods.py salary_data.sqlite3 compare 2026-09 2026-10 -o diff.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+from array import array
+from datetime import datetime
+
+from salary_engine import RESULT_KEYS, employee_columns, iter_results, resolve_settings, to_number
+from salary_projects import registry_from_data
+from salary_store import BUSY_TIMEOUT
+
+# В строке разницы NULL в data или vals -- без изменений с прошлого периода,
+# NULL в обоих -- сотрудник удалён
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS periods (
+    id INTEGER PRIMARY KEY, scope TEXT NOT NULL, period TEXT NOT NULL, created TEXT NOT NULL,
+    depth INTEGER NOT NULL, count INTEGER NOT NULL, settings TEXT NOT NULL, projects TEXT NOT NULL,
+    UNIQUE (scope, period));
+CREATE TABLE IF NOT EXISTS period_rows (
+    period_id INTEGER NOT NULL, emp_id INTEGER NOT NULL, data TEXT, vals BLOB,
+    PRIMARY KEY (period_id, emp_id)) WITHOUT ROWID;
+"""
+
+# Каждый такой по счёту период записывается целиком
+KEYFRAME_INTERVAL = 12
+COMPARE_KEYS = ("base_cur", "base_new") + RESULT_KEYS
+COMPARE_WIDTH = len(COMPARE_KEYS)
+PERIOD_RE = re.compile(r"\d{4}-\d{2}(-\d{2})?$")
+PERIODS_FILE = "_periods.sqlite3"
+
+ADDED, REMOVED, CHANGED = "added", "removed", "changed"
+
+
+def current_period():
+    return datetime.now().strftime("%Y-%m")
+
+
+def period_values(record, results):
+    """Значения COMPARE_KEYS сотрудника (array('d'))."""
+    return array("d", [to_number(record.get("base_cur")), to_number(record.get("base_new"))] + list(results))
+
+
+def record_text(record):
+    return json.dumps({k: v for k, v in record.items() if k != "id"}, ensure_ascii=False, sort_keys=True)
+
+
+def column_sums(blobs):
+    """Суммы COMPARE_KEYS по упакованным значениям сотрудников."""
+    values = array("d", b"".join(blobs))
+    return [sum(values[i::COMPARE_WIDTH]) for i in range(COMPARE_WIDTH)]
+
+
+class PeriodComparison:
+    """Разница двух периодов: rows -- [(id, имя, статус, значения old, значения new)] только
+    по сотрудникам, у которых изменилось хоть одно значение COMPARE_KEYS; у отсутствующих
+    в периоде значения нулевые."""
+
+    def __init__(self, old, new, rows, totals_old, totals_new, count_old, count_new):
+        self.old = old
+        self.new = new
+        self.rows = rows
+        self.totals_old = totals_old
+        self.totals_new = totals_new
+        self.count_old = count_old
+        self.count_new = count_new
+
+    @property
+    def totals_delta(self):
+        return [b - a for a, b in zip(self.totals_old, self.totals_new)]
+
+    def export_csv(self, path):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "name", "status"] + [f"{k}_{s}" for k in COMPARE_KEYS for s in ("old", "new", "delta")])
+            for emp_id, name, status, old, new in self.rows + [("", "ИТОГО", "", self.totals_old, self.totals_new)]:
+                writer.writerow([emp_id, name, status] + [v for a, b in zip(old, new) for v in (a, b, b - a)])
+
+
+class PeriodArchive:
+    """Архив периодов одного scope в файле SQLite. Объект используется только из одного потока."""
+
+    def __init__(self, path, scope=""):
+        self.path = path
+        self.scope = scope
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def periods(self):
+        """[{"period", "created", "count", "stored", "full"}] по возрастанию метки."""
+        rows = self.conn.execute(
+            "SELECT p.period, p.created, p.count, p.depth, (SELECT COUNT(*) FROM period_rows r WHERE r.period_id = p.id)"
+            " FROM periods p WHERE p.scope = ? ORDER BY p.period", (self.scope,))
+        return [{"period": period, "created": created, "count": count, "stored": stored, "full": depth == 0}
+                for period, created, count, depth, stored in rows]
+
+    def _period_ids(self):
+        return self.conn.execute("SELECT period, id, depth FROM periods WHERE scope = ? ORDER BY period",
+                                 (self.scope,)).fetchall()
+
+    def _state(self, period):
+        """{id сотрудника: (запись JSON, значения)} на период: ближайший полный снимок и разницы после него."""
+        chain = self._period_ids()
+        labels = [p for p, _, _ in chain]
+        if period not in labels: raise KeyError(f"нет периода {period}")
+        end = labels.index(period)
+        start = end - chain[end][2]
+        state = {}
+        for _, period_id, _ in chain[start:end + 1]:
+            for emp_id, data, vals in self.conn.execute(
+                    "SELECT emp_id, data, vals FROM period_rows WHERE period_id = ?", (period_id,)):
+                if data is None and vals is None:
+                    state.pop(emp_id, None)
+                elif data is None or vals is None:
+                    old_data, old_vals = state[emp_id]
+                    state[emp_id] = (data or old_data, vals or old_vals)
+                else:
+                    state[emp_id] = (data, vals)
+        return state
+
+    def record(self, period, settings, projects, records, results, created=None):
+        """Записывает период; возвращает число сохранённых строк (для разницы -- только изменённых).
+
+        records -- записи сотрудников с "id", results -- их 16 результатов.
+        Период не может быть раньше последнего записанного; повторная запись
+        последнего периода заменяет его.
+        """
+        if not PERIOD_RE.match(period): raise ValueError(f"неверная метка периода: {period} (ожидается ГГГГ-ММ)")
+        chain = self._period_ids()
+        with self.conn:
+            if chain and period < chain[-1][0]:
+                raise ValueError(f"период {period} раньше последнего записанного ({chain[-1][0]})")
+            if chain and period == chain[-1][0]:
+                self.conn.execute("DELETE FROM period_rows WHERE period_id = ?", (chain[-1][1],))
+                self.conn.execute("DELETE FROM periods WHERE id = ?", (chain[-1][1],))
+                chain.pop()
+            depth = chain[-1][2] + 1 if chain else 0
+            if depth >= KEYFRAME_INTERVAL: depth = 0
+            previous = self._state(chain[-1][0]) if depth else {}
+
+            rows = []
+            current = set()
+            for emp, res in zip(records, results):
+                emp_id = emp["id"]
+                current.add(emp_id)
+                data, vals = record_text(emp), period_values(emp, res).tobytes()
+                old = previous.get(emp_id)
+                if old is None:
+                    rows.append((emp_id, data, vals))
+                elif old != (data, vals):
+                    rows.append((emp_id, None if data == old[0] else data, None if vals == old[1] else vals))
+            rows.extend((emp_id, None, None) for emp_id in previous.keys() - current)
+
+            cur = self.conn.execute(
+                "INSERT INTO periods (scope, period, created, depth, count, settings, projects)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.scope, period, created or datetime.now().isoformat(timespec="seconds"), depth, len(current),
+                 json.dumps(resolve_settings(settings)), json.dumps(projects or {}, ensure_ascii=False)))
+            self.conn.executemany("INSERT INTO period_rows (period_id, emp_id, data, vals) VALUES (?, ?, ?, ?)",
+                                  ((cur.lastrowid,) + row for row in rows))
+        return len(rows)
+
+    def load(self, period):
+        """Период в формате salary_data.json и значения COMPARE_KEYS по id: {"settings", "projects",
+        "employees", "values"}."""
+        row = self.conn.execute("SELECT settings, projects FROM periods WHERE scope = ? AND period = ?",
+                                (self.scope, period)).fetchone()
+        if row is None: raise KeyError(f"нет периода {period}")
+        state = self._state(period)
+        employees, values = [], {}
+        for emp_id in sorted(state):
+            data, vals = state[emp_id]
+            employees.append(dict(json.loads(data), id=emp_id))
+            values[emp_id] = tuple(array("d", vals))
+        return {"period": period, "settings": json.loads(row[0]), "projects": json.loads(row[1]),
+                "employees": employees, "values": values}
+
+    def compare(self, old, new):
+        """PeriodComparison между периодами old и new (в любом порядке дат)."""
+        a, b = self._state(old), self._state(new)
+        zeros = (0.0,) * COMPARE_WIDTH
+        rows = []
+        for emp_id in sorted(a.keys() | b.keys()):
+            ra, rb = a.get(emp_id), b.get(emp_id)
+            if ra is not None and rb is not None and ra[1] == rb[1]: continue
+            status = ADDED if ra is None else REMOVED if rb is None else CHANGED
+            name = json.loads((rb or ra)[0]).get("name", "")
+            rows.append((emp_id, name, status, tuple(array("d", ra[1])) if ra else zeros,
+                         tuple(array("d", rb[1])) if rb else zeros))
+        return PeriodComparison(old, new, rows, column_sums(v for _, v in a.values()),
+                                column_sums(v for _, v in b.values()), len(a), len(b))
+
+
+def store_snapshot(store):
+    """(настройки, проекты, записи, результаты) текущих данных хранилища -- для записи периода."""
+    data = store.load()
+    settings = resolve_settings(data["settings"])
+    registry = registry_from_data(data["projects"])
+    results = list(iter_results(employee_columns(data["employees"], registry), settings))
+    return settings, data["projects"], data["employees"], results
+
+
+def open_archive(path, department=None):
+    """Архив для базы или каталога отделов (path -- каталог, department -- отдел)."""
+    if os.path.isdir(path):
+        return PeriodArchive(os.path.join(path, PERIODS_FILE), department or "")
+    return PeriodArchive(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Расчётные периоды: запись и сравнение снимков")
+    parser.add_argument("data", help="база salary_data.sqlite3 или каталог отделов")
+    parser.add_argument("--department", help="отдел каталога")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_record = sub.add_parser("record", help="записать текущие данные как период")
+    p_record.add_argument("period", nargs="?", default=current_period())
+    sub.add_parser("list", help="список периодов")
+    p_compare = sub.add_parser("compare", help="разница двух периодов")
+    p_compare.add_argument("old")
+    p_compare.add_argument("new")
+    p_compare.add_argument("-o", "--output", help="CSV со всеми колонками (иначе -- кратко в stdout)")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.data) and not args.department:
+        parser.error("для каталога отделов нужен --department")
+    archive = open_archive(args.data, args.department)
+    try:
+        if args.command == "record":
+            if os.path.isdir(args.data):
+                from salary_shards import ShardStore
+                store = ShardStore(args.data, args.department)
+            else:
+                from salary_store import SalaryStore
+                store = SalaryStore(args.data)
+            try:
+                snapshot = store_snapshot(store)
+            finally:
+                store.close()
+            stored = archive.record(args.period, *snapshot)
+            print(f"Период {args.period}: сотрудников {len(snapshot[2])}, записано строк {stored}")
+        elif args.command == "list":
+            for p in archive.periods():
+                kind = "полный" if p["full"] else "разница"
+                print(f"{p['period']:12s} {p['created']:20s} сотрудников {p['count']:7d}  строк {p['stored']:7d}  {kind}")
+        else:
+            result = archive.compare(args.old, args.new)
+            if args.output:
+                result.export_csv(args.output)
+            keys = [COMPARE_KEYS.index(k) for k in ("base_cur", "tb_real", "sc_real", "sn_real")]
+            print(f"Сотрудников: {result.count_old} -> {result.count_new}, изменилось: {len(result.rows)}")
+            print("ИТОГО " + "  ".join(f"{COMPARE_KEYS[i]} {result.totals_old[i]:,.0f} -> {result.totals_new[i]:,.0f}"
+                                       for i in keys))
+            if not args.output:
+                for emp_id, name, status, old, new in result.rows:
+                    print(f"{emp_id:6d} {name:30s} {status:8s} " + "  ".join(f"{COMPARE_KEYS[i]} {new[i] - old[i]:+,.0f}"
+                                                                          for i in keys))
+    except (KeyError, ValueError) as e:
+        sys.exit(str(e).strip("'\""))
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Реестр общих проектов.
+
+Проект, над которым работают несколько сотрудников, хранится один раз:
+{"name", "budget", "success", "probability"}. Сотрудник ссылается на него из
+своего списка "projects" записью {"project": id, "share": доля бюджета}.
+Реестр помнит обратные связи (проект -> {id сотрудника: доля}), чтобы правка
+проекта пересчитывала только связанных сотрудников.
+
+В salary_data.json реестр лежит под ключом "projects" верхнего уровня
+({"id": проект}); его лучше записывать до "employees", чтобы потоковое
+чтение (salary_cli) знало проекты до первого сотрудника.
+"""
+
+
+def registry_from_data(projects):
+    """{id: проект} из JSON (ключи объекта -- строки)."""
+    return {int(pid): dict(proj) for pid, proj in (projects or {}).items()}
+
+
+def project_links(projects):
+    """Ссылки на общие проекты из списка проектов сотрудника: [(id проекта, доля)]."""
+    return [(p["project"], float(p.get("share", 1.0))) for p in projects or [] if "project" in p]
+
+
+class ProjectRegistry:
+    """Общие проекты и связи сотрудник <-> проект."""
+
+    def __init__(self, projects=None):
+        self.projects = {}
+        self.members = {}
+        self.next_id = 1
+        self.dirty = False
+        if projects: self.load(projects)
+
+    def __len__(self):
+        return len(self.projects)
+
+    def load(self, projects):
+        """Заменяет проекты данными из файла (связи сотрудников не трогаются)."""
+        self.projects = registry_from_data(projects)
+        self.next_id = max(self.projects, default=0) + 1
+
+    def add(self, data):
+        """Новый общий проект; возвращает его id."""
+        pid = self.next_id
+        self.next_id += 1
+        self.projects[pid] = {"name": data.get("name", ""), "budget": data.get("budget", 0.0),
+                              "success": data.get("success", False)}
+        if data.get("probability") is not None:
+            self.projects[pid]["probability"] = data["probability"]
+        self.dirty = True
+        return pid
+
+    def link(self, emp_id, projects):
+        for pid, share in project_links(projects):
+            members = self.members.setdefault(pid, {})
+            members[emp_id] = members.get(emp_id, 0.0) + share
+
+    def unlink(self, emp_id, projects):
+        for pid, _ in project_links(projects):
+            members = self.members.get(pid)
+            if members is not None:
+                members.pop(emp_id, None)
+                if not members: del self.members[pid]
+
+    def member_count(self, pid):
+        return len(self.members.get(pid, ()))
+
+    def to_data(self):
+        return {str(pid): dict(proj) for pid, proj in self.projects.items()}
@@ -0,0 +1,345 @@
+"""Локальный JSON-сервис расчёта зарплат на asyncio.
+
+Другие программы (HR-портал, выгрузка в бухгалтерию) получают расчёт тем же
+движком, что и GUI, не повторяя правила у себя. Только стандартная
+библиотека: HTTP/1.1 с keep-alive поверх asyncio.start_server.
+
+    python salary_server.py --port 8765 --workers 4
+
+POST /calculate         {"settings": {...}, "projects": {...}, "employees": [...],
+                         "totals_only": false}
+                        -> {"columns": [...], "count": n, "totals": [...], "results": [[...], ...]}
+POST /calculate/batch   {"requests": [запрос /calculate, ...]} -> {"responses": [...]}
+POST /calculate/stream  тот же запрос; ответ -- NDJSON частями (chunked): строка
+                        {"columns": [...]}, по строке [16 значений] на сотрудника,
+                        в конце {"count": n, "totals": [...]}
+GET  /health            {"status": "ok"}
+
+Расчёт идёт в пуле процессов (разбор JSON упирается в GIL), одновременно --
+не больше workers запросов; ещё max_pending ждут очереди, остальным
+отвечает 503. Маленькие запросы считаются прямо в цикле событий: пересылка
+в пул дороже самого расчёта. Клиент -- salary_client.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from salary_engine import DEFAULT_SETTINGS, RESULT_KEYS, TotalsAggregator, employee_columns, iter_results, \
+    resolve_settings
+from salary_projects import registry_from_data
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY = 64 << 20
+MAX_HEADERS = 100
+# Предел длины строки запроса и одного заголовка (limit потоков asyncio.start_server)
+MAX_LINE = 64 << 10
+# Запросы меньше этого размера (байт) считаются без пула процессов
+INLINE_BODY = 64 << 10
+# Сотрудников в одной части потокового ответа
+STREAM_BATCH = 2048
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class StreamAborted(Exception):
+    """Ошибка после отправки заголовка потокового ответа: соединение закрывается без нового ответа."""
+
+
+# --- Расчёт (выполняется и в процессах пула) ---
+
+def parse_request(data):
+    """(сотрудники, настройки, общие проекты) из тела запроса; ValueError -- неверный запрос."""
+    if not isinstance(data, dict): raise ValueError("ожидается объект JSON")
+    employees = data.get("employees", [])
+    if not isinstance(employees, list) or not all(isinstance(emp, dict) for emp in employees):
+        raise ValueError("employees: ожидается список объектов")
+    settings = data.get("settings") or {}
+    if not isinstance(settings, dict): raise ValueError("settings: ожидается объект")
+    unknown = [k for k in settings if k not in DEFAULT_SETTINGS]
+    if unknown: raise ValueError(f"неизвестная настройка: {', '.join(unknown)}")
+    projects = data.get("projects") or {}
+    if not isinstance(projects, dict): raise ValueError("projects: ожидается объект")
+    return employees, resolve_settings(settings), registry_from_data(projects)
+
+
+def calculate(data):
+    """Ответ /calculate для разобранного запроса."""
+    employees, settings, registry = parse_request(data)
+    totals = TotalsAggregator()
+    results = []
+    for res in iter_results(employee_columns(employees, registry), settings):
+        totals.add(res)
+        results.append(res)
+    response = {"columns": RESULT_KEYS, "count": len(employees), "totals": totals.sums}
+    if not data.get("totals_only"): response["results"] = results
+    return response
+
+
+def handle_calculate(body):
+    return encode(calculate(decode(body)))
+
+
+def handle_batch(body):
+    data = decode(body)
+    requests = data.get("requests") if isinstance(data, dict) else None
+    if not isinstance(requests, list): raise ValueError("requests: ожидается список запросов")
+    return encode({"responses": [calculate(req) for req in requests]})
+
+
+def stream_columns(body):
+    """Входные колонки движка и настройки: в пул и обратно пересылаются числа, а не записи."""
+    employees, settings, registry = parse_request(decode(body))
+    return employee_columns(employees, registry), settings
+
+
+def stream_lines(cols, settings):
+    """Часть потокового ответа: по строке NDJSON на сотрудника и её суммы."""
+    totals = TotalsAggregator()
+    lines = []
+    for res in iter_results(cols, settings):
+        totals.add(res)
+        lines.append(json.dumps(res, separators=(",", ":")))
+    lines.append("")
+    return "\n".join(lines).encode("utf-8"), totals.sums
+
+
+def decode(body):
+    try:
+        return json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"неверный JSON: {e}")
+
+
+def encode(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _warm_up():
+    return os.getpid()
+
+
+# --- HTTP ---
+
+async def read_line(reader):
+    """Строка заголовка запроса; слишком длинная -- ошибка 431, а не обрыв соединения."""
+    try:
+        return await reader.readline()
+    except ValueError:
+        # StreamReader.readline так сообщает о строке длиннее limit
+        raise HttpError(431, f"строка заголовка длиннее {MAX_LINE} байт")
+
+
+async def read_request(reader):
+    """(метод, путь, заголовки, тело) или None, если клиент закрыл соединение."""
+    line = await read_line(reader)
+    if not line: return None
+    try:
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "неверная строка запроса")
+    headers = {}
+    while True:
+        line = await read_line(reader)
+        if line in (b"\r\n", b"\n", b""): break
+        if len(headers) >= MAX_HEADERS: raise HttpError(400, "слишком много заголовков")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    if method == "POST":
+        if "content-length" not in headers: raise HttpError(411, "нужен Content-Length")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HttpError(400, "неверный Content-Length")
+        if length > MAX_BODY: raise HttpError(413, f"тело запроса больше {MAX_BODY} байт")
+        body = await reader.readexactly(length)
+    return method, path.split("?", 1)[0], headers, body
+
+
+def response_head(status, content_type, length=None, keep_alive=True, extra=()):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+             "Connection: " + ("keep-alive" if keep_alive else "close")]
+    lines.append(f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked")
+    lines.extend(extra)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+class SalaryServer:
+    """HTTP-сервер расчёта: пул процессов на workers запросов и очередь на max_pending.
+
+    workers=1 -- без пула: запросы считаются по одному прямо в цикле событий.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_pending=None):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers * 4 if max_pending is None else max_pending
+        self.pool = None
+        self.slots = None
+        self.waiting = 0
+        self.server = None
+
+    async def start(self):
+        self.slots = asyncio.Semaphore(self.workers)
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            # Процессы пула запускаются сразу, а не на первом запросе
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)))
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Место среди workers одновременных запросов; при полной очереди -- 503."""
+        if self.slots.locked() and self.waiting >= self.max_pending:
+            raise HttpError(503, "сервер перегружен, повторите позже")
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    async def call(self, fn, *args, inline=False):
+        """fn(*args) в пуле (или в цикле событий для маленьких запросов); место уже занято."""
+        try:
+            if inline or self.pool is None: return fn(*args)
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+    async def run(self, fn, *args, inline=False):
+        """fn(*args) в пределах лимита одновременных запросов."""
+        async with self.slot():
+            return await self.call(fn, *args, inline=inline)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None: break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self.dispatch(writer, method, path, body, keep_alive)
+                except StreamAborted:
+                    break
+                except HttpError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                except Exception as e:
+                    await self.send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, writer, method, path, body, keep_alive):
+        routes = {"/calculate": handle_calculate, "/calculate/batch": handle_batch, "/calculate/stream": None}
+        if path == "/health":
+            await self.send_json(writer, 200, {"status": "ok", "workers": self.workers}, keep_alive)
+            return
+        if path not in routes: raise HttpError(404, f"нет такого адреса: {path}")
+        if method != "POST": raise HttpError(405, "ожидается POST")
+        if path == "/calculate/stream":
+            await self.stream(writer, body, keep_alive)
+            return
+        data = await self.run(routes[path], body, inline=len(body) < INLINE_BODY)
+        await self.send(writer, 200, data, keep_alive)
+
+    async def stream(self, writer, body, keep_alive):
+        """Ответ частями по STREAM_BATCH сотрудников; запись ждёт, пока клиент читает.
+
+        Место в лимите запросов занимается один раз до заголовка и держится до
+        конца ответа: после заголовка 503 уже не отправить. Ошибка посреди
+        ответа обрывает соединение (клиент увидит незавершённый chunked-ответ).
+        """
+        async with self.slot():
+            cols, settings = await self.call(stream_columns, body, inline=len(body) < INLINE_BODY)
+            writer.write(response_head(200, "application/x-ndjson", keep_alive=keep_alive))
+            try:
+                await self.write_chunk(writer, encode({"columns": RESULT_KEYS}) + b"\n")
+                totals = TotalsAggregator()
+                count = len(cols["level"])
+                for start in range(0, count, STREAM_BATCH):
+                    batch = {k: col[start:start + STREAM_BATCH] for k, col in cols.items()}
+                    data, sums = stream_lines(batch, settings)
+                    totals.add(sums)
+                    await self.write_chunk(writer, data)
+                await self.write_chunk(writer, encode({"count": count, "totals": totals.sums}) + b"\n")
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            except Exception as e:
+                raise StreamAborted(str(e)) from e
+
+    async def write_chunk(self, writer, data):
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+    async def send(self, writer, status, data, keep_alive=True):
+        writer.write(response_head(status, "application/json; charset=utf-8", len(data), keep_alive) + data)
+        await writer.drain()
+
+    async def send_json(self, writer, status, obj, keep_alive=True):
+        await self.send(writer, status, encode(obj), keep_alive)
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_pending=None):
+    server = await SalaryServer(host, port, workers, max_pending).start()
+    print(f"Сервис расчёта: http://{server.host}:{server.port} (процессов: {server.workers})")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальный JSON-сервис расчёта зарплат")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="адрес (по умолчанию только localhost)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, help="процессов расчёта (по умолчанию -- число процессоров)")
+    parser.add_argument("--max-pending", type=int, help="запросов в очереди сверх workers, остальным -- 503")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
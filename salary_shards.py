@@ -0,0 +1,178 @@
+"""Данные по отделам: каталог с отдельным файлом на каждый отдел.
+
+Каждый файл <отдел>.json -- в формате salary_data.json (с собственным
+реестром общих проектов), но его "settings" содержат только настройки,
+переопределённые для отдела; общие настройки
+компании лежат в _company.json того же каталога. Отдел читается и
+сохраняется независимо от остальных: открыть один отдел можно, не читая
+другие, а правки переписывают только файл своего отдела.
+
+Итоги по всем отделам (department_totals) считаются параллельно в пуле
+процессов: разбор JSON упирается в GIL, потоки его не ускоряют.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from salary_engine import TotalsAggregator, employee_columns, iter_results, resolve_settings
+from salary_projects import registry_from_data
+
+COMPANY_FILE = "_company.json"
+SHARD_EXT = ".json"
+
+
+def list_departments(path):
+    """Имена отделов каталога (файлы, начинающиеся с "_", служебные)."""
+    return sorted(name[:-len(SHARD_EXT)] for name in os.listdir(path)
+                  if name.endswith(SHARD_EXT) and not name.startswith("_"))
+
+
+def shard_path(path, department):
+    return os.path.join(path, department + SHARD_EXT)
+
+
+def read_json(file_path):
+    if not os.path.exists(file_path): return {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(file_path, data):
+    """Запись целиком через временный файл: прерванная запись не портит отдел."""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, file_path)
+
+
+def company_settings(path):
+    return resolve_settings(read_json(os.path.join(path, COMPANY_FILE)).get("settings"))
+
+
+def read_shard(path, department):
+    """{"settings": переопределения отдела, "projects": {...}, "employees": [...]} ."""
+    data = read_json(shard_path(path, department))
+    return {"settings": data.get("settings", {}), "projects": data.get("projects", {}),
+            "employees": data.get("employees", [])}
+
+
+def shard_settings(company, overrides):
+    """Действующие настройки отдела: общие с переопределениями отдела."""
+    return resolve_settings(dict(company, **(overrides or {})))
+
+
+def _shard_totals(args):
+    path, department, company, overrides = args
+    data = read_shard(path, department)
+    settings = dict(shard_settings(company, data["settings"]), **overrides)
+    totals = TotalsAggregator()
+    registry = registry_from_data(data["projects"])
+    for res in iter_results(employee_columns(data["employees"], registry), settings):
+        totals.add(res)
+    return department, len(data["employees"]), totals.sums
+
+
+def department_totals(path, departments=None, processes=None, company=None, overrides=None):
+    """[(отдел, число сотрудников, итоги по 16 колонкам)] -- каждый отдел со своими настройками.
+
+    company заменяет общие настройки из _company.json, overrides применяются
+    поверх настроек каждого отдела. Отделы разбираются параллельно, если
+    доступно больше одного процессора.
+    """
+    if company is None:
+        company = company_settings(path)
+    if departments is None:
+        departments = list_departments(path)
+    tasks = [(path, d, company, dict(overrides or {})) for d in departments]
+    workers = min(processes or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [_shard_totals(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_shard_totals, tasks))
+
+
+def company_totals(rows, totals_type=TotalsAggregator):
+    """Итоги компании из итогов отделов (department_totals); totals_type -- CentsTotals для копеек."""
+    count = 0
+    sums = totals_type()
+    for _, n, dept_sums in rows:
+        count += n
+        sums.add(dept_sums)
+    return count, sums.sums
+
+
+class ShardStore:
+    """Хранилище одного отдела с тем же интерфейсом, что у SalaryStore.
+
+    Настройки отдаются действующие (общие + отдела); при записи в файл отдела
+    попадают только отличающиеся от общих. Снимок результатов для отделов не
+    ведётся.
+    """
+
+    def __init__(self, path, department):
+        self.path = path
+        self.department = department
+        self.company = company_settings(path)
+        # Файл отдела читается при первом обращении (фоновой записи он может не понадобиться)
+        self.overrides = None
+        self.projects = None
+        self._employees = None
+
+    def _read(self):
+        """{id: запись} отдела; файл читается при первом обращении."""
+        if self._employees is None:
+            data = read_shard(self.path, self.department)
+            self.overrides = data["settings"]
+            self.projects = data["projects"]
+            # Записи без id (файл собран вручную) получают id по порядку
+            self._employees = {}
+            next_id = max((emp["id"] for emp in data["employees"] if emp.get("id") is not None), default=0) + 1
+            for emp in data["employees"]:
+                if emp.get("id") is None:
+                    emp = dict(emp, id=next_id)
+                    next_id += 1
+                self._employees[emp["id"]] = emp
+        return self._employees
+
+    def close(self):
+        pass
+
+    def load(self):
+        return {"settings": self.load_settings(), "projects": self.load_projects(),
+                "employees": list(self.iter_employees())}
+
+    def load_settings(self):
+        self._read()
+        return shard_settings(self.company, self.overrides)
+
+    def load_projects(self):
+        self._read()
+        return dict(self.projects)
+
+    def count(self):
+        return len(self._read())
+
+    def iter_employees(self):
+        for emp in self._read().values():
+            yield dict(emp)
+
+    def load_results(self, settings):
+        return None
+
+    def save_results(self, settings, ids, results):
+        pass
+
+    def apply(self, settings=None, upserts=(), deletes=(), projects=None):
+        """Применяет изменения и переписывает файл отдела (другие отделы не трогаются)."""
+        employees = self._read()
+        if projects is not None:
+            self.projects = projects
+        if settings is not None:
+            self.overrides = {k: v for k, v in resolve_settings(settings).items() if v != self.company[k]}
+        for emp_id in deletes:
+            employees.pop(emp_id, None)
+        for emp in upserts:
+            employees[emp["id"]] = dict(emp)
+        write_json(shard_path(self.path, self.department),
+                   {"settings": self.overrides, "projects": self.projects, "employees": list(employees.values())})
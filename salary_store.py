@@ -0,0 +1,211 @@
+"""Хранилище данных в локальном файле SQLite.
+
+Вместо полной перезаписи salary_data.json сохраняются только изменённые
+сотрудники и настройки, каждая порция -- одной транзакцией. Запись может
+выполняться в фоновом потоке (AutoSaver), не блокируя окно.
+
+Рядом с данными может лежать снимок результатов расчёта (results_cache),
+чтобы при запуске не пересчитывать список. Снимок действителен, пока не
+менялись ни настройки, ни сотрудники: любая запись через apply() его удаляет.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from array import array
+
+from salary_engine import RESULT_KEYS, resolve_settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS employees (id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS results_cache (settings TEXT NOT NULL, ids BLOB NOT NULL, data BLOB NOT NULL);
+"""
+
+# Сколько секунд ждать, пока файл занят другой записью (архив периодов, второе окно)
+BUSY_TIMEOUT = 30
+
+
+def settings_key(settings):
+    """Отпечаток настроек для проверки снимка результатов."""
+    return json.dumps(resolve_settings(settings), sort_keys=True)
+
+
+class SalaryStore:
+    """Соединение с файлом данных. Объект используется только из одного потока."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def load(self):
+        """Данные в формате salary_data.json (у сотрудников есть поле "id")."""
+        return {"settings": self.load_settings(), "projects": self.load_projects(),
+                "employees": list(self.iter_employees())}
+
+    def load_settings(self):
+        return dict(self.conn.execute("SELECT key, value FROM settings"))
+
+    def load_projects(self):
+        """Реестр общих проектов {"id": проект}, как в salary_data.json."""
+        return {str(pid): json.loads(text) for pid, text in self.conn.execute("SELECT id, data FROM projects")}
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0]
+
+    def iter_employees(self):
+        """Записи сотрудников по порядку id; строки читаются из базы по мере перебора."""
+        for emp_id, text in self.conn.execute("SELECT id, data FROM employees ORDER BY id"):
+            emp = json.loads(text)
+            emp["id"] = emp_id
+            yield emp
+
+    def load_results(self, settings):
+        """Сохранённые результаты (array('d'), 16 значений на сотрудника в порядке id) или None.
+
+        None -- если снимка нет, он снят при других настройках или список сотрудников с тех пор изменился.
+        """
+        row = self.conn.execute("SELECT ids, data FROM results_cache WHERE settings = ?",
+                                (settings_key(settings),)).fetchone()
+        if row is None: return None
+        ids = array("q", row[0])
+        if ids != array("q", (i for (i,) in self.conn.execute("SELECT id FROM employees ORDER BY id"))):
+            return None
+        results = array("d", row[1])
+        return results if len(results) == len(ids) * len(RESULT_KEYS) else None
+
+    def save_results(self, settings, ids, results):
+        """Снимок результатов: ids и results -- array в порядке строк модели."""
+        with self.conn:
+            self.conn.execute("DELETE FROM results_cache")
+            self.conn.execute("INSERT INTO results_cache (settings, ids, data) VALUES (?, ?, ?)",
+                              (settings_key(settings), ids.tobytes(), results.tobytes()))
+
+    def apply(self, settings=None, upserts=(), deletes=(), projects=None):
+        """Записывает изменения одной транзакцией: либо все, либо ничего.
+
+        upserts -- записи сотрудников с полем "id", deletes -- id удалённых,
+        projects -- новый реестр общих проектов целиком (None -- без изменений).
+        Любое изменение делает снимок результатов недействительным.
+        """
+        with self.conn:
+            if settings is not None or upserts or deletes or projects is not None:
+                self.conn.execute("DELETE FROM results_cache")
+            if projects is not None:
+                self.conn.execute("DELETE FROM projects")
+                self.conn.executemany("INSERT INTO projects (id, data) VALUES (?, ?)",
+                                      ((int(pid), json.dumps(proj, ensure_ascii=False))
+                                       for pid, proj in projects.items()))
+            if settings is not None:
+                self.conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                                      settings.items())
+            self.conn.executemany("DELETE FROM employees WHERE id = ?", ((i,) for i in deletes))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO employees (id, data) VALUES (?, ?)",
+                ((emp["id"], json.dumps({k: v for k, v in emp.items() if k != "id"}, ensure_ascii=False))
+                 for emp in upserts))
+
+
+def migrate_json(json_path, db_path):
+    """Однократный перенос salary_data.json в новый файл базы.
+
+    База собирается во временном файле и переименовывается целиком, поэтому
+    прерванный перенос просто повторится при следующем запуске.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    employees = [dict(emp, id=i) for i, emp in enumerate(data.get("employees", []), 1)]
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path): os.remove(tmp_path)
+    store = SalaryStore(tmp_path)
+    try:
+        store.apply(data.get("settings", {}), employees, projects=data.get("projects", {}))
+        store.conn.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        store.close()
+    os.replace(tmp_path, db_path)
+
+
+def open_store(db_path, json_path=None):
+    """Открывает базу; при первом запуске переносит данные из старого JSON."""
+    if not os.path.exists(db_path) and json_path and os.path.exists(json_path):
+        migrate_json(json_path, db_path)
+    return SalaryStore(db_path)
+
+
+class AutoSaver(threading.Thread):
+    """Фоновая запись изменений: submit() не ждёт диска, close() дожидается очереди.
+
+    Хранилище открывается в потоке записи как opener(target): по умолчанию
+    SalaryStore(путь к базе); для отдела -- ShardStore. Порция, которую не
+    удалось записать, не теряется: она попадает в failed, и владелец
+    забирает её через take_failed(), чтобы снова пометить данные изменёнными.
+    """
+
+    def __init__(self, target, opener=SalaryStore):
+        super().__init__(name="salary-autosave", daemon=True)
+        self.target = target
+        self.opener = opener
+        self.queue = queue.Queue()
+        # (метод, аргументы, текст ошибки) незаписанных порций
+        self.failed = queue.Queue()
+        self.start()
+
+    def submit(self, settings=None, upserts=(), deletes=(), projects=None):
+        self.queue.put(("apply", (settings, list(upserts), list(deletes), projects)))
+
+    def submit_results(self, settings, ids, results):
+        """Снимок результатов; массивы копируются, модель можно менять дальше."""
+        self.queue.put(("save_results", (dict(settings), array(ids.typecode, ids), array(results.typecode, results))))
+
+    def take_failed(self):
+        """Незаписанные порции с прошлого вызова: [(метод, аргументы, текст ошибки)]."""
+        failed = []
+        while True:
+            try:
+                failed.append(self.failed.get_nowait())
+            except queue.Empty:
+                return failed
+
+    def run(self):
+        try:
+            store = self.opener(self.target)
+        except Exception as e:
+            store = None
+            error = str(e)
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None: break
+                method, args = item
+                try:
+                    if store is None: raise OSError(error)
+                    getattr(store, method)(*args)
+                except Exception as e:
+                    print(f"Ошибка сохранения: {e}")
+                    self.failed.put((method, args, str(e)))
+                finally:
+                    self.queue.task_done()
+        finally:
+            if store is not None: store.close()
+
+    def flush(self):
+        """Ждёт, пока все отправленные изменения будут записаны."""
+        self.queue.join()
+
+    def idle(self):
+        """Все отправленные порции обработаны (записаны или попали в failed)."""
+        return self.queue.unfinished_tasks == 0
+
+    def close(self):
+        self.queue.put(None)
+        self.join()
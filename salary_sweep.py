@@ -0,0 +1,96 @@
+"""Сценарии «что если» по глобальным настройкам.
+
+Список сотрудников один раз сворачивается в суммы (roster_aggregates) --
+для больших списков параллельно, кусками в пуле процессов. После этого
+итоги каждой комбинации настроек считаются за O(1), так что сетка 50x50
+занимает доли секунды независимо от размера списка.
+"""
+
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+
+from salary_engine import (DEFAULT_SETTINGS, RESULT_KEYS, employee_columns, merge_aggregates, resolve_settings,
+                           roster_aggregates, totals_from_aggregates)
+
+# Итоги, которые попадают в таблицу сценариев: ЗП мин/реал/макс по текущей и новой базе
+SWEEP_KEYS = ("sc_min", "sc_real", "sc_max", "sn_min", "sn_real", "sn_max")
+SWEEP_INDEXES = tuple(RESULT_KEYS.index(k) for k in SWEEP_KEYS)
+
+# Меньшие списки сворачиваются в текущем процессе: запуск пула дороже
+POOL_MIN_EMPLOYEES = 50000
+POOL_CHUNK = 20000
+
+
+def value_range(start, stop, steps):
+    """steps равномерных значений от start до stop включительно."""
+    steps = max(1, int(steps))
+    if steps == 1: return [float(start)]
+    step = (stop - start) / (steps - 1)
+    return [start + step * i for i in range(steps)]
+
+
+def _chunk_aggregates(employees, registry=None):
+    return roster_aggregates(employee_columns(employees, registry))
+
+
+def aggregate_employees(employees, processes=None, registry=None):
+    """Суммы по списку сотрудников; большие списки -- в пуле процессов.
+
+    registry -- общие проекты, как в salary_engine.project_share.
+    """
+    employees = list(employees)
+    workers = processes or os.cpu_count() or 1
+    if len(employees) < POOL_MIN_EMPLOYEES or workers == 1:
+        return _chunk_aggregates(employees, registry)
+    chunks = [employees[i:i + POOL_CHUNK] for i in range(0, len(employees), POOL_CHUNK)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_aggregates(pool.map(partial(_chunk_aggregates, registry=registry), chunks))
+
+
+class SweepResult:
+    """Итоги по всем комбинациям: keys -- изменяемые настройки, axes -- их значения."""
+
+    def __init__(self, keys, axes, rows):
+        self.keys = keys
+        self.axes = axes
+        self.rows = rows  # [(значения настроек, итоги по SWEEP_KEYS)]
+
+    def matrix(self, metric="sc_real"):
+        """Таблица metric для двух настроек: строки -- первая ось, столбцы -- вторая."""
+        if len(self.keys) != 2: raise ValueError("matrix needs exactly two swept settings")
+        col = SWEEP_KEYS.index(metric)
+        width = len(self.axes[1])
+        values = [totals[col] for _, totals in self.rows]
+        return [values[i:i + width] for i in range(0, len(values), width)]
+
+    def export_csv(self, path):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(list(self.keys) + list(SWEEP_KEYS))
+            for combo, totals in self.rows:
+                writer.writerow(list(combo) + list(totals))
+
+
+def sweep(employees, base_settings, ranges, processes=None, aggregates=None, registry=None):
+    """Итоги по всем комбинациям значений настроек.
+
+    ranges -- {ключ настройки: список значений}; остальные настройки берутся
+    из base_settings. aggregates позволяет переиспользовать уже свёрнутый список;
+    registry -- как в aggregate_employees.
+    """
+    unknown = set(ranges) - set(DEFAULT_SETTINGS)
+    if unknown: raise ValueError(f"unknown settings: {sorted(unknown)}")
+    keys = tuple(ranges)
+    axes = [list(ranges[k]) for k in keys]
+    if aggregates is None:
+        aggregates = aggregate_employees(employees, processes, registry)
+    base = resolve_settings(base_settings)
+    rows = []
+    for combo in product(*axes):
+        cfg = dict(base, **dict(zip(keys, combo)))
+        totals = totals_from_aggregates(aggregates, cfg)
+        rows.append((combo, tuple(totals[i] for i in SWEEP_INDEXES)))
+    return SweepResult(keys, axes, rows)
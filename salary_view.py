@@ -0,0 +1,268 @@
+"""Порядок и отбор строк таблицы поверх RosterModel, без привязки к Tk.
+
+Вид хранит отсортированный список пар (ключ сортировки, индекс модели)
+только для сотрудников, прошедших отбор, а для отбора -- индексы по уровню
+и роли и имена в нижнем регистре. Правка сотрудника переставляет в списке
+только его (bisect); смена сортировки или отбора пересобирает список
+целиком -- для 10k строк это миллисекунды. Уточнение строки поиска
+(новая строка содержит прежнюю) отбирает только из уже показанных.
+"""
+
+from bisect import bisect_left, insort
+from math import inf, nextafter
+
+from salary_engine import RATING_HIGH, RATING_MID, RESULT_KEYS
+from salary_model import REMOVE_INPLACE_MAX, RESULT_WIDTH
+
+# Колонки, по которым можно сортировать: поля ввода и результаты
+TEXT_SORT_KEYS = ("name", "role")
+SORT_KEYS = ("name", "level", "role", "base_cur", "base_new", "content_base", "pages", "rating",
+             "mentees") + RESULT_KEYS
+# Поля, от которых зависит отбор
+FILTER_KEYS = ("name", "level", "role", "rating")
+
+# Диапазоны оценки для отбора: (название, от, до) включительно -- границы бонуса за оценку из расчёта
+RATING_BANDS = (("ниже 4.5", -inf, nextafter(RATING_MID[0], -inf)), ("4.5-4.99",) + RATING_MID,
+                ("5.00", RATING_HIGH, inf))
+
+# Сколько изменённых строк за раз переставляется по одной; больше -- пересборка
+UPDATE_INPLACE_MAX = 64
+
+
+def group_rows(values):
+    """{значение: множество индексов строк с этим значением}."""
+    groups = {}
+    for i, value in enumerate(values):
+        groups.setdefault(value, set()).add(i)
+    return groups
+
+
+class RosterView:
+    """Показанные строки модели в порядке сортировки.
+
+    sort_key -- ключ из SORT_KEYS или None (порядок добавления); отбор --
+    levels/roles (множества названий или None), rating -- (от, до) включительно или None,
+    query -- подстрока имени.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.sort_key = None
+        self.descending = False
+        self.levels = None
+        self.roles = None
+        self.rating = None
+        self.query = ""
+        # Ключ сортировки, имя, уровень и роль по индексу модели; shown -- прошёл ли отбор.
+        # by_level/by_role -- None, пока не собраны заново после удаления строк
+        self.keys = []
+        self.names = []
+        self.row_level = []
+        self.row_role = []
+        self.shown = bytearray()
+        self.by_level = {}
+        self.by_role = {}
+        self.sorted = []
+
+    def __len__(self):
+        return len(self.sorted)
+
+    @property
+    def filtered(self):
+        return bool(self.levels or self.roles or self.rating or self.query)
+
+    def depends_on(self, key):
+        """Меняет ли правка поля key порядок или отбор."""
+        return key == self.sort_key or key in FILTER_KEYS
+
+    def index_at(self, pos):
+        """Индекс модели в позиции pos показанного списка."""
+        if self.descending: pos = len(self.sorted) - 1 - pos
+        return self.sorted[pos][1]
+
+    def indices(self):
+        """Индексы модели в порядке показа."""
+        order = [i for _, i in self.sorted]
+        if self.descending: order.reverse()
+        return order
+
+    def position(self, index):
+        """Позиция сотрудника в показанном списке или None, если он не прошёл отбор."""
+        if not self.shown[index]: return None
+        pos = bisect_left(self.sorted, (self.keys[index], index))
+        return len(self.sorted) - 1 - pos if self.descending else pos
+
+    # --- Значения строки ---
+
+    def sort_value(self, index):
+        key = self.sort_key
+        model = self.model
+        if key is None: return 0
+        if key in TEXT_SORT_KEYS: return model.text[key][index].casefold()
+        if key in model.cols: return model.cols[key][index]
+        return model.res[index * RESULT_WIDTH + RESULT_KEYS.index(key)]
+
+    def matches(self, index):
+        model = self.model
+        if self.levels and model.text["level"][index] not in self.levels: return False
+        if self.roles and model.text["role"][index] not in self.roles: return False
+        if self.rating:
+            lo, hi = self.rating
+            if not lo <= model.cols["rating"][index] <= hi: return False
+        return not self.query or self.query in self.names[index]
+
+    # --- Пересборка ---
+
+    def rebuild(self):
+        """Все индексы заново по модели."""
+        model = self.model
+        n = len(model)
+        self.names = [name.casefold() for name in model.text["name"]]
+        self.row_level = list(model.text["level"])
+        self.row_role = list(model.text["role"])
+        self.by_level, self.by_role = group_rows(self.row_level), group_rows(self.row_role)
+        self.keys = [self.sort_value(i) for i in range(n)]
+        self.refilter()
+
+    def refilter(self):
+        """Отбор и сортировка заново по готовым индексам."""
+        n = len(self.model)
+        candidates = range(n)
+        if self.levels and self.by_level is None: self.by_level = group_rows(self.row_level)
+        if self.roles and self.by_role is None: self.by_role = group_rows(self.row_role)
+        # Перебор начинается с самого узкого индекса
+        for selected, index in ((self.levels, self.by_level), (self.roles, self.by_role)):
+            if selected:
+                rows = set().union(*(index.get(v, ()) for v in selected))
+                if len(rows) < len(candidates): candidates = rows
+        self.shown = bytearray(n)
+        keys = self.keys
+        matches = self.matches
+        chosen = []
+        for i in candidates:
+            if matches(i):
+                self.shown[i] = 1
+                chosen.append((keys[i], i))
+        chosen.sort()
+        self.sorted = chosen
+
+    def set_sort(self, key, descending=False):
+        if key is not None and key not in SORT_KEYS: raise ValueError(f"unknown sort key: {key}")
+        self.sort_key = key
+        self.descending = descending
+        self.keys = [self.sort_value(i) for i in range(len(self.model))]
+        self.sorted = sorted((self.keys[i], i) for _, i in self.sorted)
+
+    def set_filter(self, levels=None, roles=None, rating=None):
+        self.levels = set(levels) if levels else None
+        self.roles = set(roles) if roles else None
+        self.rating = tuple(rating) if rating else None
+        self.refilter()
+
+    def set_query(self, query):
+        """Поиск по подстроке имени; уточнение прежней строки отбирает только из показанных."""
+        query = query.strip().casefold()
+        previous, self.query = self.query, query
+        if query == previous: return
+        if previous in query:
+            names = self.names
+            kept = []
+            for pair in self.sorted:
+                if query in names[pair[1]]:
+                    kept.append(pair)
+                else:
+                    self.shown[pair[1]] = 0
+            self.sorted = kept
+        else:
+            self.refilter()
+
+    # --- Изменения модели ---
+
+    def extend(self, start):
+        """Новые строки модели с индекса start."""
+        model = self.model
+        n = len(model)
+        added = []
+        for i in range(start, n):
+            name, level, role = model.text["name"][i], model.text["level"][i], model.text["role"][i]
+            self.names.append(name.casefold())
+            self.row_level.append(level)
+            self.row_role.append(role)
+            if self.by_level is not None: self.by_level.setdefault(level, set()).add(i)
+            if self.by_role is not None: self.by_role.setdefault(role, set()).add(i)
+            self.keys.append(self.sort_value(i))
+            ok = self.matches(i)
+            self.shown.append(ok)
+            if ok: added.append((self.keys[i], i))
+        if len(added) > UPDATE_INPLACE_MAX:
+            self.sorted.extend(added)
+            self.sorted.sort()
+        else:
+            for pair in added:
+                insort(self.sorted, pair)
+
+    def remove(self, removed):
+        """Строки модели removed (по возрастанию) удалены; возвращает первую
+        позицию показа, с которой строки сдвинулись.
+
+        Ключи сортировки не пересчитываются и список не сортируется заново:
+        удаление с сохранением порядка индексов порядок пар не меняет.
+        Индексы по уровню и роли собираются заново при следующем отборе.
+        """
+        gone = set(removed)
+        first = removed[0]
+        positions = [self.position(i) for i in removed if self.shown[i]]
+        moved = min(positions) if positions else len(self.sorted)
+        if len(removed) <= REMOVE_INPLACE_MAX:
+            for i in reversed(removed):
+                for values in (self.keys, self.names, self.row_level, self.row_role, self.shown):
+                    del values[i]
+        else:
+            keep = [i for i in range(len(self.keys)) if i not in gone]
+            self.keys = [self.keys[i] for i in keep]
+            self.names = [self.names[i] for i in keep]
+            self.row_level = [self.row_level[i] for i in keep]
+            self.row_role = [self.row_role[i] for i in keep]
+            self.shown = bytearray(self.shown[i] for i in keep)
+
+        if len(removed) == 1:
+            self.sorted = [(key, i if i < first else i - 1) for key, i in self.sorted if i != first]
+        else:
+            # Новый индекс -- минус число удалённых строк перед ним
+            self.sorted = [(key, i if i < first else i - bisect_left(removed, i))
+                           for key, i in self.sorted if i not in gone]
+        self.by_level = self.by_role = None
+        return moved
+
+    def update_rows(self, indices):
+        """Обновляет индексы изменённых строк; возвращает True, если порядок или отбор изменились."""
+        indices = list(indices)
+        if len(indices) > UPDATE_INPLACE_MAX:
+            old = self.sorted
+            self.rebuild()
+            return self.sorted != old
+        model = self.model
+        moved = False
+        for i in indices:
+            name, level, role = model.text["name"][i], model.text["level"][i], model.text["role"][i]
+            self.names[i] = name.casefold()
+            if level != self.row_level[i]:
+                if self.by_level is not None:
+                    self.by_level[self.row_level[i]].discard(i)
+                    self.by_level.setdefault(level, set()).add(i)
+                self.row_level[i] = level
+            if role != self.row_role[i]:
+                if self.by_role is not None:
+                    self.by_role[self.row_role[i]].discard(i)
+                    self.by_role.setdefault(role, set()).add(i)
+                self.row_role[i] = role
+            key, ok = self.sort_value(i), self.matches(i)
+            if key == self.keys[i] and ok == self.shown[i]: continue
+            if self.shown[i]:
+                del self.sorted[bisect_left(self.sorted, (self.keys[i], i))]
+            self.keys[i] = key
+            self.shown[i] = ok
+            if ok: insort(self.sorted, (key, i))
+            moved = True
+        return moved
+